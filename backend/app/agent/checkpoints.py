@@ -0,0 +1,107 @@
+"""
+Bounded checkpoint storage for the Redis checkpointer.
+  - checkpoint and write keys expire CHECKPOINT_TTL_SECONDS after they were written
+    (refreshed on read, so a paused HITL thread stays while someone is looking at it)
+  - large state values (search results, drafts, the report) are stored zlib-compressed,
+    both inline in the checkpoint document and in the per-step writes
+  - a finished thread is compacted to its latest checkpoint, which is all the result
+    endpoints read (aget_state); the superstep history is dropped
+
+Imported only when the checkpointer is built (graph._create_checkpointer): the Redis saver
+is slow to import and app.main must stay cheap to import.
+"""
+from langgraph.checkpoint.redis import AsyncRedisSaver
+from langgraph.checkpoint.redis.jsonplus_redis import JsonPlusRedisSerializer
+from app.core.config import settings
+import base64
+import orjson
+import zlib
+
+ZLIB_TYPE_PREFIX = "zlib+"
+ZLIB_MARKER = "__zlib__"
+
+def _compress(data: bytes) -> bytes:
+    return zlib.compress(data, settings.CHECKPOINT_COMPRESS_LEVEL)
+
+class CompressedSerializer(JsonPlusRedisSerializer):
+    """
+    Compresses large serialized write values. Dicts pass through untouched: the saver
+    re-reads checkpoint documents and metadata as JSON for RedisJSON (see CompactRedisSaver).
+    """
+    def __init__(self, min_bytes: int):
+        super().__init__()
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self.min_bytes and not isinstance(obj, dict) and len(data) >= self.min_bytes:
+            return ZLIB_TYPE_PREFIX + type_, _compress(data)
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]):
+        type_, payload = data
+        if type_.startswith(ZLIB_TYPE_PREFIX):
+            return super().loads_typed((type_[len(ZLIB_TYPE_PREFIX):], zlib.decompress(payload)))
+        return super().loads_typed(data)
+
+class CompactRedisSaver(AsyncRedisSaver):
+    """AsyncRedisSaver with compressed large values, compaction and a storage report."""
+    def __init__(self, *args, compress_min_bytes: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.serde = CompressedSerializer(compress_min_bytes)
+        self.compress_min_bytes = compress_min_bytes
+        self.stats = {"compactions": 0, "compaction_errors": 0}
+
+    def _dump_checkpoint(self, checkpoint) -> dict:
+        doc = super()._dump_checkpoint(checkpoint)
+        if not self.compress_min_bytes:
+            return doc
+        # Channel values are stored inline in the JSON document: swap the large ones for a marker
+        values = doc.get("channel_values") or {}
+        for channel, value in values.items():
+            raw = orjson.dumps(value)
+            if len(raw) >= self.compress_min_bytes:
+                values[channel] = {ZLIB_MARKER: base64.b64encode(_compress(raw)).decode()}
+        return doc
+
+    def _recursive_deserialize(self, obj):
+        if isinstance(obj, dict) and len(obj) == 1 and ZLIB_MARKER in obj:
+            obj = orjson.loads(zlib.decompress(base64.b64decode(obj[ZLIB_MARKER])))
+        return super()._recursive_deserialize(obj)
+
+    async def acompact(self, thread_id: str):
+        """Keep only the latest checkpoint of a finished thread (and drop the writes of the others)."""
+        try:
+            await self.aprune([thread_id], keep_last=1)
+            self.stats["compactions"] += 1
+        except Exception as e:
+            self.stats["compaction_errors"] += 1
+            print(f"Checkpoint compaction failed for {thread_id}: {e}")
+
+    async def astorage_report(self, limit: int = 50) -> dict:
+        """Checkpoint keys, bytes and TTL per thread, largest first. Walks the keyspace with SCAN."""
+        threads = {}
+        for prefix, kind in ((self._checkpoint_prefix, "checkpoints"), (self._checkpoint_write_prefix, "writes")):
+            keys = [key async for key in self._redis.scan_iter(match=f"{prefix}:*", count=1000)]
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                pipe = self._redis.pipeline(transaction=False)
+                for key in batch:
+                    pipe.memory_usage(key)
+                    pipe.ttl(key)
+                results = await pipe.execute()
+                for key, size, ttl in zip(batch, results[0::2], results[1::2]):
+                    thread_id = (key.decode() if isinstance(key, bytes) else key).split(":")[1]
+                    entry = threads.setdefault(thread_id, {"thread_id": thread_id, "checkpoints": 0, "writes": 0, "bytes": 0, "ttl_seconds": None})
+                    entry[kind] += 1
+                    entry["bytes"] += size or 0
+                    if ttl is not None and ttl >= 0:
+                        entry["ttl_seconds"] = ttl if entry["ttl_seconds"] is None else min(entry["ttl_seconds"], ttl)
+        ordered = sorted(threads.values(), key=lambda t: t["bytes"], reverse=True)
+        return {
+            "threads": len(ordered),
+            "keys": sum(t["checkpoints"] + t["writes"] for t in ordered),
+            "bytes": sum(t["bytes"] for t in ordered),
+            **self.stats,
+            "largest": ordered[:limit],
+        }
@@ -0,0 +1,147 @@
+"""
+Token-budgeted context assembly for write_node.
+
+Search results accumulate across critique revisions (append reducer), so joining
+everything makes each pass's prompt larger than the last. The builder instead:
+  1. parses each snippet into body + citation line
+  2. drops near-duplicates (word-shingle overlap), merging their citations into the kept copy
+  3. scores snippets by overlap with the topic / critique
+  4. packs the best ones into a per-source token budget, truncating the last one
+     that doesn't fit at a sentence boundary and always keeping its citation
+"""
+from app.core.config import settings
+from app.services.retrieval import tokenize
+from typing import Optional
+import math
+import re
+
+SNIPPET_PATTERN = re.compile(
+    r"^(?:Content: (?P<content>.*)\nSource: (?P<source>.*)"
+    r"|Image Source: (?P<image>.*)\nAnalysis: (?P<analysis>.*))$",
+    re.DOTALL
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+TRUNCATION_MARK = " [...]"
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count; good enough for budgeting and for before/after comparisons."""
+    return math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN) if text else 0
+
+class Snippet:
+    def __init__(self, text: str, position: int):
+        self.position = position
+        self.score = 0.0
+        match = SNIPPET_PATTERN.match(text.strip())
+        if match and match.group("content") is not None:
+            self.label, self.body, self.citations = "Content", match.group("content"), [match.group("source").strip()]
+            self.citation_label = "Source"
+        elif match:
+            self.label, self.body, self.citations = "Analysis", match.group("analysis"), [match.group("image").strip()]
+            self.citation_label = "Image Source"
+        else:
+            # Free-form text: nothing to cite separately
+            self.label, self.body, self.citations, self.citation_label = None, text.strip(), [], None
+        words = tokenize(self.body)
+        self.terms = set(words)
+        self.shingles = {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+
+    def render(self, body: str = None) -> str:
+        body = self.body if body is None else body
+        if self.label == "Analysis":
+            return f"Image Source: {'; '.join(self.citations)}\nAnalysis: {body}"
+        if self.label == "Content":
+            return f"Content: {body}\nSource: {'; '.join(self.citations)}"
+        return body
+
+    def overlap(self, other: "Snippet") -> float:
+        """Share of the smaller snippet's shingles found in the other (1.0 = contained)."""
+        if not self.shingles or not other.shingles:
+            return 0.0
+        return len(self.shingles & other.shingles) / min(len(self.shingles), len(other.shingles))
+
+def _truncate(snippet: Snippet, max_tokens: int) -> Optional[str]:
+    """Cut the body to fit `max_tokens` including the citation, preferring a sentence boundary. None if even the citation doesn't fit."""
+    overhead = estimate_tokens(snippet.render("")) + estimate_tokens(TRUNCATION_MARK)
+    max_chars = (max_tokens - overhead) * settings.CONTEXT_CHARS_PER_TOKEN
+    if max_chars <= 0:
+        return None
+    head = snippet.body[:max_chars]
+    boundaries = [m.start() for m in SENTENCE_END.finditer(head)]
+    if boundaries and boundaries[-1] > max_chars // 2:
+        head = head[:boundaries[-1]]
+    return snippet.render(head.rstrip() + TRUNCATION_MARK)
+
+class ContextBuilder:
+    """Builds the write_node context for one source type under a token budget."""
+    def __init__(self, query: str):
+        self.query_terms = set(tokenize(query))
+
+    def _score(self, snippet: Snippet, prior: float) -> float:
+        relevance = len(snippet.terms & self.query_terms) / len(self.query_terms) if self.query_terms else 0.0
+        # Small prior only breaks ties between equally relevant snippets
+        return relevance + 0.1 * prior
+
+    def build(self, items: list[str], budget: int, newest_first: bool = False) -> tuple[str, dict]:
+        """
+        Returns the packed context text and its stats.
+        `newest_first` favours later items (web results from a revision pass target the critique);
+        otherwise earlier items win ties (RAG results arrive ranked).
+        """
+        items = [item for item in items or [] if item and item.strip()]
+        stats = {"items": len(items), "input_tokens": estimate_tokens("\n\n".join(items)),
+                 "duplicates": 0, "truncated": 0, "dropped": 0}
+
+        kept = []
+        for position, text in enumerate(items):
+            snippet = Snippet(text, position)
+            n = max(len(items) - 1, 1)
+            snippet.score = self._score(snippet, position / n if newest_first else 1 - position / n)
+            duplicate = next((k for k in kept if k.overlap(snippet) >= settings.CONTEXT_DEDUP_THRESHOLD), None)
+            if duplicate is None:
+                kept.append(snippet)
+                continue
+            stats["duplicates"] += 1
+            # Keep the better copy, but cite every source that said it
+            winner, loser = (snippet, duplicate) if snippet.score > duplicate.score else (duplicate, snippet)
+            winner.citations += [c for c in loser.citations if c not in winner.citations]
+            if winner is snippet:
+                kept[kept.index(duplicate)] = snippet
+
+        packed = []
+        remaining = budget
+        for snippet in sorted(kept, key=lambda s: s.score, reverse=True):
+            text = snippet.render()
+            allowed = min(remaining, settings.CONTEXT_SNIPPET_MAX_TOKENS)
+            if estimate_tokens(text) > allowed:
+                text = _truncate(snippet, allowed) if allowed >= settings.CONTEXT_SNIPPET_MIN_TOKENS else None
+                if text is None:
+                    stats["dropped"] += 1
+                    continue
+                stats["truncated"] += 1
+            packed.append(text)
+            remaining -= estimate_tokens(text)
+
+        context = "\n\n".join(packed)
+        stats["context_tokens"] = estimate_tokens(context)
+        stats["saved_tokens"] = stats["input_tokens"] - stats["context_tokens"]
+        return context, stats
+
+def build_write_context(state: dict) -> tuple[dict, dict]:
+    """Packed web / PDF / visual context for write_node, plus per-source and total token stats."""
+    query = state["topic"]
+    if state.get("critique_comments"):
+        query = f"{query} {state['critique_comments']}"
+    builder = ContextBuilder(query)
+
+    web, web_stats = builder.build(state.get("search_results"), settings.CONTEXT_WEB_TOKENS, newest_first=True)
+    pdf, pdf_stats = builder.build(state.get("rag_data"), settings.CONTEXT_PDF_TOKENS)
+    visual, visual_stats = builder.build(state.get("visual_data"), settings.CONTEXT_VISUAL_TOKENS)
+
+    per_source = {"web": web_stats, "pdf": pdf_stats, "visual": visual_stats}
+    stats = {
+        "input_tokens": sum(s["input_tokens"] for s in per_source.values()),
+        "context_tokens": sum(s["context_tokens"] for s in per_source.values()),
+        "saved_tokens": sum(s["saved_tokens"] for s in per_source.values()),
+        "sources": per_source,
+    }
+    return {"web": web, "pdf": pdf, "visual": visual}, stats
@@ -0,0 +1,111 @@
+"""
+Structured critique verdicts, parsed while the critique streams.
+
+The editor is asked to answer in a fixed format:
+
+    VERDICT: ACCEPT
+
+or
+
+    VERDICT: REVISE
+    MISSING:
+    - <aspect the report lacks>
+    - <another aspect>
+    SECTIONS:
+    - <section that falls short>
+    END
+
+SECTIONS names the report sections to rewrite (see agent/revision.py).
+
+An ACCEPT is final as soon as its first line arrives, so the rest of the generation is
+cancelled. A REVISE is final at END (or when the stream ends). The older free-form
+answers ("ACCEPT" / "REVISE: <reason>") are still understood.
+"""
+from app.core.config import settings
+import re
+
+VERDICT_PATTERN = re.compile(r"^\s*(?:\**\s*VERDICT\s*:?\s*\**\s*)?(ACCEPT|REVISE)\b", re.IGNORECASE)
+ITEM_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*(.+)$")
+
+class CritiqueVerdict:
+    """What the critique decided, and whether more of the stream is needed to know it."""
+    def __init__(self, decision: str = None, missing: list = None, reason: str = "", complete: bool = False,
+                 sections: list = None):
+        self.decision = decision # "ACCEPT", "REVISE" or None (undecided)
+        self.missing = missing or []
+        self.sections = sections or []
+        self.reason = reason
+        self.complete = complete
+
+    @property
+    def accepted(self) -> bool:
+        return self.decision != "REVISE"
+
+    def comments(self) -> str:
+        """Feedback for the write prompt."""
+        if self.missing:
+            return "Cover the missing aspects: " + "; ".join(self.missing)
+        # A REVISE must carry some feedback, or the router would read it as an ACCEPT
+        return self.reason or "Improve the coverage of the topic."
+
+def parse_verdict(text: str, final: bool = False) -> CritiqueVerdict:
+    """
+    Parse the (possibly partial) critique. `final` marks the end of the stream, which
+    completes a REVISE without END and treats an unrecognized answer as the legacy
+    substring check did: ACCEPT anywhere accepts, anything else asks for a revision.
+    """
+    match = VERDICT_PATTERN.match(text)
+    if not match:
+        if not final:
+            return CritiqueVerdict()
+        if "ACCEPT" in text.upper():
+            return CritiqueVerdict("ACCEPT", complete=True)
+        return CritiqueVerdict("REVISE", reason=text.replace("REVISE:", "").strip(), complete=True)
+
+    if match.group(1).upper() == "ACCEPT":
+        return CritiqueVerdict("ACCEPT", complete=True)
+
+    rest = text[match.end():]
+    lines = rest.splitlines()
+    # The last line may still be streaming; only count lines that ended
+    settled = lines if final or rest.endswith("\n") else lines[:-1]
+    lists = {"MISSING": [], "SECTIONS": []}
+    block, ended = "MISSING", False
+    for line in settled:
+        marker = line.strip().upper()
+        if marker == "END":
+            ended = True
+            break
+        if marker.rstrip(":") in lists:
+            block = marker.rstrip(":")
+            continue
+        item = ITEM_PATTERN.match(line)
+        if item:
+            lists[block].append(item.group(1).strip())
+    missing = lists["MISSING"]
+    if lines and lines[-1].strip().upper() == "END":
+        ended = True
+    return CritiqueVerdict(
+        "REVISE",
+        missing=missing[:settings.CRITIQUE_MAX_ASPECTS],
+        reason="" if missing else " ".join(
+            line.strip() for line in rest.lstrip(":").splitlines()
+            if line.strip() and line.strip().upper() not in ("MISSING:", "SECTIONS:", "END")
+        ),
+        complete=ended or final,
+        sections=lists["SECTIONS"],
+    )
+
+async def stream_verdict(llm, messages) -> tuple[CritiqueVerdict, str]:
+    """Stream the critique until its verdict is settled; returns the verdict and the text read."""
+    text = ""
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            text += chunk.content if isinstance(chunk.content, str) else ""
+            verdict = parse_verdict(text)
+            if verdict.complete:
+                return verdict, text
+    finally:
+        await stream.aclose()
+    return parse_verdict(text, final=True), text
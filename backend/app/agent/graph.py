@@ -1,16 +1,19 @@
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.redis import RedisSaver
 from app.agent.state import AgentState
-from app.agent.nodes import search_web_node, rag_node, write_node, critique_node
+from app.agent.nodes import search_web_node, delta_search_node, rag_node, write_node, critique_node
 from app.agent.safety import guardrail_node
 from app.agent.human import human_review_node
 from app.agent.vision import vision_node
+from app.agent.timing import timed
 from app.services.redis_cache import redis_cache
+from app.services.providers import Provider
+from app.services.clients import clients
 from app.core.config import settings
+import asyncio
 
-def check_cache_node(state: AgentState):
+async def check_cache_node(state: AgentState):
     """Check Redis for semantically similar report."""
-    cached_report = redis_cache.lookup(state["topic"])
+    cached_report = await redis_cache.alookup(state["topic"])
     if cached_report:
         print("--- [CACHE HIT] Returning existing report ---")
         return {
@@ -20,42 +23,85 @@ def check_cache_node(state: AgentState):
         }
     return {"source": "live", "revision_number": 0}
 
+def _create_checkpointer():
+    from app.agent.checkpoints import CompactRedisSaver
+    ttl = None
+    if settings.CHECKPOINT_TTL_SECONDS:
+        ttl = {"default_ttl": settings.CHECKPOINT_TTL_SECONDS / 60, "refresh_on_read": True}
+    return CompactRedisSaver(
+        redis_client=clients.async_redis(decode_responses=False),
+        ttl=ttl,
+        compress_min_bytes=settings.CHECKPOINT_COMPRESS_MIN_BYTES,
+    )
+
 # Create Redis Checkpointer for Persistence
-# Pass URL string directly
-memory = RedisSaver(settings.REDIS_URL)
+# Async saver so checkpoint writes don't block the event loop; bounded by TTL, compression
+# and compaction (see agent/checkpoints.py).
+# Its indices are created by the warm-up during the startup phase (see providers.startup()).
+memory = Provider("checkpointer", _create_checkpointer, warmup=lambda saver: saver.asetup())
+
+_compactions = set()
 
-def create_graph():
+def compact_thread(thread_id: str):
+    """Compact a finished thread's checkpoints in the background. No-op for savers without compaction."""
+    saver = memory.get()
+    if not settings.CHECKPOINT_COMPACTION or not hasattr(saver, "acompact"):
+        return
+    # Keep a reference so the task isn't garbage collected mid-flight
+    task = asyncio.create_task(saver.acompact(thread_id))
+    _compactions.add(task)
+    task.add_done_callback(_compactions.discard)
+
+def gather_context_node(state: AgentState):
+    """
+    Join point for the parallel search/vision and RAG branches.
+    Their outputs are already merged into state by the reducers, so this only marks the barrier.
+    """
+    return {}
+
+def create_graph(checkpointer=None):
     graph = StateGraph(AgentState)
 
-    graph.add_node("check_cache", check_cache_node)
-    graph.add_node("search_web", search_web_node)
-    graph.add_node("rag", rag_node)
-    graph.add_node("write", write_node)
-    graph.add_node("critique", critique_node)
-    graph.add_node("guardrails", guardrail_node)
-    graph.add_node("human_review", human_review_node)
-    graph.add_node("vision", vision_node)
+    nodes = {
+        "check_cache": check_cache_node,
+        "search_web": search_web_node,
+        "rag": rag_node,
+        "vision": vision_node,
+        "gather_context": gather_context_node,
+        "write": write_node,
+        "critique": critique_node,
+        "delta_search": delta_search_node,
+        "guardrails": guardrail_node,
+        "human_review": human_review_node,
+    }
+    for name, node in nodes.items():
+        # Every node records its wall time into state["node_timings"]
+        graph.add_node(name, timed(name)(node))
 
     graph.set_entry_point("check_cache")
 
+    # Fan-out: web search (-> vision) and PDF RAG don't depend on each other
+    research_branches = ["search_web", "rag"]
+
     def cache_router(state: AgentState):
         if state.get("source") == "cache":
             return "end"
-        return "continue"
+        return research_branches
 
     graph.add_conditional_edges(
         "check_cache",
         cache_router,
         {
             "end": END,
-            "continue": "search_web"
+            "search_web": "search_web",
+            "rag": "rag"
         }
     )
 
     # Vision Layer (Multi-Modal)
-    # Search -> Vision -> RAG
+    # Search -> Vision, in parallel with RAG; both join before writing
     graph.add_edge("search_web", "vision")
-    graph.add_edge("vision", "rag")
+    graph.add_edge(["vision", "rag"], "gather_context")
     
     # HITL Router
     def hitl_router(state: AgentState):
@@ -67,7 +113,7 @@ def create_graph():
         return "auto"
 
     graph.add_conditional_edges(
-        "rag",
+        "gather_context",
         hitl_router,
         {
             "human": "human_review",
@@ -87,17 +133,20 @@ def create_graph():
         "critique",
         critique_router,
         {
-            "revise": "search_web",
+            "revise": "delta_search",
             "accept": "guardrails"
         }
     )
+    # Targeted revision: search only the missing aspects, keep the RAG and vision results
+    graph.add_edge("delta_search", "write")
     
     graph.add_edge("guardrails", END)
 
     # Compile with interruption
     return graph.compile(
-        checkpointer=memory,
+        checkpointer=checkpointer or memory.get(),
         interrupt_before=["human_review"]
     )
 
-graph_app = create_graph()
+# Compiled on first use or during startup
+graph_app = Provider("graph", create_graph, depends=(memory,))
@@ -1,49 +1,105 @@
 from app.agent.state import AgentState
+from app.agent.context import build_write_context
+from app.agent.critique import stream_verdict
+from app.agent.revision import revise_sections, split_sections, outline
 from app.services.redis_cache import redis_cache
-from app.services.vector_db import vector_db
+from app.services.retrieval import hybrid_retriever
+from app.services.embeddings import embedding_service
 from app.services.llm_factory import llm
-from tavily import TavilyClient
+from app.services.llm_cache import llm_response_cache
+from app.services.limits import upstream_limits
+from app.services.search import search_service, snippet_urls, dedup_results
 from app.core.config import settings
 from langchain_core.messages import SystemMessage, HumanMessage
+import asyncio
 
-tavily = TavilyClient(api_key=settings.TAVILY_API_KEY)
+write_llm = llm_response_cache.wrap(llm, "write")
+revise_llm = llm_response_cache.wrap(llm, "revise")
+# The critique prompt depends only on topic + draft, so repeated drafts reuse the verdict
+critique_llm = llm_response_cache.wrap(llm, "critique")
 
 # check_cache_node is now in graph.py to control flow better, or we can keep it here.
 # For circular imports, we moved check_cache to graph.py or we can keep imports clean.
 # Let's keep specific nodes here.
 
-def search_web_node(state: AgentState):
-    """Perform live web search using Tavily."""
+async def search_web_node(state: AgentState):
+    """
+    Perform web search (Tavily, through the search cache in services/search.py).
+    First pass only: revision passes search through delta_search_node.
+    """
     query = state["topic"]
-    if state.get("critique_comments"):
-        query = f"{state['topic']} related to: {state['critique_comments']}"
-        print(f"--- RE-SEARCHING WITH QUERY: {query} ---")
 
     # Enable Image Search
-    results = tavily.search(query=query, max_results=3, search_depth="advanced", include_images=True)
+    results = await search_service.search(query, max_results=3, search_depth="advanced", include_images=True)
     
-    search_contents = [f"Content: {r['content']}\nSource: {r['url']}" for r in results.get("results", [])]
+    # A page already in state (or listed twice) is only added once
+    fresh = dedup_results(results.get("results", []), snippet_urls(state.get("search_results")))
+    search_contents = [f"Content: {r['content']}\nSource: {r['url']}" for r in fresh]
     images = results.get("images", []) # Tavily returns list of image URLs
     
-    current_results = state.get("search_results") or []
+    # `search_results` has an append reducer (see state.py), so return only the new ones
     return {
-        "search_results": current_results + search_contents,
+        "search_results": search_contents,
         "images": images # Pass images to state
     }
 
-def rag_node(state: AgentState):
-    """Query Vector DB for PDF context."""
-    vector_store = vector_db.get_vector_store()
-    docs = vector_store.similarity_search(state["topic"], k=3)
+async def delta_search_node(state: AgentState):
+    """
+    Revision pass: search only for what the critique found missing.
+    RAG and vision results from the first pass are reused as they are.
+    """
+    topic = state["topic"]
+    aspects = state.get("missing_aspects") or [state.get("critique_comments") or topic]
+    seen = snippet_urls(state.get("search_results"))
+    print(f"--- DELTA SEARCH: {aspects} ---")
+
+    results = await asyncio.gather(*[
+        search_service.search(f"{topic} {aspect}", max_results=settings.DELTA_SEARCH_RESULTS,
+                              search_depth=settings.DELTA_SEARCH_DEPTH)
+        for aspect in aspects
+    ], return_exceptions=True)
+    search_contents = []
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Delta search failed: {result}")
+            continue
+        # Skip pages the first pass (or another aspect) already found
+        for r in dedup_results(result.get("results", []), seen):
+            search_contents.append(f"Content: {r['content']}\nSource: {r['url']}")
+    return {"search_results": search_contents}
+
+async def rag_node(state: AgentState):
+    """Query Vector DB for PDF context (dense + BM25 hybrid). First pass only, like search_web_node."""
+    query = state["topic"]
+
+    # The topic embedding computed by the cache lookup (memo hit)
+    vector = await embedding_service.aembed(query)
+    # Qdrant client is synchronous; run the search off the event loop
+    async with upstream_limits.slot("vector_db"):
+        docs = await asyncio.to_thread(hybrid_retriever.search, query, vector, sources=state.get("sources"))
     rag_contents = [f"Content: {doc.page_content}\nSource: {doc.metadata.get('source', 'Unknown')}" for doc in docs]
     return {"rag_data": rag_contents}
 
-def write_node(state: AgentState):
+async def write_node(state: AgentState):
     """Synthesize final report using LLM."""
     topic = state["topic"]
-    web_data = "\n\n".join(state.get("search_results", []))
-    pdf_data = "\n\n".join(state.get("rag_data", []))
-    visual_data = "\n\n".join(state.get("visual_data", []))
+    # Deduplicated and packed into per-source token budgets instead of joining everything
+    context, context_stats = build_write_context(state)
+    web_data, pdf_data, visual_data = context["web"], context["pdf"], context["visual"]
+    print(f"--- CONTEXT: {context_stats['context_tokens']} tokens ({context_stats['saved_tokens']} saved) ---")
+
+    if state.get("critique_comments") and state.get("final_report") and settings.INCREMENTAL_REVISION:
+        # Rewrite only the sections the critique named; None means a full rewrite is needed
+        revision = await revise_sections(
+            revise_llm, topic, state["final_report"], state.get("weak_sections"),
+            state["critique_comments"], context
+        )
+        if revision:
+            final_report, revised = revision
+            print(f"--- REVISED {len(revised)} SECTION(S): {revised} ---")
+            await redis_cache.asave(topic, final_report)
+            return {"final_report": final_report,
+                    "context_stats": [{**context_stats, "mode": "incremental", "sections_revised": len(revised)}]}
     
     critique_prompt = ""
     if state.get("critique_comments"):
@@ -71,15 +127,15 @@ def write_node(state: AgentState):
         HumanMessage(content=prompt)
     ]
     
-    response = llm.invoke(messages)
+    response = await write_llm.ainvoke(messages)
     final_report = response.content
     
     # Save to Redis Semantic Cache (Enterprise Feature)
-    redis_cache.save(topic, final_report)
+    await redis_cache.asave(topic, final_report)
     
-    return {"final_report": final_report}
+    return {"final_report": final_report, "context_stats": [{**context_stats, "mode": "full"}]}
 
-def critique_node(state: AgentState):
+async def critique_node(state: AgentState):
     """Critique the draft report."""
     current_report = state.get("final_report")
     topic = state["topic"]
@@ -89,25 +145,35 @@ def critique_node(state: AgentState):
     
     MAX_REVISIONS = 1 
     if next_rev > MAX_REVISIONS:
-        return {"critique_comments": None, "revision_number": next_rev}
+        return {"critique_comments": None, "missing_aspects": None, "weak_sections": None, "revision_number": next_rev}
 
     prompt = f"""You are a critical editor.
     User Topic: {topic}
     
     Draft Report:
     {current_report}
-    
-    Does this report comprehensively answer the topic?
-    If YES, return "ACCEPT".
-    If NO, briefly describe what information is missing or needs improvement. Start with "REVISE: ".
+
+    Report Sections:
+    {outline(split_sections(current_report or ""))}
+    
+    Does this report comprehensively answer the topic? Answer in exactly this format.
+    If YES, a single line:
+    VERDICT: ACCEPT
+    If NO (at most {settings.CRITIQUE_MAX_ASPECTS} aspects, each a short search phrase):
+    VERDICT: REVISE
+    MISSING:
+    - <missing aspect>
+    SECTIONS:
+    - <number of a section above that falls short>
+    END
     """
     
     messages = [HumanMessage(content=prompt)]
-    response = llm.invoke(messages)
-    feedback = response.content.strip()
+    # Streamed: an ACCEPT is acted on at its first line and the rest of the generation is cancelled
+    verdict, _ = await stream_verdict(critique_llm, messages)
     
-    if "ACCEPT" in feedback:
-        return {"critique_comments": None, "revision_number": next_rev}
+    if verdict.accepted:
+        return {"critique_comments": None, "missing_aspects": None, "weak_sections": None, "revision_number": next_rev}
     else:
-        reason = feedback.replace("REVISE:", "").strip()
-        return {"critique_comments": reason, "revision_number": next_rev}
\ No newline at end of file
+        return {"critique_comments": verdict.comments(), "missing_aspects": verdict.missing,
+                "weak_sections": verdict.sections, "revision_number": next_rev}
\ No newline at end of file
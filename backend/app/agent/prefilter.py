@@ -0,0 +1,180 @@
+"""
+Local guardrail pre-filters: cheap checks that decide which parts of a report need the
+LLM judge at all.
+
+  - PII: compiled patterns for e-mail addresses, phone numbers, US SSNs, payment cards
+    (Luhn-checked), IBANs, IP addresses and credentials (API keys, private keys). Each
+    pattern only runs where it can match: behind a literal trigger ("@"), or inside the
+    digit runs found by one pass over the text
+  - Lexicon: weighted terms and phrases for harmful content and for unsupported,
+    overconfident claims, compiled from a character trie into a single regex, so the
+    whole lexicon is matched in one pass
+
+The report is cut into chunks (its sections, split further by paragraph when long);
+every chunk gets a score and a list of findings, and only chunks at or above
+GUARDRAIL_FLAG_SCORE go to the judge (see agent/safety.py).
+"""
+from app.core.config import settings
+from app.agent.revision import split_sections
+import re
+
+URL_PATTERN = re.compile(r"https?://\S+")
+# Runs of digits with the separators phone numbers, cards, IBANs and IPs use
+DIGIT_RUN_PATTERN = re.compile(r"[A-Z0-9(+][A-Z0-9\s().+-]{5,}\d")
+
+# (name, pattern, score, triggers). Scores >= GUARDRAIL_FLAG_SCORE flag the chunk on their own.
+# Patterns with triggers run on the whole text when one of the literals occurs in it;
+# the others only inside DIGIT_RUN_PATTERN matches.
+PII_PATTERNS = [
+    ("email", re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"), 1.0, ("@",)),
+    ("phone", re.compile(r"(?<![\w.])(?:\+\d{1,3}[\s.-]?)?\(?\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}(?![\w.])"), 1.0, None),
+    ("ssn", re.compile(r"\b(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}\b"), 2.0, None),
+    ("payment_card", re.compile(r"\b(?:\d[ -]?){12,18}\d\b"), 2.0, None),
+    ("iban", re.compile(r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){3,7}(?: ?[A-Z0-9]{1,3})?\b"), 2.0, None),
+    ("ip_address", re.compile(r"\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b"), 0.5, None),
+    ("credential", re.compile(
+        r"\b(?:AKIA[0-9A-Z]{16}|sk-[A-Za-z0-9_-]{20,}|gh[pousr]_[A-Za-z0-9]{36}|xox[abpr]-[A-Za-z0-9-]{10,})\b"
+        r"|-----BEGIN (?:RSA |EC |OPENSSH )?PRIVATE KEY-----"), 3.0,
+        ("AKIA", "sk-", "ghp_", "gho_", "ghu_", "ghs_", "ghr_", "xox", "PRIVATE KEY")),
+]
+
+# term -> (category, weight). Multi-word entries are matched as phrases.
+LEXICON = {
+    # Harmful content
+    "kill yourself": ("toxicity", 3.0), "self-harm": ("toxicity", 0.5), "suicide method": ("toxicity", 2.0),
+    "how to make a bomb": ("toxicity", 3.0), "build a bomb": ("toxicity", 2.0), "pipe bomb": ("toxicity", 2.0),
+    "nerve agent synthesis": ("toxicity", 3.0), "bioweapon": ("toxicity", 1.0), "ransomware payload": ("toxicity", 1.5),
+    "credit card dump": ("toxicity", 2.0), "doxx": ("toxicity", 1.5), "doxxing": ("toxicity", 1.5),
+    "ethnic cleansing": ("toxicity", 1.0), "genocide": ("toxicity", 0.5), "terrorist attack": ("toxicity", 0.5),
+    "subhuman": ("toxicity", 2.0), "vermin": ("toxicity", 0.5), "exterminate": ("toxicity", 1.0),
+    "go die": ("toxicity", 2.0), "worthless idiots": ("toxicity", 1.5),
+    # Unsupported or overconfident claims (hallucination signals)
+    "studies show": ("hallucination", 0.4), "experts agree": ("hallucination", 0.4),
+    "scientifically proven": ("hallucination", 0.6), "it is a fact that": ("hallucination", 0.5),
+    "100% guaranteed": ("hallucination", 0.8), "guaranteed to": ("hallucination", 0.4),
+    "everyone knows": ("hallucination", 0.4), "undeniable": ("hallucination", 0.3),
+    "according to a recent study": ("hallucination", 0.4), "cures": ("hallucination", 0.5),
+    # Identity markers that usually accompany personal data
+    "social security number": ("pii", 0.8), "date of birth": ("pii", 0.6), "home address": ("pii", 0.6),
+    "passport number": ("pii", 0.8), "medical record": ("pii", 0.5), "password": ("pii", 0.5),
+}
+
+def luhn_valid(digits: str) -> bool:
+    total, parity = 0, len(digits) % 2
+    for i, ch in enumerate(digits):
+        d = int(ch)
+        if i % 2 == parity:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return total % 10 == 0
+
+class LexiconAutomaton:
+    """
+    Character trie over the lexicon, compiled to one regex with shared prefixes factored
+    out ("s(?:tudies show|ubhuman)"). The regex engine then follows a single branch per
+    position instead of trying every term, and the text is scanned once for all terms.
+    """
+    def __init__(self, lexicon: dict):
+        self.terms = {" ".join(term.lower().split()): (term, category, weight)
+                      for term, (category, weight) in lexicon.items()}
+        trie = {}
+        for term in self.terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[None] = {}
+        self.pattern = re.compile(r"\b" + self._compile(trie) + r"\b")
+
+    def _compile(self, node: dict) -> str:
+        branches = [re.escape(ch) + self._compile(child) for ch, child in sorted(node.items(), key=str) if ch is not None]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A term can end here and a longer one continue; prefer the longer match
+        return f"(?:{body})?" if None in node else body
+
+    def scan(self, text: str) -> list[tuple[str, str, float]]:
+        # Terms are stored lower-cased with single spaces
+        text = " ".join(text.lower().split())
+        return [self.terms[m] for m in self.pattern.findall(text) if m in self.terms]
+
+class Finding:
+    def __init__(self, kind: str, label: str, score: float):
+        self.kind = kind # "pii", "toxicity", "hallucination"
+        self.label = label # pattern name or lexicon term
+        self.score = score
+
+    def __repr__(self):
+        return f"{self.kind}:{self.label}"
+
+class Chunk:
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.text = text
+        self.findings = []
+
+    @property
+    def score(self) -> float:
+        return sum(f.score for f in self.findings)
+
+    @property
+    def flagged(self) -> bool:
+        return self.score >= settings.GUARDRAIL_FLAG_SCORE
+
+def chunk_report(report: str, max_tokens: int = None) -> list[Chunk]:
+    """Sections of the report, with long sections split at paragraph boundaries."""
+    max_chars = (max_tokens or settings.GUARDRAIL_CHUNK_TOKENS) * settings.CONTEXT_CHARS_PER_TOKEN
+    pieces = []
+    for section in split_sections(report):
+        if len(section.text) <= max_chars:
+            pieces.append(section.text)
+            continue
+        current = ""
+        for paragraph in re.split(r"(?<=\n\n)", section.text):
+            if current and len(current) + len(paragraph) > max_chars:
+                pieces.append(current)
+                current = ""
+            current += paragraph
+        if current:
+            pieces.append(current)
+    return [Chunk(i, text) for i, text in enumerate(p for p in pieces if p.strip())]
+
+class PreFilter:
+    """Scores report chunks with the local checks; no network calls."""
+    def __init__(self, patterns: list = None, lexicon: dict = None):
+        self.patterns = patterns or PII_PATTERNS
+        self.automaton = LexiconAutomaton(lexicon or LEXICON)
+
+    def scan_text(self, text: str) -> list[Finding]:
+        findings = []
+        # Citations are expected in reports; don't read URLs as PII or lexicon hits
+        text = URL_PATTERN.sub(" ", text)
+        runs = None
+        for name, pattern, score, triggers in self.patterns:
+            if triggers:
+                if not any(t in text for t in triggers):
+                    continue
+                matches = pattern.finditer(text)
+            else:
+                if runs is None:
+                    # One character of context each side keeps the \b / lookaround checks right
+                    runs = [text[max(m.start() - 1, 0):m.end() + 1] for m in DIGIT_RUN_PATTERN.finditer(text)]
+                matches = (match for run in runs for match in pattern.finditer(run))
+            for match in matches:
+                if name == "payment_card":
+                    digits = re.sub(r"\D", "", match.group())
+                    if not (13 <= len(digits) <= 19 and luhn_valid(digits)):
+                        continue
+                findings.append(Finding("pii", name, score))
+        for term, category, weight in self.automaton.scan(text):
+            findings.append(Finding(category, term, weight))
+        return findings
+
+    def scan(self, report: str) -> list[Chunk]:
+        chunks = chunk_report(report)
+        for chunk in chunks:
+            chunk.findings = self.scan_text(chunk.text)
+        return chunks
+
+# Global Instance
+prefilter = PreFilter()
@@ -0,0 +1,153 @@
+"""
+Section-aware revision of a drafted report.
+
+A revision pass used to regenerate the whole Markdown report. Instead the report is
+split at its top-level headings, the critique names the sections that fall short,
+only those are rewritten (concurrently) and the report is put back together with the
+other sections left byte-for-byte as they were.
+"""
+from app.core.config import settings
+from langchain_core.messages import SystemMessage, HumanMessage
+from collections import Counter
+import asyncio
+import re
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+class Section:
+    """One top-level section: its heading line (if any) and raw text, trailing whitespace included."""
+    def __init__(self, index: int, title: str, text: str, level: int = 0):
+        self.index = index
+        self.title = title
+        self.text = text
+        self.level = level
+
+def _headings(lines: list[str]) -> list[tuple[int, int, str]]:
+    """(line number, level, title) for every heading outside code fences."""
+    headings, in_fence = [], False
+    for number, line in enumerate(lines):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else HEADING_PATTERN.match(line)
+        if match:
+            headings.append((number, len(match.group(1)), match.group(2).strip()))
+    return headings
+
+def split_sections(report: str) -> list[Section]:
+    """
+    Split at the shallowest heading level that occurs more than once (usually "##").
+    Text before the first such heading (title, introduction) is its own section.
+    """
+    lines = report.splitlines(keepends=True)
+    headings = _headings(lines)
+    counts = Counter(level for _, level, _ in headings)
+    levels = sorted(level for level, count in counts.items() if count > 1)
+    if not levels:
+        return [Section(0, "", report)]
+    level = levels[0]
+    starts = [(number, title) for number, lvl, title in headings if lvl == level]
+
+    sections = []
+    if starts[0][0] > 0:
+        preamble = "".join(lines[:starts[0][0]])
+        # The preamble is named after its own heading (the report title) when it has one
+        title = next((t for n, _, t in headings if n < starts[0][0]), "Introduction")
+        sections.append(Section(0, title, preamble))
+    for i, (number, title) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(lines)
+        sections.append(Section(len(sections), title, "".join(lines[number:end]), level))
+    return sections
+
+def join_sections(sections: list[Section]) -> str:
+    return "".join(section.text for section in sections)
+
+def outline(sections: list[Section]) -> str:
+    """Numbered section titles, for the critique prompt."""
+    return "\n".join(f"{s.index + 1}. {s.title}" for s in sections)
+
+def select_sections(sections: list[Section], names: list[str]) -> list[Section]:
+    """Resolve the critique's section references (outline numbers or titles) to sections."""
+    selected = []
+    for name in names or []:
+        name = name.strip().strip("#*\"' ").strip()
+        number = re.match(r"^(\d+)[.)]?(?:\s|$)", name)
+        if number and 0 < int(number.group(1)) <= len(sections):
+            match = sections[int(number.group(1)) - 1]
+        else:
+            title = re.sub(r"^\d+[.)]\s*", "", name).lower()
+            match = next((s for s in sections if s.title.lower() == title), None) \
+                or next((s for s in sections if title and (title in s.title.lower() or s.title.lower() in title)), None)
+        if match is not None and match not in selected:
+            selected.append(match)
+    return selected
+
+def _ensure_heading(section: Section, text: str) -> str:
+    """Keep the original heading line and the blank-line layout around the section."""
+    body = text.strip()
+    heading = section.text.splitlines()[0] if section.level else ""
+    if heading:
+        first = body.splitlines()[0] if body else ""
+        if HEADING_PATTERN.match(first):
+            body = body[len(first):].lstrip("\n")
+        body = f"{heading.rstrip()}\n\n{body}" if body else heading.rstrip()
+    trailing = section.text[len(section.text.rstrip()):]
+    return body + (trailing or "\n")
+
+async def revise_sections(llm, topic: str, report: str, section_names: list[str], feedback: str, context: dict):
+    """
+    Rewrite only the sections the critique named, concurrently.
+    Returns (report, revised section titles), or None when a full rewrite is the better
+    call: no usable section references, or too large a share of the report affected.
+    """
+    sections = split_sections(report)
+    targets = select_sections(sections, section_names)
+    if len(sections) < 2 or not targets or len(targets) > len(sections) * settings.REVISION_MAX_SECTION_SHARE:
+        return None
+
+    titles = "\n".join(f"- {s.title}" for s in sections if s not in targets)
+
+    async def revise(section: Section) -> str:
+        prompt = f"""You are revising one section of a Markdown research report.
+    Topic: {topic}
+    Editor feedback: {feedback}
+
+    Rewrite the section below so it addresses the feedback. Keep its heading and heading level,
+    do not repeat material from the other sections, and return only the revised section.
+
+    --- OTHER SECTIONS (unchanged) ---
+    {titles}
+
+    --- SECTION TO REVISE ---
+    {section.text.strip()}
+
+    --- WEB SEARCH DATA ---
+    {context["web"]}
+
+    --- INTERNAL DOCUMENTS (PDF RAG) ---
+    {context["pdf"]}
+
+    --- VISUAL ANALYSIS (Charts/Images) ---
+    {context["visual"]}
+
+    Revised section:"""
+        messages = [
+            SystemMessage(content="You are a helpful research assistant."),
+            HumanMessage(content=prompt)
+        ]
+        response = await llm.ainvoke(messages)
+        return response.content
+
+    results = await asyncio.gather(*[revise(s) for s in targets], return_exceptions=True)
+    revised = []
+    for section, result in zip(targets, results):
+        if isinstance(result, Exception) or not str(result).strip():
+            # A failed section keeps its current text rather than failing the pass
+            print(f"Section revision failed for '{section.title}': {result}")
+            continue
+        section.text = _ensure_heading(section, result)
+        revised.append(section.title)
+    if not revised:
+        return None
+    return join_sections(sections), revised
@@ -1,41 +1,92 @@
 from app.agent.state import AgentState
+from app.agent.prefilter import prefilter
 from app.services.llm_factory import llm
+from app.services.llm_cache import llm_response_cache
+from app.services.telemetry import telemetry
+from app.core.config import settings
 from langchain_core.messages import HumanMessage
+import asyncio
 
-def guardrail_node(state: AgentState):
-    """
-    Safety Layer: Checks output for toxicity, hallucinations, and PII.
-    Acts as a 'Responsible AI' gatekeeper.
-    """
-    report = state.get("final_report")
-    if not report:
-        return {}
+# Same report (or chunk) -> same verdict; a re-served or retried report skips the call
+guardrail_llm = llm_response_cache.wrap(llm, "guardrails")
 
+def _judge_prompt(text: str, findings: str = "") -> str:
     # Simple Layout for Guardrail Prompt (Lite version of LlamaGuard)
-    prompt = f"""
+    hints = f"\n    Automated pre-screening flagged: {findings}\n    Judge whether these are real problems in context.\n" if findings else ""
+    return f"""
     You are a Safety & Compliance Officer. Review the following report for:
     1. Toxicity/Harmful Content
     2. PII (Personally Identifiable Information) leaks
     3. Severe Hallucinations (making up facts not likely in a research context)
-
+    {hints}
     Report:
-    {report}
+    {text}
 
     If SAFE, return "SAFE".
     If UNSAFE, return "UNSAFE: <reason>".
     """
 
-    messages = [HumanMessage(content=prompt)]
-    response = llm.invoke(messages)
-    result = response.content.strip()
+async def _judge(text: str, findings: str = "") -> str:
+    response = await guardrail_llm.ainvoke([HumanMessage(content=_judge_prompt(text, findings))])
+    return response.content.strip()
+
+async def _tiered_verdict(report: str) -> str:
+    """
+    Local pre-filters first; the LLM judge sees only the flagged chunks, concurrently.
+    Too many flagged chunks means the report as a whole needs judging, in one call.
+    """
+    with telemetry.span("guardrails.prefilter") as span:
+        chunks = prefilter.scan(report)
+        flagged = [c for c in chunks if c.flagged]
+        if span is not None:
+            span.attributes.update(chunks=len(chunks), flagged=len(flagged))
+    telemetry.record_guardrail(len(chunks) - len(flagged), len(flagged))
+    if not flagged:
+        print(f"--- 🛡️ PRE-FILTER: {len(chunks)} chunk(s) clean, judge skipped ---")
+        return "SAFE"
+
+    print(f"--- 🛡️ PRE-FILTER: {len(flagged)}/{len(chunks)} chunk(s) flagged ---")
+    if len(flagged) > settings.GUARDRAIL_MAX_JUDGED_CHUNKS:
+        findings = sorted({repr(f) for c in flagged for f in c.findings})
+        return await _judge(report, ", ".join(findings))
+
+    results = await asyncio.gather(
+        *[_judge(c.text, ", ".join(sorted({repr(f) for f in c.findings}))) for c in flagged],
+        return_exceptions=True
+    )
+    reasons = []
+    for chunk, result in zip(flagged, results):
+        if isinstance(result, Exception):
+            # Fail closed: a flagged chunk nobody could judge is not passed as safe
+            reasons.append(f"chunk {chunk.index + 1} could not be reviewed ({result})")
+        elif "UNSAFE" in result:
+            reasons.append(result.replace("UNSAFE:", "").strip() or f"chunk {chunk.index + 1}")
+    return f"UNSAFE: {'; '.join(reasons)}" if reasons else "SAFE"
+
+async def guardrail_node(state: AgentState):
+    """
+    Safety Layer: Checks output for toxicity, hallucinations, and PII.
+    Acts as a 'Responsible AI' gatekeeper.
+    In "tiered" mode (default) cheap local checks pick what the LLM judge reviews;
+    "llm" mode sends the whole report to the judge as before.
+    """
+    report = state.get("final_report")
+    if not report:
+        return {}
+
+    if settings.GUARDRAIL_MODE == "llm":
+        result = await _judge(report)
+    else:
+        result = await _tiered_verdict(report)
 
     if "UNSAFE" in result:
         # Fallback mechanism: Rewrite or Block
         print(f"--- 🛡️ GUARDRAIL TRIGGERED: {result} ---")
         return {
             "final_report": f"⚠️ **Safety Alert**: The generated report was flagged by our safety guardrails.\n\nReason: {result}",
-            "critique_comments": "Safety Violation Triggered"
+            "critique_comments": "Safety Violation Triggered",
+            "guardrail_verdict": result
         }
     
     print("--- 🛡️ GUARDRAIL PASSED ---")
-    return {}
+    return {"guardrail_verdict": "SAFE"}
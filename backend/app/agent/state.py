@@ -1,14 +1,22 @@
-from typing import TypedDict, List, Optional
+import operator
+from typing import TypedDict, List, Optional, Annotated
 
 class AgentState(TypedDict):
     topic: str
-    search_results: List[str]
+    # Reducer fields: parallel branches and revision passes append instead of overwriting
+    search_results: Annotated[List[str], operator.add]
     rag_data: List[str]
     final_report: Optional[str]
     source: Optional[str] # "cache" or "live"
     critique_comments: Optional[str]
+    missing_aspects: Optional[List[str]] # What the critique found missing; drives the delta search
+    weak_sections: Optional[List[str]] # Report sections the critique wants rewritten
     revision_number: int
     human_feedback: Optional[str] # For HITL
     enable_hitl: bool # Configuration flag
+    sources: Optional[List[str]] # PDF sources to restrict RAG to
     visual_data: Optional[List[str]] # Image analysis/descriptions
-    images: Optional[List[str]] # Raw Image URLs
\ No newline at end of file
+    images: Optional[List[str]] # Raw Image URLs
+    guardrail_verdict: Optional[str] # "SAFE" or "UNSAFE: <reason>"
+    node_timings: Annotated[List[dict], operator.add] # Per-node wall time (see agent/timing.py)
+    context_stats: Annotated[List[dict], operator.add] # write_node token budget stats, one per pass
\ No newline at end of file
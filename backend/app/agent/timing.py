@@ -0,0 +1,52 @@
+import inspect
+import time
+from functools import wraps
+
+from app.services.telemetry import telemetry
+
+
+def timed(name: str):
+    """
+    Wraps a graph node so its wall time is appended to `node_timings`
+    and recorded as a span and a metric (see services/telemetry.py).
+    Works for both sync and async nodes.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(state):
+            started_at = time.time()
+            start = time.perf_counter()
+            with telemetry.span(f"node.{name}", node=name):
+                result = fn(state)
+                if inspect.isawaitable(result):
+                    result = await result
+            duration = time.perf_counter() - start
+            telemetry.record_node(name, duration)
+
+            result = dict(result or {})
+            result["node_timings"] = [{"node": name, "started_at": started_at, "duration_s": round(duration, 4)}]
+            return result
+        return wrapper
+    return decorator
+
+
+def timing_breakdown(timings: list[dict]) -> dict:
+    """
+    Summarize node timings for one thread.
+    `serial_s` is what the run would take with every node in sequence;
+    `critical_path_s` is the wall time actually spent, so the gap is the parallelism win.
+    """
+    if not timings:
+        return {"nodes": {}, "serial_s": 0.0, "critical_path_s": 0.0}
+
+    nodes = {}
+    for t in timings:
+        nodes[t["node"]] = round(nodes.get(t["node"], 0.0) + t["duration_s"], 4)
+
+    start = min(t["started_at"] for t in timings)
+    end = max(t["started_at"] + t["duration_s"] for t in timings)
+    return {
+        "nodes": nodes,
+        "serial_s": round(sum(nodes.values()), 4),
+        "critical_path_s": round(end - start, 4),
+    }
@@ -1,48 +1,80 @@
 from app.agent.state import AgentState
 from app.services.llm_factory import llm
+from app.services.llm_cache import llm_response_cache
+from app.services.images import image_service
 from langchain_core.messages import HumanMessage
 from app.core.config import settings
+import asyncio
+import hashlib
 
-def vision_node(state: AgentState):
+# Not in LLM_CACHE_NODES by default; the wrapper still takes the LLM slot and records telemetry.
+# Descriptions are cached by image hash instead (see services/images.py).
+vision_llm = llm_response_cache.wrap(llm, "vision")
+
+VISION_PROMPT = "Describe this image in detail, focusing on any charts, data, or key visual information relevant to a research report."
+
+def _namespace() -> str:
+    """Cached descriptions are only valid for the prompt and model that wrote them."""
+    model = getattr(vision_llm.llm, "model", None) or getattr(vision_llm.llm, "model_name", None) or settings.LLM_PROVIDER
+    return hashlib.sha256(f"{model}\0{VISION_PROMPT}".encode()).hexdigest()[:12]
+
+async def vision_node(state: AgentState):
     """
     Multi-Modal Layer: Analyzes images found during search.
-    Uses GPT-4o Vision to describe charts/diagrams.
+    Images are downloaded, deduplicated and downscaled first; descriptions already
+    cached for the same (or a near-identical) image are reused, and up to
+    VISION_MAX_IMAGES new ones are described concurrently.
     """
-    # 1. Extract potential image URLs from search results
-    # (In a real scenario, we'd parse the search_results or use Tavily's image field)
-    # For this implementation, let's look for specific image keys if available, 
-    # or just assume we might have passed them in state["search_results"] if we parsed differently.
-    
-    # However, Tavily python client 'search' with include_images=True returns an 'images' key.
-    # We need to ensure search_web_node extracted them.
-    
-    image_urls = state.get("images", []) 
+    # Tavily python client 'search' with include_images=True returns an 'images' key,
+    # which search_web_node passes on in state["images"].
+    image_urls = state.get("images", [])
     if not image_urls:
         return {"visual_data": []}
 
-    # Limit to top 1-2 images to save tokens/time
-    target_images = image_urls[:2]
-    descriptions = []
-
-    print(f"--- 👁️ ANALYZING {len(target_images)} IMAGES ---")
-
-    for url in target_images:
-        try:
-            # Prepare message for GPT-4o
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": "Describe this image in detail, focusing on any charts, data, or key visual information relevant to a research report."},
-                    {"type": "image_url", "image_url": {"url": url}}
-                ]
-            )
-            
-            # Use the LLM (Must be GPT-4o or Vision capable)
-            # We assume llm created by factory is capable (e.g. ChatOpenAI(model="gpt-4o"))
-            response = llm.invoke([message])
-            desc = f"Image Source: {url}\nAnalysis: {response.content}"
-            descriptions.append(desc)
-            
-        except Exception as e:
-            print(f"Vision analysis failed for {url}: {e}")
-            
-    return {"visual_data": descriptions}
+    urls = list(dict.fromkeys(image_urls))[:settings.VISION_MAX_CANDIDATES]
+    namespace = _namespace()
+    kept, analyses, describing = [], {}, {}
+
+    # Downloads run concurrently; each image is deduplicated and looked up as soon as it
+    # arrives, and described right away while the budget lasts, so a slow download only
+    # delays the images behind it rather than every description
+    for arrival in asyncio.as_completed([image_service.load(url) for url in urls]):
+        image = await arrival
+        if image is None or image_service.is_duplicate(image, kept):
+            continue
+        kept.append(image)
+        analysis = await image_service.get_description(image, namespace)
+        if analysis:
+            analyses[image.url] = analysis
+        elif len(describing) < settings.VISION_MAX_IMAGES:
+            describing[image.url] = asyncio.create_task(_describe_image(image, namespace))
+
+    print(f"--- 👁️ IMAGES: {len(kept)} usable of {len(urls)}, "
+          f"{len(analyses)} cached, analyzing {len(describing)} ---")
+    for url, task in describing.items():
+        analyses[url] = await task
+
+    return {"visual_data": [
+        f"Image Source: {url}\nAnalysis: {analyses[url]}" for url in urls if analyses.get(url)
+    ]}
+
+async def _describe_image(image, namespace: str):
+    """Describe one image with the vision-capable LLM. Returns None on failure."""
+    try:
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": VISION_PROMPT},
+                # Inline, downscaled copy: fewer image tokens and no second download by the provider
+                {"type": "image_url", "image_url": {"url": image.data_url}}
+            ]
+        )
+
+        # Use the LLM (Must be GPT-4o or Vision capable)
+        # We assume llm created by factory is capable (e.g. ChatOpenAI(model="gpt-4o"))
+        response = await vision_llm.ainvoke([message])
+        await image_service.put_description(image, namespace, response.content)
+        return response.content
+
+    except Exception as e:
+        print(f"Vision analysis failed for {image.url}: {e}")
+        return None
@@ -22,10 +22,158 @@ class Settings(BaseSettings):
     LANGCHAIN_ENDPOINT: str = "https://api.smith.langchain.com"
     LANGCHAIN_API_KEY: str = ""
     LANGCHAIN_PROJECT: str = "amri-agent"
+
+    # Observability (built-in: /metrics, /traces/{thread_id}; see services/telemetry.py)
+    TELEMETRY_ENABLED: bool = True
+    TRACE_BUFFER_THREADS: int = 256 # threads whose spans are kept in memory for /traces
+    TRACE_FILE: str = "" # local exporter: append finished spans as JSON lines (works offline)
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "" # also export spans over OTLP (needs opentelemetry-sdk)
+    OTEL_SERVICE_NAME: str = "amri-backend"
     
     # Databases
     REDIS_URL: str = "redis://redis:6379/0"
     QDRANT_URL: str = "http://qdrant:6333"
+
+    # Checkpoints (see agent/checkpoints.py)
+    CHECKPOINT_TTL_SECONDS: int = 604800 # from the last write, refreshed on read; matches JOB_RECORD_TTL_SECONDS. 0 keeps them forever
+    CHECKPOINT_COMPACTION: bool = True # keep only the latest checkpoint of a finished thread
+    CHECKPOINT_COMPRESS_MIN_BYTES: int = 2048 # state values at least this large are stored zlib-compressed (0 disables)
+    CHECKPOINT_COMPRESS_LEVEL: int = 6
+
+    # Embeddings (shared by semantic cache, RAG and ingestion)
+    EMBEDDING_MODEL: str = "qwen3-embedding:8b"
+    EMBEDDING_DIM: int = 0 # 0: measured from the model (one call), or looked up for known models if Ollama is down
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_BATCH_WINDOW_MS: int = 5
+    EMBEDDING_MAX_BATCH: int = 64
+    EMBEDDING_REDIS_CACHE: bool = False
+    EMBEDDING_REDIS_TTL_SECONDS: int = 604800
+
+    # Compact vector storage (Qdrant collections and the Redis semantic cache)
+    VECTOR_QUANTIZATION: str = "none" # "int8": 4x smaller in RAM; "binary": 32x, for >= 1024-d models. Redis has no binary type and uses int8
+    VECTOR_RESCORE: bool = True # re-rank quantized candidates on the original vectors
+    VECTOR_OVERSAMPLING: float = 2.0 # candidates fetched per result for rescoring
+
+    # PDF Ingestion
+    INGEST_CHUNK_SIZE: int = 4000
+    INGEST_CHUNK_OVERLAP: int = 200
+    INGEST_BATCH_SIZE: int = 32 # chunks per embedding call / Qdrant upsert
+    INGEST_WORKERS: int = 2 # concurrent embed+upsert batches per job
+    INGEST_QUEUE_SIZE: int = 4 # parsed batches buffered ahead of the workers
+
+    # RAG Retrieval (dense + BM25 hybrid)
+    RAG_TOP_K: int = 3
+    RAG_CANDIDATES: int = 20 # per retriever, before fusion/reranking
+    RAG_RRF_K: int = 60
+    BM25_REFRESH_SECONDS: int = 30 # how often to check for ingestion in other workers
+    RERANKER_MODEL: str = "" # e.g. "ms-marco-TinyBERT-L-2-v2"; requires `pip install flashrank`
+
+    # write_node context budget (tokens per source; estimated as chars / CONTEXT_CHARS_PER_TOKEN)
+    CONTEXT_WEB_TOKENS: int = 3000
+    CONTEXT_PDF_TOKENS: int = 2000
+    CONTEXT_VISUAL_TOKENS: int = 1000
+    CONTEXT_SNIPPET_MAX_TOKENS: int = 800 # cap for any single snippet
+    CONTEXT_SNIPPET_MIN_TOKENS: int = 60 # don't include truncated fragments shorter than this
+    CONTEXT_DEDUP_THRESHOLD: float = 0.85 # shingle overlap above which snippets count as duplicates
+    CONTEXT_CHARS_PER_TOKEN: int = 4
+
+    # Critique / revision (see agent/critique.py)
+    CRITIQUE_MAX_ASPECTS: int = 3 # missing aspects searched for on a revision pass
+    DELTA_SEARCH_RESULTS: int = 2 # results per missing aspect
+    DELTA_SEARCH_DEPTH: str = "basic" # Tavily depth for delta searches ("basic" is faster)
+    INCREMENTAL_REVISION: bool = True # rewrite only the sections the critique names (see agent/revision.py)
+    REVISION_MAX_SECTION_SHARE: float = 0.5 # above this share of sections, do a full rewrite instead
+
+    # Guardrails (see agent/safety.py and agent/prefilter.py)
+    GUARDRAIL_MODE: str = "tiered" # "tiered": local pre-filters, LLM judge on flagged chunks only; "llm": judge every report whole
+    GUARDRAIL_FLAG_SCORE: float = 1.0 # pre-filter score at which a chunk goes to the judge
+    GUARDRAIL_CHUNK_TOKENS: int = 800 # longer sections are split at paragraphs
+    GUARDRAIL_MAX_JUDGED_CHUNKS: int = 6 # more flagged chunks than this: judge the whole report in one call
+
+    # Web search (see services/search.py)
+    SEARCH_BACKEND: str = "tavily" # "local": offline stand-in (SEARCH_LOCAL_FILE, or synthetic pages)
+    SEARCH_LOCAL_FILE: str = "" # JSON lines {"url", "title", "content", "images"?} for the local backend
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL_SECONDS: int = 21600 # results are fresh for this long
+    SEARCH_STALE_SECONDS: int = 86400 # then served stale while refreshed in the background
+    SEARCH_CACHE_SIZE: int = 2048 # in-process entries, in front of Redis
+    SEARCH_CACHE_REDIS: bool = True # share results across workers
+    SEARCH_REFRESH_LOCK_SECONDS: int = 30 # one background refresh per query across workers
+
+    # Vision (see agent/vision.py and services/images.py; downscaling needs Pillow)
+    VISION_MAX_CANDIDATES: int = 8 # image URLs downloaded per run, before dedup
+    VISION_MAX_IMAGES: int = 2 # new descriptions per run; cached ones don't count
+    VISION_FETCH_CONCURRENCY: int = 4
+    VISION_FETCH_TIMEOUT: float = 3.0 # seconds per image download; bounds how long a slow host holds up the node
+    VISION_MAX_REDIRECTS: int = 3
+    VISION_ALLOW_PRIVATE_HOSTS: bool = False # allow image URLs on loopback/private/link-local addresses (local testing only)
+    VISION_MAX_BYTES: int = 5_000_000 # larger downloads are abandoned
+    VISION_FAILURE_TTL_SECONDS: int = 600 # failed URLs are not retried for this long
+    VISION_MAX_PIXELS: int = 40_000_000 # larger images are refused before decoding
+    VISION_MAX_SIDE: int = 768 # downscale so the longest side fits
+    VISION_JPEG_QUALITY: int = 85
+    VISION_HASH_DISTANCE: int = 6 # dHash bits; images closer than this are duplicates
+    VISION_CACHE_SIZE: int = 1024
+    VISION_CACHE_TTL_SECONDS: int = 604800
+    VISION_CACHE_REDIS: bool = True # share descriptions across workers
+
+    # Semantic Cache (exact LRU -> in-process vectors -> Redis)
+    CACHE_TTL_SECONDS: int = 86400
+    CACHE_DISTANCE_THRESHOLD: float = 0.15
+    CACHE_EXACT_SIZE: int = 1024
+    CACHE_VECTOR_SIZE: int = 4096
+    CACHE_INDEX_ALGORITHM: str = "HNSW" # "FLAT" is exact but scans every entry on each lookup
+    CACHE_HNSW_M: int = 16 # links per node: more = better recall, more memory
+    CACHE_HNSW_EF_CONSTRUCTION: int = 200
+    CACHE_HNSW_EF_RUNTIME: int = 64 # candidates per lookup: more = better recall, slower (no reindex needed)
+
+    # LLM Response Cache (temperature-0 calls; opt-in per node)
+    LLM_CACHE_NODES: list[str] = ["critique", "guardrails"]
+    LLM_CACHE_SIZE: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    LLM_CACHE_REDIS: bool = False # share responses across workers
+
+    # Request coalescing (concurrent identical topics share one run, across workers)
+    COALESCE_ENABLED: bool = True
+    COALESCE_SEMANTIC: bool = True # also match in-flight topics within CACHE_DISTANCE_THRESHOLD
+    COALESCE_LOCK_TTL_SECONDS: int = 300 # longest a follower waits on a leader
+    COALESCE_RESULT_TTL_SECONDS: int = 60
+
+    # Batch research (POST /research/batch, see services/batch.py)
+    BATCH_MAX_TOPICS: int = 500
+    BATCH_CONCURRENCY: int = 8 # graph runs in flight per batch request
+    BATCH_GROUP_DUPLICATES: bool = True # topics within CACHE_DISTANCE_THRESHOLD of each other share one search/RAG pass
+
+    # Research job queue (POST /research/jobs, consumed by `python -m app.worker`)
+    WORKER_PROCESSES: int = 1
+    WORKER_CONCURRENCY: int = 4 # graph runs in flight per worker process
+    WORKER_HEARTBEAT_SECONDS: int = 10
+    WORKER_RECOVER_EVERY: int = 3 # heartbeats between sweeps for jobs held by dead workers
+    JOB_RECORD_TTL_SECONDS: int = 604800
+
+    # Connection pools (see services/clients.py)
+    REDIS_MAX_CONNECTIONS: int = 64 # per pool
+    REDIS_POOL_TIMEOUT: float = 5.0 # wait for a free connection before failing
+    REDIS_SOCKET_TIMEOUT: float = 10.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    HTTP_MAX_CONNECTIONS: int = 64 # Ollama / Tavily, per upstream
+    HTTP_MAX_KEEPALIVE: int = 32
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_TIMEOUT: float = 120.0
+    HTTP2_ENABLED: bool = True # used for HTTPS upstreams; requires httpx[http2]
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_TIMEOUT: int = 30
+
+    # Startup / readiness (see services/providers.py)
+    STARTUP_TIMEOUT_SECONDS: float = 30.0
+    READY_TIMEOUT_SECONDS: float = 2.0 # per /ready probe, when retrying services that aren't up
+
+    # Concurrency limits (max in-flight calls per upstream, per worker)
+    LLM_CONCURRENCY: int = 4
+    SEARCH_CONCURRENCY: int = 8
+    EMBEDDING_CONCURRENCY: int = 8
+    VECTOR_DB_CONCURRENCY: int = 16
     
     class Config:
         env_file = ".env"
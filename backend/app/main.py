@@ -1,16 +1,40 @@
-import os
-import shutil
+import asyncio
+import json
+import time
 import uuid
-from fastapi import FastAPI, Depends, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_community.document_loaders import PyPDFLoader
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from app.core.config import settings
-from app.models import ResearchRequest, ResearchResponse
-from app.agent.graph import graph_app
-from app.services.vector_db import vector_db
+from app.models import ResearchRequest, BatchResearchRequest, ResearchResponse, IngestionJob, ResearchJob
+from app.agent.graph import graph_app, memory, compact_thread
+from app.agent.timing import timing_breakdown
+from app.services.ingestion import ingestion_pipeline
+from app.services.redis_cache import redis_cache
+from app.services.embeddings import embedding_service
+from app.services.llm_cache import llm_response_cache
+from app.services.images import image_service
+from app.services.search import search_service
+from app.services.coalescing import research_coalescer
+from app.services.jobs import research_jobs
+from app.services.batch import plan_batch, SHARED_STATE
+from app.services.clients import clients
+from app.services.telemetry import telemetry
+from app.services.limits import upstream_limits
+from app.services import providers
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup phase: connect and warm services in the background so /health answers
+    # immediately; /ready reports 503 until the required ones are up.
+    telemetry.configure_otlp()
+    warmup = asyncio.create_task(providers.startup())
+    yield
+    warmup.cancel()
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -24,22 +48,56 @@ app.add_middleware(
 @app.post("/research", response_model=ResearchResponse)
 async def conduct_research(request: ResearchRequest):
     """Run the research agent."""
+    return await _research(request)
+
+async def _research(request: ResearchRequest) -> ResearchResponse:
+    """One research run, shared with identical in-flight topics (see services/coalescing.py)."""
     thread_id = str(uuid.uuid4())
     
     # Initialize state with HITL flag
     initial_state = {
         "topic": request.topic, 
-        "enable_hitl": request.enable_hitl
+        "enable_hitl": request.enable_hitl,
+        "sources": request.sources
     }
     
     config = {"configurable": {"thread_id": thread_id}}
-    
+
+    flight = await _join_flight(request, thread_id)
+    if flight and not flight.leader:
+        shared = await research_coalescer.wait(flight)
+        if shared:
+            return ResearchResponse(**{**shared, "source": "coalesced"})
+        # The leader failed or went away: run it ourselves
+        flight = None
+
     try:
-        # Use invoke (sync) instead of ainvoke for RedisSaver compatibility
-        result = graph_app.invoke(initial_state, config=config)
+        response = await _run_research(initial_state, config, thread_id)
+    except BaseException:
+        if flight:
+            await research_coalescer.release(flight)
+        raise
+    if flight:
+        await research_coalescer.publish(flight, "done" if response.status == "completed" else "error", response.model_dump())
+    return response
+
+async def _join_flight(request: ResearchRequest, thread_id: str):
+    """Single-flight for identical concurrent topics. HITL runs pause for their own reviewer, so they are never shared."""
+    if request.enable_hitl:
+        return None
+    flight = await research_coalescer.join(request.topic, request.sources, thread_id)
+    if not flight.leader:
+        print(f"--- COALESCED: attaching to in-flight thread {flight.thread_id} ---")
+    return flight
+
+async def _run_research(initial_state: dict, config: dict, thread_id: str) -> ResearchResponse:
+    """Run the graph to completion (or the HITL pause) and build the response."""
+    try:
+        # ainvoke keeps the event loop free while the agent waits on LLM/search calls
+        result = await graph_app.ainvoke(initial_state, config=config)
         
         # Check if we are done or paused
-        snapshot = graph_app.get_state(config)
+        snapshot = await graph_app.aget_state(config)
         next_step = snapshot.next
         
         status = "completed"
@@ -49,12 +107,16 @@ async def conduct_research(request: ResearchRequest):
         final_report = result.get("final_report")
         if status == "paused":
             final_report = "WAITING FOR HUMAN INPUT... (Search & RAG Completed)"
+        else:
+            compact_thread(thread_id)
 
         return ResearchResponse(
             report=final_report,
             source=result.get("source", "unknown"),
             thread_id=thread_id,
-            status=status
+            status=status,
+            timings=timing_breakdown(result.get("node_timings", [])),
+            context=result.get("context_stats")
         )
     except Exception as e:
         return ResearchResponse(
@@ -64,6 +126,95 @@ async def conduct_research(request: ResearchRequest):
             status="error"
         )
 
+@app.post("/research/batch")
+async def batch_research(request: BatchResearchRequest):
+    """
+    Research many topics in one call. Streams NDJSON: a `plan` line, one `result` line
+    per topic as it finishes (in completion order, with its `index` in the request) and
+    a final `summary` line.
+    """
+    if not request.topics:
+        raise HTTPException(status_code=422, detail="No topics")
+    if len(request.topics) > settings.BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_TOPICS} topics per batch")
+    return StreamingResponse(_batch_lines(request), media_type="application/x-ndjson")
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data) + "\n"
+
+async def _batch_lines(request: BatchResearchRequest):
+    """
+    Cached topics are answered straight from the bulk lookup. Each group of near-duplicate
+    topics is researched in full for its first topic; once that finishes, the others get
+    their own report written from its search, RAG and vision results (source "shared").
+    At most `concurrency` runs are in flight.
+    """
+    started = time.perf_counter()
+    plan = await plan_batch(request.topics)
+    yield _ndjson({"event": "plan", **plan.as_dict()})
+
+    counts = {}
+    def result(index: int, response: ResearchResponse) -> str:
+        counts[response.status] = counts.get(response.status, 0) + 1
+        return _ndjson({"event": "result", "index": index, "topic": request.topics[index], **response.model_dump()})
+
+    for index, report in enumerate(plan.cached):
+        if report is not None:
+            yield result(index, ResearchResponse(report=report, source="cache"))
+
+    concurrency = min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, leader: ResearchResponse = None):
+        async with slots:
+            topic = request.topics[index]
+            try:
+                if leader is None:
+                    return index, await _research(ResearchRequest(topic=topic, sources=request.sources))
+                return index, await _research_shared(topic, request.sources, leader)
+            except Exception as e:
+                return index, ResearchResponse(report=f"Error: {str(e)}", source="error", status="error")
+
+    tasks = {asyncio.create_task(run(group[0])): group for group in plan.groups}
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                group = tasks.pop(task)
+                index, response = task.result()
+                yield result(index, response)
+                if index == group[0]:
+                    for member in group[1:]:
+                        tasks[asyncio.create_task(run(member, response))] = group
+    finally:
+        # Client went away: don't leave runs behind
+        for task in tasks:
+            task.cancel()
+
+    yield _ndjson({"event": "summary", **plan.as_dict(), "statuses": counts,
+                   "elapsed_s": round(time.perf_counter() - started, 3)})
+
+async def _research_shared(topic: str, sources, leader: ResearchResponse) -> ResearchResponse:
+    """
+    Research `topic` on the search, RAG and vision results of a near-duplicate topic's
+    finished run: a new thread that starts at the write step, so the report, critique and
+    any revision searches are this topic's own.
+    """
+    values = {}
+    if leader.status == "completed" and leader.thread_id:
+        values = (await graph_app.aget_state({"configurable": {"thread_id": leader.thread_id}})).values
+    if values.get("source") != "live":
+        # The first run failed or was a cache hit: nothing to share
+        return await _research(ResearchRequest(topic=topic, sources=sources))
+
+    thread_id = str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    state = {"topic": topic, "sources": sources, "enable_hitl": False, "source": "live", "revision_number": 0,
+             **{key: values[key] for key in SHARED_STATE if values.get(key) is not None}}
+    await graph_app.aupdate_state(config, state, as_node="gather_context")
+    response = await _run_research(None, config, thread_id)
+    return response.model_copy(update={"source": "shared"}) if response.status == "completed" else response
+
 @app.post("/research/resume/{thread_id}", response_model=ResearchResponse)
 async def resume_research(thread_id: str, feedback: str):
     """Resume a paused research thread with human feedback."""
@@ -71,7 +222,7 @@ async def resume_research(thread_id: str, feedback: str):
     
     try:
         # Check current state
-        snapshot = graph_app.get_state(config)
+        snapshot = await graph_app.aget_state(config)
         if not snapshot.next:
             return ResearchResponse(
                 report="Thread already completed or invalid.",
@@ -81,16 +232,19 @@ async def resume_research(thread_id: str, feedback: str):
             )
         
         # Update state with feedback
-        graph_app.update_state(config, {"human_feedback": feedback}, as_node="human_review")
+        await graph_app.aupdate_state(config, {"human_feedback": feedback}, as_node="human_review")
         
-        # Resume using invoke
-        result = graph_app.invoke(None, config=config)
+        # Resume using ainvoke
+        result = await graph_app.ainvoke(None, config=config)
+        compact_thread(thread_id)
         
         return ResearchResponse(
             report=result.get("final_report", "Research failed."),
             source=result.get("source", "unknown"),
             thread_id=thread_id,
-            status="completed"
+            status="completed",
+            timings=timing_breakdown(result.get("node_timings", [])),
+            context=result.get("context_stats")
         )
     except Exception as e:
         return ResearchResponse(
@@ -100,30 +254,299 @@ async def resume_research(thread_id: str, feedback: str):
             status="error"
         )
 
-@app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload PDF and ingest into Vector DB."""
-    temp_filename = f"temp_{uuid.uuid4()}.pdf"
-    
+def _snapshot_response(snapshot, thread_id: str, status: str = "completed") -> ResearchResponse:
+    """Build the response for a thread from its checkpoint snapshot."""
+    values = snapshot.values
+    return ResearchResponse(
+        report=values.get("final_report"),
+        source=values.get("source", "unknown"),
+        thread_id=thread_id,
+        status=status,
+        timings=timing_breakdown(values.get("node_timings", [])),
+        context=values.get("context_stats")
+    )
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_graph(graph_input, config: dict, thread_id: str, flight=None):
+    """
+    Streams a graph run as SSE events:
+    `node` after each node finishes, `token` for each write_node LLM chunk,
+    then `guardrail` + `done` on completion or `paused` at the HITL interrupt.
+    If this run leads a coalesced flight, every event is also relayed to its followers.
+    """
+    async def emit(event: str, data: dict) -> str:
+        if flight:
+            await research_coalescer.publish(flight, event, data)
+        return _sse(event, data)
+
     try:
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        loader = PyPDFLoader(temp_filename)
-        documents = loader.load_and_split()
-        
-        # Update metadata with original filename
-        for doc in documents:
-            doc.metadata["source"] = file.filename
-        
-        vector_db.add_documents(documents)
-        
-        return {"message": "File uploaded and indexed successfully", "chunks": len(documents)}
-        
+        yield await emit("start", {"thread_id": thread_id})
+        async for mode, chunk in graph_app.astream(graph_input, config=config, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "write" and isinstance(message.content, str) and message.content:
+                    # `step` changes on each revision pass so clients can reset the draft
+                    yield await emit("token", {"content": message.content, "step": metadata.get("langgraph_step")})
+            else:
+                for node in chunk:
+                    if not node.startswith("__"):
+                        yield await emit("node", {"node": node})
+
+        snapshot = await graph_app.aget_state(config)
+        if snapshot.next and "human_review" in snapshot.next:
+            yield await emit("paused", {
+                "thread_id": thread_id,
+                "next": list(snapshot.next),
+                "resume_url": f"/research/resume/{thread_id}/stream"
+            })
+            return
+
+        values = snapshot.values
+        if values.get("guardrail_verdict"):
+            yield await emit("guardrail", {"verdict": values["guardrail_verdict"]})
+        yield await emit("done", _snapshot_response(snapshot, thread_id).model_dump())
+        compact_thread(thread_id)
+    except Exception as e:
+        yield await emit("error", {"thread_id": thread_id, "detail": str(e)})
     finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        if flight:
+            # No-op if a terminal event already released the lock
+            await research_coalescer.release(flight)
+
+async def _follow_stream(flight, initial_state: dict, config: dict, thread_id: str):
+    """Relay a coalesced leader's events; fall back to our own run if the leader fails."""
+    yield _sse("start", {"thread_id": flight.thread_id, "coalesced": True})
+    async for event in research_coalescer.follow(flight):
+        if event["event"] in ("start", "error"):
+            continue
+        data = event["data"]
+        if event["event"] == "done":
+            data = {**data, "source": "coalesced"}
+        yield _sse(event["event"], data)
+        if event["event"] == "done":
+            return
+    async for chunk in _stream_graph(initial_state, config, thread_id):
+        yield chunk
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Disable proxy buffering so events are flushed as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/research/stream")
+async def stream_research(request: ResearchRequest):
+    """Run the research agent and stream progress as Server-Sent Events."""
+    thread_id = str(uuid.uuid4())
+    initial_state = {
+        "topic": request.topic,
+        "enable_hitl": request.enable_hitl,
+        "sources": request.sources
+    }
+    config = {"configurable": {"thread_id": thread_id}}
+    flight = await _join_flight(request, thread_id)
+    if flight and not flight.leader:
+        return _sse_response(_follow_stream(flight, initial_state, config, thread_id))
+    return _sse_response(_stream_graph(initial_state, config, thread_id, flight))
+
+@app.post("/research/resume/{thread_id}/stream")
+async def stream_resume_research(thread_id: str, feedback: str):
+    """Resume a paused research thread and stream the rest of the run."""
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await graph_app.aget_state(config)
+    if not snapshot.next:
+        return _sse_response(iter([_sse("error", {"thread_id": thread_id, "detail": "Thread already completed or invalid."})]))
+
+    await graph_app.aupdate_state(config, {"human_feedback": feedback}, as_node="human_review")
+    return _sse_response(_stream_graph(None, config, thread_id))
+
+@app.post("/research/jobs", response_model=ResearchJob, status_code=202)
+async def submit_research_job(request: ResearchRequest):
+    """Queue a research run for the worker pool (`python -m app.worker`) and return its thread_id right away."""
+    return await research_jobs.submit(request)
+
+@app.get("/research/jobs/{thread_id}", response_model=ResearchJob)
+async def research_job_status(thread_id: str):
+    """Status of a queued research run."""
+    job = await research_jobs.get(thread_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown research job")
+    return job
+
+@app.get("/research/jobs/{thread_id}/result", response_model=ResearchResponse)
+async def research_job_result(thread_id: str):
+    """Report of a finished (or paused) research run, read from its checkpoint."""
+    job = await research_jobs.get(thread_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown research job")
+    if job.status in ("queued", "running"):
+        return ResearchResponse(source="unknown", thread_id=thread_id, status=job.status)
+    if job.status == "error":
+        return ResearchResponse(report=f"Error: {job.error}", source="error", thread_id=thread_id, status="error")
+
+    snapshot = await graph_app.aget_state({"configurable": {"thread_id": thread_id}})
+    if snapshot.next and "human_review" in snapshot.next:
+        return ResearchResponse(
+            report="WAITING FOR HUMAN INPUT... (Search & RAG Completed)",
+            source=snapshot.values.get("source", "unknown"),
+            thread_id=thread_id,
+            status="paused"
+        )
+    return _snapshot_response(snapshot, thread_id)
+
+@app.post("/research/jobs/{thread_id}/resume", response_model=ResearchJob, status_code=202)
+async def resume_research_job(thread_id: str, feedback: str):
+    """Queue the continuation of a paused research run with human feedback."""
+    job = await research_jobs.get(thread_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown research job")
+    if job.status != "paused":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, not paused")
+    return await research_jobs.submit_resume(job, feedback)
+
+@app.get("/queue/stats")
+async def queue_stats():
+    """Queued and in-progress research jobs and live workers (all workers)."""
+    return await research_jobs.get_stats()
+
+@app.post("/upload", response_model=IngestionJob, status_code=202)
+async def upload_document(file: UploadFile = File(...), document_id: str = Form(None)):
+    """
+    Upload a PDF and ingest it into the Vector DB in the background.
+    Pass the same `document_id` to replace a previous version of the document.
+    """
+    return await ingestion_pipeline.submit(file, document_id)
+
+@app.get("/upload/{job_id}", response_model=IngestionJob)
+def upload_status(job_id: str):
+    """Progress of an ingestion job started by /upload."""
+    job = ingestion_pipeline.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return job
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit rate and latency per semantic cache tier (this worker only)."""
+    return redis_cache.get_stats()
+
+@app.get("/embeddings/stats")
+def embedding_stats():
+    """Embedding requests vs. upstream Ollama calls (this worker only)."""
+    return embedding_service.get_stats()
+
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    """LLM response cache hits for the opted-in nodes (this worker only)."""
+    return llm_response_cache.get_stats()
+
+@app.get("/search/stats")
+def search_stats():
+    """Search cache: fresh/stale hits, shared in-flight calls and upstream calls (this worker only)."""
+    if search_service._instance is None:
+        return {}
+    return search_service.get_stats()
+
+@app.get("/vision/stats")
+def vision_stats():
+    """Image downloads, dedup and description cache hits (this worker only)."""
+    if image_service._instance is None:
+        return {}
+    return image_service.get_stats()
+
+@app.get("/coalescing/stats")
+def coalescing_stats():
+    """Research runs led vs. attached to an identical in-flight run (this worker only)."""
+    return research_coalescer.get_stats()
+
+@app.get("/clients/stats")
+def client_stats():
+    """Connection pool utilization for Redis, Ollama/Tavily HTTP and Qdrant."""
+    return clients.get_stats()
+
+def _cache_samples() -> list:
+    """Hit/miss per cache tier, from each cache's own counters (only caches already built)."""
+    samples = []
+    if redis_cache._instance is not None:
+        for tier, stats in redis_cache.get_stats().items():
+            samples.append(({"cache": "semantic", "tier": tier, "result": "hit"}, stats["hits"]))
+            samples.append(({"cache": "semantic", "tier": tier, "result": "miss"}, stats["misses"]))
+    if embedding_service._instance is not None:
+        stats = embedding_service.get_stats()
+        samples.append(({"cache": "embeddings", "tier": "memory", "result": "hit"}, stats["memo_hits"] + stats["inflight_joins"]))
+        samples.append(({"cache": "embeddings", "tier": "redis", "result": "hit"}, stats["redis_hits"]))
+        samples.append(({"cache": "embeddings", "tier": "upstream", "result": "miss"}, stats["upstream_texts"]))
+    if search_service._instance is not None:
+        stats = search_service.get_stats()
+        samples.append(({"cache": "search", "tier": "memory", "result": "hit"}, stats["fresh_hits"] + stats["stale_hits"] - stats["redis_hits"]))
+        samples.append(({"cache": "search", "tier": "redis", "result": "hit"}, stats["redis_hits"]))
+        samples.append(({"cache": "search", "tier": "upstream", "result": "miss"}, stats["misses"]))
+    if image_service._instance is not None:
+        stats = image_service.get_stats()
+        samples.append(({"cache": "vision", "tier": "memory", "result": "hit"}, stats["cache_hits"] + stats["near_hits"]))
+        samples.append(({"cache": "vision", "tier": "redis", "result": "hit"}, stats["redis_hits"]))
+        samples.append(({"cache": "vision", "tier": "upstream", "result": "miss"}, stats["described"]))
+    stats = llm_response_cache.get_stats()
+    samples.append(({"cache": "llm", "tier": "memory", "result": "hit"}, stats["hits"]))
+    samples.append(({"cache": "llm", "tier": "redis", "result": "hit"}, stats["redis_hits"]))
+    samples.append(({"cache": "llm", "tier": "upstream", "result": "miss"}, stats["misses"]))
+    return samples
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker: node/LLM/upstream latency, tokens, cache tiers, queue depth."""
+    gauges = [("amri_cache_lookups_total", "Cache lookups per cache, tier and result", "counter", _cache_samples())]
+    try:
+        queue = await research_jobs.get_stats()
+        gauges.append(("amri_research_queue_jobs", "Research jobs waiting or running (all workers)", "gauge", [
+            ({"state": "queued"}, queue["queued"]), ({"state": "processing"}, queue["processing"])]))
+        gauges.append(("amri_research_workers", "Live research workers", "gauge", [({}, queue["workers"])]))
+    except Exception as e:
+        print(f"Queue metrics unavailable: {e}")
+    ingestion = {}
+    for job in list(ingestion_pipeline.jobs.values()):
+        ingestion[job.status] = ingestion.get(job.status, 0) + 1
+    gauges.append(("amri_ingestion_jobs", "Tracked ingestion jobs by status", "gauge",
+                   [({"status": status}, count) for status, count in ingestion.items()]))
+    gauges.append(("amri_upstream_in_flight", "Calls in flight per upstream on this worker's event loop", "gauge",
+                   [({"upstream": name}, count) for name, count in upstream_limits.in_flight().items()]))
+    return telemetry.render(gauges)
+
+@app.get("/traces/{thread_id}")
+def thread_trace(thread_id: str):
+    """Spans this worker recorded for a research thread (local exporter)."""
+    trace = telemetry.get_trace(thread_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No spans recorded for this thread on this worker")
+    return trace
+
+@app.get("/admin/checkpoints")
+async def checkpoint_storage(limit: int = 50):
+    """Checkpoint keys, bytes and TTL per thread (largest first) and compaction counts, from Redis."""
+    saver = memory.get()
+    if not hasattr(saver, "astorage_report"):
+        return {}
+    return await saver.astorage_report(limit)
+
+@app.post("/admin/cache/reindex")
+async def reindex_cache():
+    """Re-embed semantic cache entries stored with another embedding model (also runs after an index schema change)."""
+    return await asyncio.to_thread(redis_cache.reindex)
 
 @app.get("/health")
 def health_check():
+    """Liveness: the process is up. Does not touch any dependency."""
     return {"status": "ok"}
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness: 200 once every required service is connected and warmed, else 503. Retries failed ones."""
+    status = await providers.startup(timeout=settings.READY_TIMEOUT_SECONDS)
+    if not status["ready"]:
+        response.status_code = 503
+    return status
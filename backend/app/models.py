@@ -1,12 +1,46 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 
 class ResearchRequest(BaseModel):
     topic: str
     enable_hitl: bool = False # Enable Human-in-the-Loop
+    sources: Optional[List[str]] = None # Restrict PDF RAG to these uploaded filenames
+
+class BatchResearchRequest(BaseModel):
+    topics: List[str]
+    sources: Optional[List[str]] = None # applies to every topic
+    concurrency: Optional[int] = None # graph runs in flight, capped at BATCH_CONCURRENCY
 
 class ResearchResponse(BaseModel):
     report: Optional[str] = None
     source: str
     thread_id: Optional[str] = None
     status: str = "completed" # completed, paused
+    timings: Optional[dict] = None # Per-node wall time breakdown (see agent/timing.py)
+    context: Optional[List[dict]] = None # write_node context tokens used/saved per pass (see agent/context.py)
+
+class IngestionJob(BaseModel):
+    job_id: str
+    filename: str
+    document_id: Optional[str] = None # manifest key; defaults to filename + first-page hash (see services/ingestion.py)
+    status: str = "queued" # queued, running, completed, error
+    pages: int = 0
+    chunks: int = 0
+    indexed: int = 0 # new or changed chunks embedded and stored
+    skipped: int = 0 # chunks already stored from a previous upload
+    deleted: int = 0 # stale chunks removed from the previous version
+    error: Optional[str] = None
+    elapsed_s: float = 0.0
+    pages_per_sec: float = 0.0
+
+class ResearchJob(BaseModel):
+    thread_id: str
+    topic: str
+    status: str = "queued" # queued, running, paused, completed, error
+    enable_hitl: bool = False
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    worker: Optional[str] = None
+    error: Optional[str] = None
+    next: Optional[List[str]] = None # pending graph nodes while paused (from the checkpoint)
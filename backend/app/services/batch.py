@@ -0,0 +1,64 @@
+from app.core.config import settings
+from app.services.embeddings import embedding_service
+from app.services.redis_cache import redis_cache
+import numpy as np
+
+# What a group's first run found that the other members' runs start from (see main._research_shared)
+SHARED_STATE = ("search_results", "images", "visual_data", "rag_data")
+
+class BatchPlan:
+    """
+    What a batch of topics needs: the cached reports, and the groups of near-duplicate
+    topics that share one search/RAG pass. Each group is a list of topic indices, the topic
+    that is researched first.
+    """
+    def __init__(self, topics: list[str], cached: list, groups: list[list[int]]):
+        self.topics = topics
+        self.cached = cached
+        self.groups = groups
+
+    def as_dict(self) -> dict:
+        return {
+            "topics": len(self.topics),
+            "cached": sum(1 for report in self.cached if report is not None),
+            "runs": len(self.groups),
+            "shared": sum(len(group) - 1 for group in self.groups),
+        }
+
+def group_topics(vectors, threshold: float) -> list[list[int]]:
+    """
+    Greedy grouping in submission order: a topic joins the first group whose researched
+    topic is within `threshold` cosine distance, else it starts a group. Every member is
+    compared against the topic actually researched, the same guarantee a semantic cache hit gives.
+    """
+    if not len(vectors):
+        return []
+    v = np.asarray(vectors, dtype=np.float32)
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    similarity = v @ v.T
+    groups, leaders = [], []
+    for i in range(len(v)):
+        if leaders:
+            scores = similarity[i, leaders]
+            best = int(np.argmax(scores))
+            if 1.0 - scores[best] < threshold:
+                groups[best].append(i)
+                continue
+        leaders.append(i)
+        groups.append([i])
+    return groups
+
+async def plan_batch(topics: list[str]) -> BatchPlan:
+    """Embed all topics in one pass, look them up in the cache in bulk and group the misses."""
+    # Batched and memoized: the cache lookups below and each run's check_cache/RAG reuse these
+    vectors = await embedding_service.aembed_many(topics)
+    cached = await redis_cache.alookup_many(topics)
+    todo = [i for i, report in enumerate(cached) if report is None]
+    if settings.BATCH_GROUP_DUPLICATES:
+        groups = group_topics([vectors[i] for i in todo], settings.CACHE_DISTANCE_THRESHOLD)
+        groups = [[todo[j] for j in group] for group in groups]
+    else:
+        groups = [[i] for i in todo]
+    plan = BatchPlan(topics, cached, groups)
+    print(f"--- BATCH PLAN: {plan.as_dict()} ---")
+    return plan
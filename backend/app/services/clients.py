@@ -0,0 +1,191 @@
+from app.core.config import settings
+from redis import BlockingConnectionPool, Redis
+import asyncio
+import httpx
+import threading
+import weakref
+
+def _http2_available() -> bool:
+    if not settings.HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401 (httpx needs it for HTTP/2)
+        return True
+    except ImportError:
+        print("HTTP/2 disabled: install `httpx[http2]`")
+        return False
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async HTTP transport shared by several clients, with one keep-alive connection pool
+    per event loop (async connections can't move between loops).
+    """
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        self._kwargs = kwargs
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._kwargs)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        # Several clients share this transport; pools are closed by the registry, not by a client
+        pass
+
+    def pools(self) -> list:
+        return [t._pool for t in list(self._transports.values())]
+
+class ClientRegistry:
+    """
+    Builds and shares the app's network clients so every service uses the same
+    configured connection pools instead of creating its own with default settings:
+      - Redis: one bounded, blocking pool per (sync/async, decode_responses), async ones per event loop
+      - HTTP (Ollama, Tavily): keep-alive pools with HTTP/2 where the server supports it
+      - Qdrant: one client, REST or gRPC (QDRANT_PREFER_GRPC)
+    Pool utilization is reported by `get_stats()` (GET /clients/stats).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._redis_pools = {}
+        self._async_redis_pools = weakref.WeakKeyDictionary() # loop -> {decode_responses: pool}
+        self._unbound_redis_pools = {} # built outside a loop; bind to the first loop that uses them
+        self._http = {}
+        self._qdrant = None
+        self.http2 = _http2_available()
+
+    # --- Redis ---
+
+    def _pool_kwargs(self, decode_responses: bool) -> dict:
+        return {
+            "max_connections": settings.REDIS_MAX_CONNECTIONS,
+            "timeout": settings.REDIS_POOL_TIMEOUT, # wait this long for a free connection
+            "decode_responses": decode_responses,
+            "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+            "socket_keepalive": True,
+            "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        }
+
+    def redis(self, decode_responses: bool = True) -> Redis:
+        """Sync Redis client on the shared pool."""
+        with self._lock:
+            pool = self._redis_pools.get(decode_responses)
+            if pool is None:
+                pool = self._redis_pools[decode_responses] = BlockingConnectionPool.from_url(
+                    settings.REDIS_URL, **self._pool_kwargs(decode_responses)
+                )
+        return Redis(connection_pool=pool)
+
+    def async_redis(self, decode_responses: bool = True):
+        """Async Redis client on the shared pool of the running event loop."""
+        from redis.asyncio import BlockingConnectionPool as AsyncBlockingConnectionPool, Redis as AsyncRedis
+        try:
+            pools = self._async_redis_pools.setdefault(asyncio.get_running_loop(), {})
+        except RuntimeError:
+            # e.g. a provider factory running in a worker thread; its client is then used from one loop only
+            pools = self._unbound_redis_pools
+        pool = pools.get(decode_responses)
+        if pool is None:
+            pool = pools[decode_responses] = AsyncBlockingConnectionPool.from_url(
+                settings.REDIS_URL, **self._pool_kwargs(decode_responses)
+            )
+        return AsyncRedis(connection_pool=pool)
+
+    # --- HTTP ---
+
+    def _transport(self, name: str) -> dict:
+        with self._lock:
+            if name not in self._http:
+                limits = httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                )
+                self._http[name] = {
+                    "async": LoopLocalTransport(name, http2=self.http2, limits=limits),
+                    "sync": httpx.HTTPTransport(http2=self.http2, limits=limits),
+                }
+            return self._http[name]
+
+    def http(self, name: str, base_url: str = "", timeout: float = settings.HTTP_TIMEOUT) -> httpx.AsyncClient:
+        """Async HTTP client on the shared keep-alive pool for `name`."""
+        return httpx.AsyncClient(base_url=base_url, transport=self._transport(name)["async"], timeout=timeout)
+
+    def ollama_kwargs(self) -> dict:
+        """kwargs for LangChain's Ollama classes so chat and embeddings share one pool."""
+        transports = self._transport("ollama")
+        return {
+            "sync_client_kwargs": {"transport": transports["sync"]},
+            "async_client_kwargs": {"transport": transports["async"]},
+        }
+
+    # --- Qdrant ---
+
+    def qdrant(self):
+        """The shared Qdrant client (REST, or gRPC with QDRANT_PREFER_GRPC)."""
+        with self._lock:
+            if self._qdrant is None:
+                from qdrant_client import QdrantClient
+                self._qdrant = QdrantClient(
+                    url=settings.QDRANT_URL,
+                    prefer_grpc=settings.QDRANT_PREFER_GRPC,
+                    grpc_port=settings.QDRANT_GRPC_PORT,
+                    timeout=settings.QDRANT_TIMEOUT,
+                )
+            return self._qdrant
+
+    # --- Metrics ---
+
+    @staticmethod
+    def _redis_pool_stats(pool) -> dict:
+        if hasattr(pool, "_in_use_connections"):
+            # redis.asyncio pool
+            in_use = len(pool._in_use_connections)
+            created = in_use + len(pool._available_connections)
+        else:
+            created = len(pool._connections)
+            in_use = created - sum(1 for c in list(pool.pool.queue) if c is not None)
+        return {"max": pool.max_connections, "created": created, "in_use": in_use}
+
+    @staticmethod
+    def _http_pool_stats(pools: list) -> dict:
+        connections = [c for pool in pools for c in pool.connections]
+        return {
+            "max": settings.HTTP_MAX_CONNECTIONS,
+            "connections": len(connections),
+            "in_use": sum(1 for c in connections if not c.is_idle()),
+            "http2": sum(1 for c in connections if "HTTP/2" in repr(c)),
+        }
+
+    def get_stats(self) -> dict:
+        redis_stats = {
+            f"sync{'' if decode else '_bytes'}": self._redis_pool_stats(pool)
+            for decode, pool in self._redis_pools.items()
+        }
+        for i, pools in enumerate(list(self._async_redis_pools.values())):
+            for decode, pool in pools.items():
+                redis_stats[f"async{'' if decode else '_bytes'}_loop{i}"] = self._redis_pool_stats(pool)
+        for decode, pool in self._unbound_redis_pools.items():
+            redis_stats[f"async{'' if decode else '_bytes'}_unbound"] = self._redis_pool_stats(pool)
+
+        http_stats = {}
+        for name, transports in self._http.items():
+            http_stats[name] = {
+                "async": self._http_pool_stats(transports["async"].pools()),
+                "sync": self._http_pool_stats([transports["sync"]._pool]),
+            }
+        return {
+            "redis": redis_stats,
+            "http": http_stats,
+            "http2_enabled": self.http2,
+            "qdrant": {"created": self._qdrant is not None, "grpc": settings.QDRANT_PREFER_GRPC},
+        }
+
+# Global Instance
+clients = ClientRegistry()
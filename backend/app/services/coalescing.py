@@ -0,0 +1,189 @@
+from app.core.config import settings
+from app.services.clients import clients
+from app.services.embeddings import embedding_service
+from app.services.redis_cache import normalize_topic
+import numpy as np
+import hashlib
+import json
+import time
+
+TERMINAL_EVENTS = ("done", "error", "paused")
+
+# Delete the lock only if this leader still owns it (it may have expired and been re-taken)
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class Flight:
+    """One caller's view of an in-flight research run: its leader's thread and whether it is the leader."""
+    def __init__(self, key: str, thread_id: str, leader: bool):
+        self.key = key
+        self.thread_id = thread_id
+        self.leader = leader
+
+class ResearchCoalescer:
+    """
+    Single-flight for research runs, shared across uvicorn workers through Redis.
+
+    The first request for a topic takes a lock (SET NX) and runs the graph as the leader.
+    Concurrent requests for the same normalized topic (or, best effort, a semantically
+    matching one within CACHE_DISTANCE_THRESHOLD) become followers. They subscribe to the
+    leader's event channel and get its stream and final result instead of running the
+    pipeline again. If the leader dies (lock gone, no result), followers run it themselves.
+    """
+    REGISTRY_KEY = "research:inflight"
+
+    def __init__(self):
+        self.lock_ttl = settings.COALESCE_LOCK_TTL_SECONDS
+        self.result_ttl = settings.COALESCE_RESULT_TTL_SECONDS
+        self.stats = {"leaders": 0, "followers": 0, "semantic_matches": 0, "fallbacks": 0}
+
+    @property
+    def redis(self):
+        # Async clients are bound to the running loop; the registry keeps one pool per loop
+        return clients.async_redis()
+
+    def _flight_key(self, topic: str, sources) -> str:
+        raw = json.dumps([normalize_topic(topic), sorted(sources or [])])
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _lock_key(self, key: str) -> str:
+        return f"research:flight:{key}"
+
+    def _channel(self, thread_id: str) -> str:
+        return f"research:events:{thread_id}"
+
+    def _result_key(self, thread_id: str) -> str:
+        return f"research:result:{thread_id}"
+
+    async def join(self, topic: str, sources, thread_id: str) -> Flight:
+        """Become the leader for this topic, or a follower of the run already in flight."""
+        key = self._flight_key(topic, sources)
+        if not settings.COALESCE_ENABLED:
+            return Flight(key, thread_id, leader=True)
+        try:
+            vector = None
+            if settings.COALESCE_SEMANTIC:
+                # Memoized: check_cache_node embeds the same topic right after
+                vector = np.asarray(await embedding_service.aembed(topic), dtype=np.float32)
+                match = await self._semantic_match(key, sources, vector)
+                if match:
+                    self.stats["followers"] += 1
+                    self.stats["semantic_matches"] += 1
+                    return Flight(match["key"], match["thread_id"], leader=False)
+
+            lock = self._lock_key(key)
+            if await self.redis.set(lock, thread_id, nx=True, ex=self.lock_ttl):
+                self.stats["leaders"] += 1
+                if vector is not None:
+                    await self.redis.hset(self.REGISTRY_KEY, key, json.dumps({
+                        "thread_id": thread_id,
+                        "sources": sorted(sources or []),
+                        "vector": vector.tolist(),
+                        "expires_at": time.time() + self.lock_ttl,
+                    }))
+                return Flight(key, thread_id, leader=True)
+
+            leader = await self.redis.get(lock)
+            if leader:
+                self.stats["followers"] += 1
+                return Flight(key, leader, leader=False)
+            # Lock released between SET and GET: the result is (about to be) cached, just run
+            return Flight(key, thread_id, leader=True)
+        except Exception as e:
+            print(f"Coalescing unavailable, running without it: {e}")
+            return Flight(key, thread_id, leader=True)
+
+    async def _semantic_match(self, key: str, sources, vector: np.ndarray):
+        entries = await self.redis.hgetall(self.REGISTRY_KEY)
+        if not entries:
+            return None
+        q = vector / (np.linalg.norm(vector) or 1.0)
+        best, best_distance = None, settings.CACHE_DISTANCE_THRESHOLD
+        now = time.time()
+        for other_key, raw in entries.items():
+            entry = json.loads(raw)
+            if entry["expires_at"] < now:
+                await self.redis.hdel(self.REGISTRY_KEY, other_key)
+                continue
+            if other_key == key or entry["sources"] != sorted(sources or []):
+                continue
+            v = np.asarray(entry["vector"], dtype=np.float32)
+            if v.shape != q.shape:
+                continue
+            distance = 1.0 - float(q @ (v / (np.linalg.norm(v) or 1.0)))
+            if distance < best_distance:
+                best, best_distance = {"key": other_key, "thread_id": entry["thread_id"]}, distance
+        return best
+
+    async def publish(self, flight: Flight, event: str, data: dict):
+        """Leader: forward one event to followers. Terminal events also store the result and release the lock."""
+        if not flight.leader or not settings.COALESCE_ENABLED:
+            return
+        message = json.dumps({"event": event, "data": data})
+        try:
+            if event in TERMINAL_EVENTS:
+                # Stored before publishing so a follower that subscribes late still finds it
+                await self.redis.set(self._result_key(flight.thread_id), message, ex=self.result_ttl)
+            await self.redis.publish(self._channel(flight.thread_id), message)
+            if event in TERMINAL_EVENTS:
+                await self.release(flight)
+        except Exception as e:
+            print(f"Coalescing publish failed: {e}")
+
+    async def release(self, flight: Flight):
+        if not flight.leader or not settings.COALESCE_ENABLED:
+            return
+        await self.redis.eval(RELEASE_SCRIPT, 1, self._lock_key(flight.key), flight.thread_id)
+        await self.redis.hdel(self.REGISTRY_KEY, flight.key)
+
+    async def follow(self, flight: Flight):
+        """
+        Follower: yields the leader's events ({"event", "data"}) until a terminal one.
+        Stops early (without a terminal event) if the leader disappears or the wait times out.
+        """
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self._channel(flight.thread_id))
+        try:
+            stored = await self.redis.get(self._result_key(flight.thread_id))
+            if stored:
+                yield json.loads(stored)
+                return
+
+            deadline = time.monotonic() + self.lock_ttl
+            while time.monotonic() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    if not await self.redis.exists(self._lock_key(flight.key)):
+                        # Leader finished or died; the result key tells which
+                        stored = await self.redis.get(self._result_key(flight.thread_id))
+                        if stored:
+                            yield json.loads(stored)
+                        else:
+                            self.stats["fallbacks"] += 1
+                        return
+                    continue
+                event = json.loads(message["data"])
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+            self.stats["fallbacks"] += 1
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def wait(self, flight: Flight):
+        """Follower: the leader's final `done` payload, or None if it failed and the caller should run itself."""
+        async for event in self.follow(flight):
+            if event["event"] == "done":
+                return event["data"]
+        return None
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+# Global Instance
+research_coalescer = ResearchCoalescer()
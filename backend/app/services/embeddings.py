@@ -0,0 +1,256 @@
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.services.limits import upstream_limits
+from app.services.providers import Provider
+from collections import OrderedDict
+from app.services.clients import clients
+from app.services.telemetry import telemetry
+import numpy as np
+import asyncio
+import hashlib
+import threading
+
+# Vector sizes of common Ollama embedding models, for when the model can't be probed
+KNOWN_DIMENSIONS = {
+    "qwen3-embedding": 4096,
+    "qwen3-embedding:8b": 4096,
+    "qwen3-embedding:4b": 2560,
+    "qwen3-embedding:0.6b": 1024,
+    "nomic-embed-text": 768,
+    "mxbai-embed-large": 1024,
+    "bge-m3": 1024,
+    "all-minilm": 384,
+}
+
+class EmbeddingService:
+    """
+    One embedding client for the whole app (semantic cache, RAG, ingestion).
+      - memoizes vectors by content hash in a bounded LRU (optionally persisted to Redis)
+      - concurrent requests for the same text share one in-flight call
+      - concurrent single-text calls within a short window go to Ollama as one batch
+    """
+    def __init__(self, model: str = settings.EMBEDDING_MODEL):
+        from langchain_ollama import OllamaEmbeddings
+        self.model = model
+        self.embeddings = OllamaEmbeddings(base_url=settings.OLLAMA_BASE_URL, model=model, **clients.ollama_kwargs())
+        self.max_entries = settings.EMBEDDING_CACHE_SIZE
+        self.batch_window = settings.EMBEDDING_BATCH_WINDOW_MS / 1000
+        self.max_batch = settings.EMBEDDING_MAX_BATCH
+        # Vectors are stored as raw float32 bytes, so no response decoding
+        self.redis = clients.redis(decode_responses=False) if settings.EMBEDDING_REDIS_CACHE else None
+        self.redis_ttl = settings.EMBEDDING_REDIS_TTL_SECONDS
+        self._dimension = settings.EMBEDDING_DIM or None
+
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pending = []
+        self._tasks = set()
+        self.stats = {
+            "requests": 0,
+            "memo_hits": 0,
+            "redis_hits": 0,
+            "inflight_joins": 0,
+            "upstream_calls": 0,
+            "upstream_texts": 0,
+        }
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).hexdigest()
+
+    def _memo_get(self, key: str):
+        with self._lock:
+            vector = self._memo.get(key)
+            if vector is not None:
+                self._memo.move_to_end(key)
+            return vector
+
+    def _memo_put(self, key: str, vector):
+        with self._lock:
+            # float32 arrays are far smaller than lists of Python floats and match what Redis/Qdrant store
+            self._memo[key] = np.asarray(vector, dtype=np.float32)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _redis_get_many(self, keys: list[str]) -> list:
+        if not self.redis or not keys:
+            return [None] * len(keys)
+        raw = self.redis.mget([f"emb:{k}" for k in keys])
+        return [np.frombuffer(r, dtype=np.float32) if r else None for r in raw]
+
+    def _redis_put_many(self, items: list[tuple]):
+        if not self.redis or not items:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key, vector in items:
+            pipe.set(f"emb:{key}", np.asarray(vector, dtype=np.float32).tobytes(), ex=self.redis_ttl)
+        pipe.execute()
+
+    # --- Async API ---
+
+    async def aembed(self, text: str) -> list[float]:
+        """Embed one text, sharing memo, in-flight calls and batches with other callers."""
+        self.stats["requests"] += 1
+        key = self._key(text)
+        vector = self._memo_get(key)
+        if vector is not None:
+            self.stats["memo_hits"] += 1
+            return vector.tolist()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["inflight_joins"] += 1
+            return (await asyncio.shield(future)).tolist()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._pending.append((key, text, future))
+        if len(self._pending) >= self.max_batch:
+            self._spawn(self._flush())
+        elif len(self._pending) == 1:
+            self._spawn(self._flush_after_window())
+        return (await asyncio.shield(future)).tolist()
+
+    async def aembed_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of texts; duplicates and memoized texts are not re-sent."""
+        return list(await asyncio.gather(*[self.aembed(t) for t in texts]))
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        One upstream call for a batch of texts, bypassing the memo.
+        Used by ingestion so document chunks don't evict hot topic vectors.
+        """
+        self.stats["upstream_calls"] += 1
+        self.stats["upstream_texts"] += len(texts)
+        async with upstream_limits.slot("embedding"):
+            with telemetry.upstream("embeddings", texts=len(texts)):
+                return await self.embeddings.aembed_documents(texts)
+
+    def _spawn(self, coro):
+        # Keep a reference so the flush task isn't garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.batch_window)
+        await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            keys = [key for key, _, _ in batch]
+            stored = await asyncio.to_thread(self._redis_get_many, keys)
+
+            vectors = {}
+            missing = []
+            for (key, text, _), vector in zip(batch, stored):
+                if vector is not None:
+                    self.stats["redis_hits"] += 1
+                    vectors[key] = vector
+                else:
+                    missing.append((key, text))
+
+            if missing:
+                self.stats["upstream_calls"] += 1
+                self.stats["upstream_texts"] += len(missing)
+                async with upstream_limits.slot("embedding"):
+                    with telemetry.upstream("embeddings", texts=len(missing)):
+                        embedded = await self.embeddings.aembed_documents([text for _, text in missing])
+                for (key, _), vector in zip(missing, embedded):
+                    vectors[key] = np.asarray(vector, dtype=np.float32)
+                await asyncio.to_thread(self._redis_put_many, [(key, vectors[key]) for key, _ in missing])
+
+            for key, _, future in batch:
+                self._memo_put(key, vectors[key])
+                if not future.done():
+                    future.set_result(vectors[key])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, _, _ in batch:
+                self._inflight.pop(key, None)
+
+    # --- Sync API (LangChain vector stores called from worker threads) ---
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: list[str]) -> list[list[float]]:
+        self.stats["requests"] += len(texts)
+        keys = [self._key(t) for t in texts]
+        vectors = {}
+        for key in keys:
+            vector = self._memo_get(key)
+            if vector is not None:
+                self.stats["memo_hits"] += 1
+                vectors[key] = vector
+
+        todo = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if todo:
+            for key, vector in zip(todo, self._redis_get_many(list(todo))):
+                if vector is not None:
+                    self.stats["redis_hits"] += 1
+                    vectors[key] = vector
+            missing = [(key, text) for key, text in todo.items() if key not in vectors]
+            if missing:
+                self.stats["upstream_calls"] += 1
+                self.stats["upstream_texts"] += len(missing)
+                with telemetry.upstream("embeddings", texts=len(missing)):
+                    embedded = self.embeddings.embed_documents([text for _, text in missing])
+                for (key, _), vector in zip(missing, embedded):
+                    vectors[key] = np.asarray(vector, dtype=np.float32)
+                self._redis_put_many([(key, vectors[key]) for key, _ in missing])
+            for key in todo:
+                self._memo_put(key, vectors[key])
+
+        return [vectors[key].tolist() for key in keys]
+
+    def dimension(self) -> int:
+        """Vector size of the configured model: EMBEDDING_DIM, else measured once with a probe embedding."""
+        if self._dimension is None:
+            try:
+                self._dimension = len(self.embed("dimension probe"))
+            except Exception as e:
+                known = KNOWN_DIMENSIONS.get(self.model) or KNOWN_DIMENSIONS.get(self.model.split(":")[0])
+                if not known:
+                    raise
+                print(f"Embedding model unreachable ({e}); assuming {self.model} has {known} dimensions")
+                return known
+        return self._dimension
+
+    def as_langchain(self) -> Embeddings:
+        """LangChain `Embeddings` view of this service, for vector store wrappers."""
+        return SharedEmbeddings(self)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "memo_entries": len(self._memo)}
+
+class SharedEmbeddings(Embeddings):
+    """Routes LangChain embedding calls through the shared EmbeddingService."""
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.service.embed_many(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.service.embed(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.service.aembed_many(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.service.aembed(text)
+
+async def _warm_embeddings(service: EmbeddingService):
+    # Loads the embedding model in Ollama so the first request doesn't pay for it
+    await service.aembed("warm-up")
+
+# Global Instance (optional warm-up: the API still serves cached/exact answers without Ollama)
+embedding_service = Provider("embeddings", EmbeddingService, warmup=_warm_embeddings, required=False)
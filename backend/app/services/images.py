@@ -0,0 +1,276 @@
+from app.core.config import settings
+from app.services.providers import Provider
+from app.services.clients import clients
+from app.services.telemetry import telemetry
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
+import io
+import ipaddress
+import socket
+import threading
+import time
+import httpx
+
+try:
+    from PIL import Image
+except ImportError: # downscaling and perceptual hashing need `pip install pillow`
+    Image = None
+
+class PreparedImage:
+    """A downloaded image, ready to send: hashes for dedup/caching and a (downscaled) data URL."""
+    def __init__(self, url: str, digest: str, data_url: str, phash: int = None,
+                 size: tuple = None, bytes_in: int = 0, bytes_out: int = 0):
+        self.url = url
+        self.digest = digest # sha256 of the downloaded bytes
+        self.phash = phash # 64-bit difference hash, None without Pillow
+        self.data_url = data_url
+        self.size = size # (width, height) as sent
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+
+    @property
+    def key(self) -> str:
+        """Description cache key: the perceptual hash survives re-encoding and resizing."""
+        return f"p{self.phash:016x}" if self.phash is not None else f"s{self.digest}"
+
+def is_public_address(address: str) -> bool:
+    """False for loopback, private, link-local (cloud metadata), shared, reserved and multicast addresses."""
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def difference_hash(image) -> int:
+    """dHash: brightness gradients of a 9x8 grayscale thumbnail, as 64 bits."""
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+class ImageService:
+    """
+    Vision input pipeline for vision_node:
+      - downloads images concurrently, with per-image size and time limits
+      - downscales them (longest side VISION_MAX_SIDE) and sends them inline, so the
+        model receives fewer pixels and doesn't fetch the URL itself
+      - dedups by content hash and perceptual hash (near-identical charts from different URLs)
+      - caches descriptions by image hash with TTL, in process and optionally in Redis,
+        so a chart seen by an earlier run or query is not described again
+    URLs already downloaded are remembered, so a repeated URL costs no download either;
+    failed ones (too large, too slow, not an image) are skipped for VISION_FAILURE_TTL_SECONDS.
+
+    Image URLs come from search results, so downloads only go to http(s) hosts that resolve
+    to public addresses (unless VISION_ALLOW_PRIVATE_HOSTS). Redirects are followed by hand,
+    up to VISION_MAX_REDIRECTS, with each hop checked the same way, and every connection goes
+    to the address that was checked, so a second DNS answer can't point it elsewhere.
+    Each hop gets its own unpooled connection: a pool keys connections by the address
+    dialled, so a TLS session verified for one host could be reused for another host
+    on the same address.
+    """
+    def __init__(self):
+        self.redis = clients.redis() if settings.VISION_CACHE_REDIS else None
+        self.ttl = settings.VISION_CACHE_TTL_SECONDS
+        self.max_entries = settings.VISION_CACHE_SIZE
+        self._descriptions = OrderedDict() # key -> (expires_at, phash, description)
+        self._urls = OrderedDict() # url -> (expires_at, PreparedImage or None if it failed)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self.stats = {
+            "urls": 0, "url_hits": 0, "downloads": 0, "download_failures": 0, "rejected": 0,
+            "duplicates": 0, "cache_hits": 0, "redis_hits": 0, "near_hits": 0, "described": 0,
+            "bytes_in": 0, "bytes_out": 0,
+        }
+
+    # --- Download and preparation ---
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(settings.VISION_FETCH_CONCURRENCY)
+        return self._semaphores[loop]
+
+    async def _resolve(self, url: httpx.URL) -> str:
+        """The address to connect to for `url`. Raises ValueError for other schemes and non-public hosts."""
+        if url.scheme not in ("http", "https") or not url.host:
+            raise ValueError(f"unsupported image URL {url}")
+        port = url.port or (443 if url.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos]
+        if not addresses:
+            raise ValueError(f"{url.host} does not resolve")
+        if not settings.VISION_ALLOW_PRIVATE_HOSTS:
+            for address in addresses:
+                if not is_public_address(address):
+                    raise ValueError(f"{url.host} resolves to non-public address {address}")
+        return addresses[0]
+
+    async def _download(self, url: str):
+        """The image bytes, or None if it isn't an image, is too large or too slow."""
+        target = httpx.URL(url)
+        for _ in range(settings.VISION_MAX_REDIRECTS + 1):
+            address = await self._resolve(target)
+            async with httpx.AsyncClient(timeout=settings.VISION_FETCH_TIMEOUT) as http:
+                # Connect to the checked address; Host header and TLS SNI keep the original name
+                request = http.build_request(
+                    "GET", target.copy_with(host=address),
+                    headers={"Host": target.netloc.decode("ascii")},
+                    extensions={"sni_hostname": target.host} if target.scheme == "https" else None,
+                )
+                response = await http.send(request, stream=True, follow_redirects=False)
+                try:
+                    if response.is_redirect and "location" in response.headers:
+                        target = target.join(response.headers["location"])
+                        continue
+                    content_type = response.headers.get("content-type", "")
+                    if response.status_code != 200 or (content_type and not content_type.startswith("image/")):
+                        return None
+                    if int(response.headers.get("content-length") or 0) > settings.VISION_MAX_BYTES:
+                        return None
+                    data = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        data += chunk
+                        if len(data) > settings.VISION_MAX_BYTES:
+                            return None
+                    return bytes(data), content_type
+                finally:
+                    await response.aclose()
+        return None # too many redirects
+
+    def prepare(self, url: str, data: bytes, content_type: str = ""):
+        """Hash and downscale (CPU-bound; called in a worker thread). None if it doesn't decode."""
+        digest = hashlib.sha256(data).hexdigest()
+        if Image is None:
+            mime = content_type.split(";")[0] or "image/jpeg"
+            data_url = f"data:{mime};base64,{base64.b64encode(data).decode()}"
+            return PreparedImage(url, digest, data_url, bytes_in=len(data), bytes_out=len(data))
+        try:
+            image = Image.open(io.BytesIO(data))
+            if image.width * image.height > settings.VISION_MAX_PIXELS:
+                return None # refuse decompression bombs before decoding
+            image.load()
+        except Exception:
+            return None
+        phash = difference_hash(image)
+        side = settings.VISION_MAX_SIDE
+        if max(image.size) <= side and image.format in ("JPEG", "PNG", "WEBP"):
+            out, mime = data, Image.MIME[image.format]
+        else:
+            if image.mode not in ("RGB", "L"):
+                # Flatten transparency onto white; charts usually assume a light background
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+                image = background
+            image.thumbnail((side, side), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=settings.VISION_JPEG_QUALITY, optimize=True)
+            out, mime = buffer.getvalue(), "image/jpeg"
+        data_url = f"data:{mime};base64,{base64.b64encode(out).decode()}"
+        return PreparedImage(url, digest, data_url, phash, image.size, len(data), len(out))
+
+    async def load(self, url: str):
+        """Download and prepare one image (or reuse it if the URL was seen recently). None on failure."""
+        self.stats["urls"] += 1
+        with self._lock:
+            entry = self._urls.get(url)
+            if entry and entry[0] > time.time():
+                self._urls.move_to_end(url)
+                self.stats["url_hits"] += 1
+                return entry[1]
+        try:
+            async with self._semaphore():
+                with telemetry.upstream("image_fetch"):
+                    downloaded = await asyncio.wait_for(self._download(url), settings.VISION_FETCH_TIMEOUT)
+            self.stats["downloads"] += 1
+        except Exception as e:
+            print(f"Image download failed for {url}: {e!r}")
+            self.stats["download_failures"] += 1
+            self._remember(url, None, settings.VISION_FAILURE_TTL_SECONDS)
+            return None
+        image = await asyncio.to_thread(self.prepare, url, *downloaded) if downloaded else None
+        if image is None:
+            self.stats["rejected"] += 1
+            self._remember(url, None, settings.VISION_FAILURE_TTL_SECONDS)
+            return None
+        self.stats["bytes_in"] += image.bytes_in
+        self.stats["bytes_out"] += image.bytes_out
+        self._remember(url, image, self.ttl)
+        return image
+
+    def _remember(self, url: str, image, ttl: float):
+        with self._lock:
+            self._urls[url] = (time.time() + ttl, image)
+            self._urls.move_to_end(url)
+            while len(self._urls) > self.max_entries:
+                self._urls.popitem(last=False)
+
+    def is_duplicate(self, image: PreparedImage, kept: list[PreparedImage]) -> bool:
+        """Exact copy (same bytes) or near copy (dHash within VISION_HASH_DISTANCE) of a kept image."""
+        duplicate = any(
+            image.digest == other.digest or (
+                image.phash is not None and other.phash is not None
+                and hamming(image.phash, other.phash) <= settings.VISION_HASH_DISTANCE
+            )
+            for other in kept
+        )
+        if duplicate:
+            self.stats["duplicates"] += 1
+        return duplicate
+
+    # --- Description cache ---
+
+    async def get_description(self, image: PreparedImage, namespace: str):
+        """Cached description for this image (or a near copy of it) under `namespace` (prompt + model)."""
+        key = f"{namespace}:{image.key}"
+        now = time.time()
+        with self._lock:
+            entry = self._descriptions.get(key)
+            if entry and entry[0] > now:
+                self._descriptions.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return entry[2]
+            if image.phash is not None:
+                for other_key, (expires, phash, description) in reversed(self._descriptions.items()):
+                    if expires > now and phash is not None and other_key.startswith(f"{namespace}:") \
+                            and hamming(phash, image.phash) <= settings.VISION_HASH_DISTANCE:
+                        self.stats["near_hits"] += 1
+                        return description
+        if self.redis:
+            # Sync client: keep the round trip off the event loop
+            description = await asyncio.to_thread(self.redis.get, f"vision:{key}")
+            if description:
+                self.stats["redis_hits"] += 1
+                self._put_local(key, image.phash, description)
+                return description
+        return None
+
+    async def put_description(self, image: PreparedImage, namespace: str, description: str):
+        key = f"{namespace}:{image.key}"
+        self.stats["described"] += 1
+        self._put_local(key, image.phash, description)
+        if self.redis:
+            await asyncio.to_thread(self.redis.set, f"vision:{key}", description, ex=self.ttl)
+
+    def _put_local(self, key: str, phash, description: str):
+        with self._lock:
+            self._descriptions[key] = (time.time() + self.ttl, phash, description)
+            self._descriptions.move_to_end(key)
+            while len(self._descriptions) > self.max_entries:
+                self._descriptions.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "cached_descriptions": len(self._descriptions),
+            "cached_urls": len(self._urls),
+            "perceptual_hashing": Image is not None,
+        }
+
+# Global Instance
+image_service = Provider("images", ImageService, required=False)
@@ -0,0 +1,253 @@
+from fastapi import UploadFile
+from app.core.config import settings
+from app.models import IngestionJob
+from app.services.embeddings import embedding_service
+from app.services.limits import upstream_limits
+from app.services.vector_db import vector_db, chunk_id, content_hash
+from app.services.retrieval import hybrid_retriever
+from app.services.clients import clients
+from collections import OrderedDict
+import asyncio
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+MAX_TRACKED_JOBS = 256
+
+def iter_pages(path: str):
+    """The PDF's pages, parsed one at a time."""
+    from langchain_community.document_loaders import PyPDFLoader
+    return PyPDFLoader(path).lazy_load()
+
+def iter_chunks(pages, source: str, document_id: str, job: IngestionJob):
+    """Split pages into chunks as they are parsed; only the current page is held in memory."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.INGEST_CHUNK_SIZE,
+        chunk_overlap=settings.INGEST_CHUNK_OVERLAP
+    )
+    for page in pages:
+        job.pages += 1
+        page.metadata["source"] = source
+        page.metadata["document_id"] = document_id
+        for chunk in splitter.split_documents([page]):
+            job.chunks += 1
+            chunk.metadata["chunk_id"] = chunk_id(document_id, chunk.page_content)
+            yield chunk
+
+def default_document_id(filename: str, first_page) -> str:
+    """
+    Filename plus a hash of the first page's text. A new version of a document (same name,
+    same first page) replaces the previous one; an unrelated file that only shares the name
+    gets its own manifest and chunks. PDFs without a text layer all hash the same, so callers
+    uploading those should pass a document_id.
+    """
+    return f"{filename}:{content_hash(first_page.page_content if first_page else '')[:16]}"
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(SPOOL_CHUNK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+class DocumentManifests:
+    """
+    Per-document manifest in Redis: the file hash and the ids of the chunks stored for it.
+    Lets a re-upload skip unchanged chunks and delete the ones that disappeared.
+    """
+    def __init__(self):
+        self.redis = clients.redis()
+
+    def _key(self, document_id: str) -> str:
+        return f"ingest:manifest:{document_id}"
+
+    def get(self, document_id: str) -> dict:
+        raw = self.redis.get(self._key(document_id))
+        return json.loads(raw) if raw else {"file_hash": None, "chunk_ids": []}
+
+    def save(self, document_id: str, file_hash: str, chunk_ids: list[str]):
+        self.redis.set(self._key(document_id), json.dumps({
+            "file_hash": file_hash,
+            "chunk_ids": chunk_ids,
+            "updated_at": time.time()
+        }))
+
+class IngestionPipeline:
+    """
+    Streaming PDF ingestion:
+    parse pages lazily (worker thread) -> bounded queue of chunk batches ->
+    N workers that embed a batch and upsert it to Qdrant.
+    The bounded queue is the backpressure: parsing pauses while the workers are behind.
+
+    Ingestion is incremental per document (keyed by the caller's document_id, else see
+    `default_document_id`): chunks already listed in the document's manifest are not
+    re-embedded, and chunks missing from the new version are deleted.
+
+    Jobs are tracked in memory by the worker that runs them and mirrored to Redis
+    (`ingest:job:<job_id>`, JOB_RECORD_TTL_SECONDS) after every indexed batch, so
+    GET /upload/{job_id} answers on any uvicorn worker.
+    """
+    def __init__(self):
+        self.manifests = DocumentManifests()
+        self.redis = clients.redis()
+        self.jobs = OrderedDict()
+        self._tasks = set()
+
+    async def submit(self, file: UploadFile, document_id: str = None) -> IngestionJob:
+        """Spool the upload to a temp file and start ingesting it in the background."""
+        path = await self._spool(file)
+        job = IngestionJob(job_id=str(uuid.uuid4()), filename=file.filename, document_id=document_id)
+        self._track(job)
+        await self._publish(job)
+
+        task = asyncio.create_task(self.run(job, path, cleanup=True))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str):
+        """The job's live record on the worker running it, else its last published state."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        raw = self.redis.get(self._job_key(job_id))
+        return IngestionJob.model_validate_json(raw) if raw else None
+
+    def _job_key(self, job_id: str) -> str:
+        return f"ingest:job:{job_id}"
+
+    def _save_job(self, job: IngestionJob):
+        try:
+            self.redis.set(self._job_key(job.job_id), job.model_dump_json(), ex=settings.JOB_RECORD_TTL_SECONDS)
+        except Exception as e:
+            print(f"Ingestion job {job.job_id} not published: {e}")
+
+    async def _publish(self, job: IngestionJob):
+        await asyncio.to_thread(self._save_job, job)
+
+    def _track(self, job: IngestionJob):
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            self.jobs.popitem(last=False)
+
+    async def _spool(self, file: UploadFile) -> str:
+        # Temp dir rather than the CWD; copied in chunks so the upload is never fully in memory
+        fd, path = tempfile.mkstemp(prefix="amri_upload_", suffix=".pdf")
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(SPOOL_CHUNK_BYTES):
+                out.write(chunk)
+        return path
+
+    async def run(self, job: IngestionJob, path: str, cleanup: bool = False):
+        """Ingest the PDF at `path`, updating `job` as pages are parsed and chunks indexed."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        stop = threading.Event()
+        workers = settings.INGEST_WORKERS
+        started = time.perf_counter()
+        job.status = "running"
+        document_id = job.document_id
+        new_ids = []
+
+        def put(item):
+            # Blocks the parser thread while the queue is full; gives up if the job failed
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.5)
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        raise InterruptedError("ingestion stopped")
+
+        def produce():
+            try:
+                batch = []
+                seen = set()
+                for chunk in iter_chunks(pages, job.filename, document_id, job):
+                    cid = chunk.metadata["chunk_id"]
+                    if cid in seen:
+                        # Identical chunk text repeated within the document
+                        continue
+                    seen.add(cid)
+                    new_ids.append(cid)
+                    if cid in stored_ids:
+                        job.skipped += 1
+                        continue
+                    batch.append(chunk)
+                    if len(batch) >= settings.INGEST_BATCH_SIZE:
+                        put(batch)
+                        batch = []
+                if batch:
+                    put(batch)
+            finally:
+                if not stop.is_set():
+                    for _ in range(workers):
+                        put(None)
+
+        async def consume():
+            while (batch := await queue.get()) is not None:
+                vectors = await embedding_service.aembed_batch([doc.page_content for doc in batch])
+                async with upstream_limits.slot("vector_db"):
+                    await asyncio.to_thread(vector_db.upsert_chunks, batch, vectors)
+                hybrid_retriever.index.add_documents(batch)
+                job.indexed += len(batch)
+                job.elapsed_s = round(time.perf_counter() - started, 3)
+                await self._publish(job)
+
+        try:
+            pages = iter_pages(path) # a generator: nothing is parsed yet
+            if not document_id:
+                # Parsed once: the first page goes back in front of the rest for chunking
+                first = await asyncio.to_thread(next, pages, None)
+                pages = itertools.chain([first] if first else [], pages)
+                document_id = job.document_id = default_document_id(job.filename, first)
+            file_hash = await asyncio.to_thread(file_sha256, path)
+            manifest = await asyncio.to_thread(self.manifests.get, document_id)
+            stored_ids = set(manifest["chunk_ids"])
+            if manifest["file_hash"] == file_hash:
+                # Byte-identical re-upload: nothing to parse or embed
+                job.chunks = job.skipped = len(stored_ids)
+                job.status = "completed"
+                return job
+
+            consumers = [asyncio.create_task(consume()) for _ in range(workers)]
+            try:
+                await asyncio.gather(asyncio.to_thread(produce), *consumers)
+            except BaseException:
+                stop.set()
+                for task in consumers:
+                    task.cancel()
+                raise
+
+            stale = list(stored_ids - set(new_ids))
+            async with upstream_limits.slot("vector_db"):
+                await asyncio.to_thread(vector_db.delete_chunks, stale)
+            hybrid_retriever.index.remove(stale)
+            job.deleted = len(stale)
+            await asyncio.to_thread(self.manifests.save, document_id, file_hash, new_ids)
+            # Other workers rebuild their BM25 index on their next query
+            await asyncio.to_thread(hybrid_retriever.mark_changed)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+            print(f"Ingestion failed for {job.filename}: {e}")
+        finally:
+            job.elapsed_s = round(time.perf_counter() - started, 3)
+            job.pages_per_sec = round(job.pages / job.elapsed_s, 2) if job.elapsed_s else 0.0
+            if cleanup and os.path.exists(path):
+                os.remove(path)
+            await self._publish(job)
+        return job
+
+# Global Instance
+ingestion_pipeline = IngestionPipeline()
@@ -0,0 +1,126 @@
+from app.core.config import settings
+from app.services.clients import clients
+from app.models import ResearchRequest, ResearchJob
+import json
+import time
+import uuid
+
+class ResearchJobQueue:
+    """
+    Redis-backed queue of research runs, consumed by `python -m app.worker`.
+
+    Producers LPUSH onto `research:queue`; each worker BLMOVEs a job into its own
+    `research:processing:<worker>` list and removes it once the run is finished, so a
+    job held by a worker that dies (heartbeat expired) is put back on the queue by the
+    next `recover()` sweep (at worker start and every WORKER_RECOVER_EVERY heartbeats).
+    Job records live in a `research:job:<thread_id>` hash; the thread_id is also the
+    LangGraph checkpoint thread, so results are read from the checkpointer.
+    """
+    QUEUE_KEY = "research:queue"
+
+    def __init__(self):
+        self.record_ttl = settings.JOB_RECORD_TTL_SECONDS
+
+    @property
+    def redis(self):
+        return clients.async_redis()
+
+    def _job_key(self, thread_id: str) -> str:
+        return f"research:job:{thread_id}"
+
+    def _processing_key(self, worker_id: str) -> str:
+        return f"research:processing:{worker_id}"
+
+    def _heartbeat_key(self, worker_id: str) -> str:
+        return f"research:worker:{worker_id}"
+
+    # --- API side ---
+
+    async def submit(self, request: ResearchRequest) -> ResearchJob:
+        """Queue a new research run; returns immediately with its thread_id."""
+        job = ResearchJob(
+            thread_id=str(uuid.uuid4()),
+            topic=request.topic,
+            enable_hitl=request.enable_hitl,
+            submitted_at=time.time()
+        )
+        payload = {
+            "kind": "run",
+            "thread_id": job.thread_id,
+            "state": {"topic": request.topic, "enable_hitl": request.enable_hitl, "sources": request.sources},
+        }
+        await self._enqueue(job, payload)
+        return job
+
+    async def submit_resume(self, job: ResearchJob, feedback: str) -> ResearchJob:
+        """Queue the continuation of a paused (HITL) run with the reviewer's feedback."""
+        job.status = "queued"
+        job.next = None
+        payload = {"kind": "resume", "thread_id": job.thread_id, "feedback": feedback}
+        await self._enqueue(job, payload)
+        return job
+
+    async def _enqueue(self, job: ResearchJob, payload: dict):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self._job_key(job.thread_id), mapping=self._encode(job.model_dump()))
+        pipe.expire(self._job_key(job.thread_id), self.record_ttl)
+        pipe.lpush(self.QUEUE_KEY, json.dumps(payload))
+        await pipe.execute()
+
+    async def get(self, thread_id: str):
+        raw = await self.redis.hgetall(self._job_key(thread_id))
+        if not raw:
+            return None
+        return ResearchJob(**{k: json.loads(v) for k, v in raw.items()})
+
+    async def update(self, thread_id: str, **fields):
+        await self.redis.hset(self._job_key(thread_id), mapping=self._encode(fields))
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        # Values are JSON so None/float/list round-trip through the hash
+        return {k: json.dumps(v) for k, v in fields.items()}
+
+    async def depth(self) -> int:
+        return await self.redis.llen(self.QUEUE_KEY)
+
+    async def get_stats(self) -> dict:
+        workers = [key async for key in self.redis.scan_iter(match=self._heartbeat_key("*"))]
+        processing = 0
+        async for key in self.redis.scan_iter(match=self._processing_key("*")):
+            processing += await self.redis.llen(key)
+        return {"queued": await self.depth(), "processing": processing, "workers": len(workers)}
+
+    # --- Worker side ---
+
+    async def take(self, worker_id: str, timeout: float = 1.0):
+        """Block up to `timeout` for the next job; it stays in this worker's processing list until acked."""
+        return await self.redis.blmove(self.QUEUE_KEY, self._processing_key(worker_id), timeout, "RIGHT", "LEFT")
+
+    async def ack(self, worker_id: str, raw: str):
+        """Remove a finished job (the raw string returned by `take`) from the processing list."""
+        await self.redis.lrem(self._processing_key(worker_id), 1, raw)
+
+    async def heartbeat(self, worker_id: str):
+        await self.redis.set(self._heartbeat_key(worker_id), time.time(), ex=settings.WORKER_HEARTBEAT_SECONDS * 3)
+
+    async def recover(self) -> int:
+        """Requeue jobs held by workers whose heartbeat expired. Returns how many were requeued."""
+        requeued = 0
+        async for key in self.redis.scan_iter(match=self._processing_key("*")):
+            worker_id = key.rsplit(":", 1)[-1]
+            if await self.redis.exists(self._heartbeat_key(worker_id)):
+                continue
+            # Back onto the consuming end so they run next
+            while await self.redis.lmove(key, self.QUEUE_KEY, "RIGHT", "RIGHT"):
+                requeued += 1
+        return requeued
+
+    async def stop_worker(self, worker_id: str):
+        """Graceful shutdown: hand unfinished jobs back to the queue and drop the heartbeat."""
+        while await self.redis.lmove(self._processing_key(worker_id), self.QUEUE_KEY, "RIGHT", "RIGHT"):
+            pass
+        await self.redis.delete(self._heartbeat_key(worker_id))
+
+# Global Instance
+research_jobs = ResearchJobQueue()
@@ -0,0 +1,38 @@
+import asyncio
+import weakref
+from app.core.config import settings
+
+
+class UpstreamLimits:
+    """
+    Per-upstream concurrency limits.
+    Caps in-flight calls to each external service (LLM, search, embeddings, vector DB)
+    so one worker can serve many research jobs without flooding a single backend.
+    """
+    def __init__(self, limits: dict):
+        self.limits = limits
+        # Semaphores are bound to the event loop they are first used on,
+        # so keep one set per running loop.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def slot(self, upstream: str) -> asyncio.Semaphore:
+        """Returns the semaphore guarding `upstream` on the current event loop."""
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.setdefault(loop, {})
+        if upstream not in semaphores:
+            semaphores[upstream] = asyncio.Semaphore(self.limits[upstream])
+        return semaphores[upstream]
+
+    def in_flight(self) -> dict:
+        """Calls currently holding a slot, per upstream, on the running event loop."""
+        semaphores = self._semaphores.get(asyncio.get_running_loop(), {})
+        return {name: self.limits[name] - sem._value for name, sem in semaphores.items()}
+
+
+# Global Instance
+upstream_limits = UpstreamLimits({
+    "llm": settings.LLM_CONCURRENCY,
+    "search": settings.SEARCH_CONCURRENCY,
+    "embedding": settings.EMBEDDING_CONCURRENCY,
+    "vector_db": settings.VECTOR_DB_CONCURRENCY,
+})
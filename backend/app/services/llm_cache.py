@@ -0,0 +1,224 @@
+from langchain_core.messages import AIMessage, AIMessageChunk
+from app.core.config import settings
+from app.services.limits import upstream_limits
+from collections import OrderedDict
+from app.services.clients import clients
+from app.services.telemetry import telemetry
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+# Model settings that change the output; anything else (clients, callbacks) stays out of the key
+KEY_PARAMS = ("model", "model_name", "temperature", "top_p", "top_k", "max_tokens",
+              "max_output_tokens", "num_predict", "num_ctx", "seed", "format", "stop")
+
+class LLMResponseCache:
+    """
+    Response cache for deterministic (temperature 0) LLM calls.
+    Keyed by a hash of the model, its sampling parameters and the messages.
+    Bounded in-process LRU with TTL, optionally backed by Redis so all workers share it.
+    """
+    def __init__(self):
+        self.max_entries = settings.LLM_CACHE_SIZE
+        self.ttl = settings.LLM_CACHE_TTL_SECONDS
+        self.redis = clients.redis() if settings.LLM_CACHE_REDIS else None
+        self._entries = OrderedDict() # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "redis_hits": 0, "misses": 0, "bypassed": 0}
+
+    def key(self, llm, messages, **kwargs) -> str:
+        params = {name: getattr(llm, name) for name in KEY_PARAMS if getattr(llm, name, None) is not None}
+        raw = json.dumps({
+            "llm": getattr(llm, "_llm_type", type(llm).__name__),
+            "params": params,
+            "messages": [(m.type, m.content) for m in messages],
+            "kwargs": kwargs,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+        if self.redis:
+            raw = self.redis.get(f"llm:{key}")
+            if raw:
+                self.stats["redis_hits"] += 1
+                payload = json.loads(raw)
+                self._put_local(key, payload)
+                return payload
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, payload: dict):
+        self._put_local(key, payload)
+        if self.redis:
+            self.redis.set(f"llm:{key}", json.dumps(payload), ex=self.ttl)
+
+    def _put_local(self, key: str, payload: dict):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def wrap(self, llm, node: str):
+        """The LLM as `node` should use it; responses are only cached if the node is listed in LLM_CACHE_NODES."""
+        return CachedLLM(llm, self, node, enabled=node in settings.LLM_CACHE_NODES)
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round((self.stats["hits"] + self.stats["redis_hits"]) / lookups, 3) if lookups else 0.0,
+            "nodes": list(settings.LLM_CACHE_NODES),
+        }
+
+class CachedLLM:
+    """
+    Wraps a chat model from LLMFactory.create_llm. `ainvoke`/`invoke` return the cached
+    AIMessage when the same model + params + messages were answered before; only misses
+    take an LLM concurrency slot. Everything else is delegated to the wrapped model.
+    Every node's LLM calls go through one of these (caching or not), so this is also where
+    latency and token usage are recorded per call site.
+    """
+    def __init__(self, llm, cache: LLMResponseCache, node: str, enabled: bool = True):
+        self.llm = llm
+        self.cache = cache
+        self.node = node
+        self.enabled = enabled
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _cacheable(self) -> bool:
+        if not self.enabled:
+            return False
+        # Sampling at temperature > 0 is meant to vary between calls
+        if getattr(self.llm, "temperature", 0):
+            self.cache.stats["bypassed"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def _to_message(payload: dict) -> AIMessage:
+        return AIMessage(content=payload["content"], response_metadata={**payload["metadata"], "cache_hit": True})
+
+    @staticmethod
+    def _to_payload(message) -> dict:
+        return {"content": message.content, "metadata": json.loads(json.dumps(message.response_metadata, default=str))}
+
+    async def _ainvoke_upstream(self, messages, **kwargs):
+        async with upstream_limits.slot("llm"):
+            with telemetry.span(f"llm.{self.node}", call_site=self.node):
+                started = time.perf_counter()
+                try:
+                    response = await self.llm.ainvoke(messages, **kwargs)
+                except Exception:
+                    telemetry.record_llm(self.node, seconds=time.perf_counter() - started, result="error")
+                    raise
+                telemetry.record_llm(self.node, response, time.perf_counter() - started)
+        return response
+
+    def _invoke_upstream(self, messages, **kwargs):
+        with telemetry.span(f"llm.{self.node}", call_site=self.node):
+            started = time.perf_counter()
+            response = self.llm.invoke(messages, **kwargs)
+            telemetry.record_llm(self.node, response, time.perf_counter() - started)
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        if not self._cacheable():
+            return await self._ainvoke_upstream(messages, **kwargs)
+
+        key = self.cache.key(self.llm, messages, **kwargs)
+        # Redis is a blocking client; the memory-only path is cheap enough to run inline
+        payload = await asyncio.to_thread(self.cache.get, key) if self.cache.redis else self.cache.get(key)
+        if payload is not None:
+            print(f"--- LLM CACHE HIT ({self.node}) ---")
+            telemetry.record_llm(self.node, result="cache_hit")
+            return self._to_message(payload)
+
+        response = await self._ainvoke_upstream(messages, **kwargs)
+        if self.cache.redis:
+            await asyncio.to_thread(self.cache.put, key, self._to_payload(response))
+        else:
+            self.cache.put(key, self._to_payload(response))
+        return response
+
+    async def astream(self, messages, **kwargs):
+        """
+        Streams the response as AIMessageChunks (a cache hit arrives as one chunk).
+        The consumer may stop early, e.g. the critique stops reading at its verdict; the
+        generation is then cancelled and the prefix it read is what gets cached. That prefix
+        is what the same temperature-0 prompt produces again, so it is still a valid answer
+        for a consumer that parses it the same way. A stream that fails or is cancelled
+        part-way is not cached: its prefix is just where the error struck.
+        """
+        cacheable = self._cacheable()
+        key = self.cache.key(self.llm, messages, **kwargs) if cacheable else None
+        if cacheable:
+            payload = await asyncio.to_thread(self.cache.get, key) if self.cache.redis else self.cache.get(key)
+            if payload is not None:
+                print(f"--- LLM CACHE HIT ({self.node}) ---")
+                telemetry.record_llm(self.node, result="cache_hit")
+                yield AIMessageChunk(content=payload["content"], response_metadata={**payload["metadata"], "cache_hit": True})
+                return
+
+        content = []
+        response = None
+        failed = False
+        async with upstream_limits.slot("llm"):
+            with telemetry.span(f"llm.{self.node}", call_site=self.node, streamed=True) as span:
+                started = time.perf_counter()
+                stream = self.llm.astream(messages, **kwargs)
+                try:
+                    async for chunk in stream:
+                        if not content and span is not None:
+                            span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+                        response = chunk if response is None else response + chunk
+                        content.append(chunk.content if isinstance(chunk.content, str) else "")
+                        yield chunk
+                except GeneratorExit:
+                    # The consumer closed the stream, e.g. on a settled verdict: what it read is its answer
+                    raise
+                except BaseException:
+                    failed = True
+                    raise
+                finally:
+                    # Closing the upstream stream cancels the rest of the generation
+                    await stream.aclose()
+                    if failed:
+                        telemetry.record_llm(self.node, seconds=time.perf_counter() - started, result="error")
+                    else:
+                        telemetry.record_llm(self.node, response, time.perf_counter() - started)
+                    if cacheable and content and not failed:
+                        payload = {"content": "".join(content), "metadata": {}}
+                        if self.cache.redis:
+                            await asyncio.to_thread(self.cache.put, key, payload)
+                        else:
+                            self.cache.put(key, payload)
+
+    def invoke(self, messages, **kwargs):
+        if not self._cacheable():
+            return self._invoke_upstream(messages, **kwargs)
+
+        key = self.cache.key(self.llm, messages, **kwargs)
+        payload = self.cache.get(key)
+        if payload is not None:
+            telemetry.record_llm(self.node, result="cache_hit")
+            return self._to_message(payload)
+        response = self._invoke_upstream(messages, **kwargs)
+        self.cache.put(key, self._to_payload(response))
+        return response
+
+# Global Instance
+llm_response_cache = LLMResponseCache()
@@ -1,6 +1,6 @@
-from langchain_ollama import ChatOllama
-from langchain_google_genai import ChatGoogleGenerativeAI
 from app.core.config import settings
+from app.services.providers import Provider
+from app.services.clients import clients
 
 
 class LLMFactory:
@@ -10,20 +10,26 @@ class LLMFactory:
         Creates a Model-Agnostic LLM interface.
         Switch between Gemini (Cloud) and Ollama (Local/GPU) via env vars.
         """
+        # Provider SDKs are imported here so only the one in use is loaded
         if settings.LLM_PROVIDER == "ollama":
+            from langchain_ollama import ChatOllama
             # Use model from env or default to mistral:7b
             local_model = model_name or getattr(settings, 'OLLAMA_MODEL', 'mistral:7b')
             return ChatOllama(
                 base_url=settings.OLLAMA_BASE_URL,
                 model=local_model,
-                temperature=0
+                temperature=0,
+                # Shares the keep-alive pool with the embedding client
+                **clients.ollama_kwargs()
             )
         
         # Default to Gemini
+        from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(
             model=model_name or "gemini-2.0-flash",
             temperature=0,
             google_api_key=settings.GEMINI_API_KEY
         )
 
-llm = LLMFactory.create_llm()
+# Global Instance (built on first use or during startup; see providers.py)
+llm = Provider("llm", LLMFactory.create_llm)
@@ -0,0 +1,109 @@
+from app.core.config import settings
+import asyncio
+import inspect
+import threading
+import time
+
+class Provider:
+    """
+    Lazily constructed service.
+
+    Nothing is created (and nothing connects) at import time: the factory runs on first
+    attribute access, or during the startup phase via `warm()`. Attribute reads and writes
+    are forwarded to the instance, so callers use the provider as if it were the service.
+    `override()` injects a replacement (stubs in benchmarks, fakes in tests).
+    `depends` lists providers this one is built from; it is rebuilt whenever one of them is.
+    """
+    def __init__(self, name: str, factory, warmup=None, required: bool = True, depends: tuple = ()):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_depends", tuple(depends))
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_warmup", warmup)
+        object.__setattr__(self, "_required", required)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_status", {"ready": False, "error": None, "init_ms": None})
+        registry.append(self)
+
+    def get(self):
+        """The service instance, built on first call."""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    object.__setattr__(self, "_instance", self._factory())
+                    self._status["init_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                instance = self._instance
+        return instance
+
+    def override(self, instance):
+        self._reset_dependents()
+        object.__setattr__(self, "_instance", instance)
+        self._status.update(ready=True, error=None)
+
+    def _reset(self, error: str = None):
+        self._reset_dependents()
+        object.__setattr__(self, "_instance", None)
+        self._status.update(ready=False, error=error)
+
+    def _reset_dependents(self):
+        for p in registry:
+            if self in p._depends and p._instance is not None:
+                p._reset()
+
+    async def warm(self):
+        """Build the service off the event loop and run its warm-up (connect, create indices, ...)."""
+        waiting = [d._name for d in self._depends if not d._status["ready"]]
+        if waiting:
+            self._status.update(ready=False, error=f"waiting for {', '.join(waiting)}")
+            return False
+        try:
+            instance = await asyncio.to_thread(self.get)
+            if self._warmup:
+                result = self._warmup(instance)
+                if inspect.isawaitable(result):
+                    await result
+            self._status.update(ready=True, error=None)
+        except Exception as e:
+            # Built lazily again on the next use or readiness probe
+            self._reset(str(e))
+        return self._status["ready"]
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.get(), attr, value)
+
+    def __repr__(self):
+        return f"<Provider {self._name} ready={self._status['ready']}>"
+
+registry = []
+
+async def startup(timeout: float = settings.STARTUP_TIMEOUT_SECONDS) -> dict:
+    """Startup phase: build and warm every service concurrently. Failures are reported, not raised."""
+    pending = [p for p in registry if not p._status["ready"]]
+
+    async def warm_in_order():
+        # Independent services warm concurrently; dependents after the services they're built from
+        remaining = list(pending)
+        while remaining:
+            batch = [p for p in remaining if not any(d in remaining for d in p._depends)]
+            await asyncio.gather(*[p.warm() for p in batch])
+            remaining = [p for p in remaining if p not in batch]
+
+    try:
+        await asyncio.wait_for(warm_in_order(), timeout)
+    except asyncio.TimeoutError:
+        for p in pending:
+            if not p._status["ready"] and not p._status["error"]:
+                p._status["error"] = f"warm-up timed out after {timeout}s"
+    return readiness()
+
+def readiness() -> dict:
+    services = {p._name: {**p._status, "required": p._required} for p in registry}
+    return {
+        "ready": all(s["ready"] for s in services.values() if s["required"]),
+        "services": services,
+    }
@@ -1,85 +1,478 @@
-from langchain_ollama import OllamaEmbeddings
 from app.core.config import settings
-from redis import Redis
+from app.services.embeddings import embedding_service
+from app.services.providers import Provider
+from collections import OrderedDict
+from app.services.clients import clients
 import numpy as np
+import asyncio
 import json
+import math
+import re
+import threading
+import time
 import uuid
 
+def normalize_topic(query: str) -> str:
+    """Lowercase, collapse whitespace and strip edge punctuation for exact-match keys."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.,;:").strip().lower()
+
+class TierStats:
+    """Hit/miss and latency counters for one cache tier."""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.total_ms = 0.0
+
+    def record(self, hit: bool, started: float):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+
+    def record_many(self, hits: list, started: float):
+        """One batched lookup: counted per query, with the time spread evenly across them."""
+        self.hits += sum(1 for hit in hits if hit)
+        self.misses += sum(1 for hit in hits if not hit)
+        self.total_ms += (time.perf_counter() - started) * 1000
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_latency_ms": round(self.total_ms / lookups, 3) if lookups else 0.0,
+        }
+
+class ExactMatchTier:
+    """Tier 1: LRU keyed by normalized topic. No embedding needed."""
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            report, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return report
+
+    def put(self, key: str, report: str):
+        with self._lock:
+            self._entries[key] = (report, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class VectorTier:
+    """
+    Tier 2: in-process matrix of recent cache vectors.
+    Rows are unit-normalized so cosine similarity is a single matrix-vector product.
+    Insertion is a ring buffer, so the oldest entry is overwritten when full.
+    """
+    def __init__(self, capacity: int, ttl: int):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._matrix = None
+        self._reports = [None] * capacity
+        self._expires = np.zeros(capacity)
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def search(self, vector, threshold: float):
+        """Returns the closest live report within `threshold` cosine distance, else None."""
+        with self._lock:
+            if not self._size:
+                return None
+            q = self._unit(vector)
+            if q.shape[0] != self._matrix.shape[1]:
+                return None
+            scores = self._matrix[:self._size] @ q
+            # Expired rows can never win
+            scores[self._expires[:self._size] < time.time()] = -np.inf
+            best = int(np.argmax(scores))
+            if 1.0 - scores[best] < threshold:
+                return self._reports[best]
+            return None
+
+    def search_many(self, vectors, threshold: float) -> list:
+        """`search` for a batch of query vectors in one matrix product."""
+        with self._lock:
+            if not self._size or not len(vectors):
+                return [None] * len(vectors)
+            q = np.asarray(vectors, dtype=np.float32)
+            if q.shape[1] != self._matrix.shape[1]:
+                return [None] * len(vectors)
+            q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+            scores = self._matrix[:self._size] @ q.T
+            scores[self._expires[:self._size] < time.time()] = -np.inf
+            best = np.argmax(scores, axis=0)
+            return [self._reports[row] if 1.0 - scores[row, i] < threshold else None for i, row in enumerate(best)]
+
+    def add(self, vector, report: str):
+        with self._lock:
+            v = self._unit(vector)
+            if self._matrix is None or self._matrix.shape[1] != v.shape[0]:
+                # First insert (or embedding model changed): size the matrix to the vectors
+                self._matrix = np.zeros((self.capacity, v.shape[0]), dtype=np.float32)
+                self._size = self._next = 0
+            self._matrix[self._next] = v
+            self._reports[self._next] = report
+            self._expires[self._next] = time.time() + self.ttl
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+def quantize_int8(vector) -> np.ndarray:
+    """
+    Symmetric int8 codes for cosine search. Cosine ignores scale, so each vector is
+    stretched to the full int8 range on its own; no corpus-wide calibration is needed.
+    """
+    v = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(v).max()) if v.size else 0.0
+    if not peak:
+        return np.zeros(v.shape, dtype=np.int8)
+    return np.round(v * (127 / peak)).astype(np.int8)
+
+def _index_definition():
+    try:
+        from redis.commands.search.index_definition import IndexDefinition, IndexType
+    except ImportError: # redis-py < 6
+        from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+    return IndexDefinition, IndexType
+
 class RedisSemanticCache:
-    def __init__(self, redis_url: str = settings.REDIS_URL, threshold: float = 0.15):
-        self.redis = Redis.from_url(redis_url, decode_responses=True)
+    """
+    Tiered semantic cache:
+      1. exact-match LRU on the normalized topic (no embedding call)
+      2. in-process vector matrix of recent entries (one NumPy dot product)
+      3. Redis Stack KNN index (HNSW by default), shared across workers
+    Tier 3 hits are promoted into tiers 1 and 2.
+
+    With VECTOR_QUANTIZATION the indexed vectors are int8 (Redis 8+), a quarter of the
+    float32 size in both the hash and the index. With VECTOR_RESCORE a float16 copy of each
+    vector is kept outside the index, and the VECTOR_OVERSAMPLING nearest candidates are
+    re-ranked on it, so the threshold is applied to the exact distance.
+
+    The index schema (algorithm, M, EF_CONSTRUCTION, vector type, the embedding model and
+    its dimension) is recorded next to the index. When it changes, the index is rebuilt over the existing
+    `cache:` hashes and entries embedded with another model are re-embedded (see `reindex`).
+    """
+    def __init__(self, threshold: float = settings.CACHE_DISTANCE_THRESHOLD):
+        self.redis = clients.redis()
         self.threshold = threshold
-        self.embeddings = OllamaEmbeddings(base_url=settings.OLLAMA_BASE_URL, model="qwen3-embedding:8b")
+        self.ttl = settings.CACHE_TTL_SECONDS
+        self.embeddings = embedding_service
         self.index_name = "semantic-cache-index"
+        self.algorithm = settings.CACHE_INDEX_ALGORITHM.upper()
+        self.ef_runtime = settings.CACHE_HNSW_EF_RUNTIME
+        self.quantized = settings.VECTOR_QUANTIZATION != "none"
+        self.rescore = self.quantized and settings.VECTOR_RESCORE
+        self.candidates = max(1, math.ceil(settings.VECTOR_OVERSAMPLING)) if self.rescore else 1
+        # Rescoring reads the float16 originals back, which the decoding client can't return
+        self.raw = clients.redis(decode_responses=False) if self.rescore else None
+        self._index_ready = False
+        self.exact = ExactMatchTier(settings.CACHE_EXACT_SIZE, self.ttl)
+        self.vectors = VectorTier(settings.CACHE_VECTOR_SIZE, self.ttl)
+        self.stats = {"exact": TierStats(), "vector": TierStats(), "redis": TierStats()}
         self._create_index()
 
+    def _schema(self) -> dict:
+        schema = {"algorithm": self.algorithm, "dim": self.embeddings.dimension(), "model": self.embeddings.model,
+                  "type": "INT8" if self.quantized else "FLOAT32", "rescore": self.rescore}
+        if self.algorithm == "HNSW":
+            schema.update(m=settings.CACHE_HNSW_M, ef_construction=settings.CACHE_HNSW_EF_CONSTRUCTION)
+        return schema
+
     def _create_index(self):
-        """Create Redis Search Index for Vectors."""
+        """Create the Redis Search vector index, or rebuild it if its schema changed."""
         try:
             from redis.commands.search.field import VectorField, TextField
-            from redis.commands.search.indexDefinition import IndexDefinition, IndexType
-            
-            # Check if index exists
+            IndexDefinition, IndexType = _index_definition()
+
+            schema = self._schema()
+            signature = json.dumps(schema, sort_keys=True)
+            schema_key = f"{self.index_name}:schema"
             try:
                 self.redis.ft(self.index_name).info()
-            except:
-                # Create Index
-                schema = (
-                    TextField("query"),
-                    TextField("report"),
-                    VectorField("vector",
-                        "FLAT", {
-                            "TYPE": "FLOAT32",
-                            "DIM": 1536,
-                            "DISTANCE_METRIC": "COSINE"
-                        }
-                    )
-                )
+                exists = True
+            except Exception:
+                exists = False
+            if exists and self.redis.get(schema_key) == signature:
+                self._index_ready = True
+                return
+
+            # One worker rebuilds; the others retry on their next save
+            if not self.redis.set(f"{self.index_name}:migrating", "1", nx=True, ex=60):
+                print("--- CACHE INDEX: being rebuilt by another worker ---")
+                return
+            try:
+                if exists:
+                    print(f"--- CACHE INDEX: schema changed ({self.redis.get(schema_key) or 'legacy'} -> {signature}), rebuilding ---")
+                    # The hashes stay; the new index picks them up from the `cache:` prefix
+                    self.redis.ft(self.index_name).dropindex(delete_documents=False)
+                attributes = {"TYPE": schema["type"], "DIM": schema["dim"], "DISTANCE_METRIC": "COSINE"}
+                if self.algorithm == "HNSW":
+                    attributes.update(M=schema["m"], EF_CONSTRUCTION=schema["ef_construction"], EF_RUNTIME=self.ef_runtime)
                 self.redis.ft(self.index_name).create_index(
-                    schema,
+                    (
+                        TextField("query"),
+                        TextField("report"),
+                        VectorField("vector", self.algorithm, attributes),
+                    ),
                     definition=IndexDefinition(prefix=["cache:"], index_type=IndexType.HASH)
                 )
+                self.redis.set(schema_key, signature)
+            finally:
+                self.redis.delete(f"{self.index_name}:migrating")
+            self._index_ready = True
+            if exists:
+                # Entries from the old model or format have the wrong vectors: re-embed them off the startup path
+                threading.Thread(target=self.reindex, daemon=True).start()
         except Exception as e:
             print(f"Index creation failed or skipped: {e}")
+
+    def _vector_fields(self, vector) -> dict:
+        """Hash fields for a vector in the configured storage format."""
+        if not self.quantized:
+            return {"vector": np.array(vector, dtype=np.float32).tobytes()}
+        fields = {"vector": quantize_int8(vector).tobytes()}
+        if self.rescore:
+            fields["vector_full"] = np.array(vector, dtype=np.float16).tobytes()
+        return fields
+
+    def reindex(self, batch_size: int = settings.EMBEDDING_MAX_BATCH) -> dict:
+        """
+        Re-embed cached entries stored with another embedding model, dimension or vector
+        format so the current index covers them. Entries without a query are dropped.
+        """
+        stats = {"scanned": 0, "reembedded": 0, "dropped": 0}
+        model = self.embeddings.model
+        dim = self.embeddings.dimension()
+        expected_bytes = dim * (1 if self.quantized else 4)
+        expected_full = dim * 2 if self.rescore else 0
+        stale = []
+
+        def flush():
+            vectors = self.embeddings.embed_many([query for _, query in stale])
+            pipe = self.redis.pipeline(transaction=False)
+            for (key, _), vector in zip(stale, vectors):
+                pipe.hset(key, mapping={**self._vector_fields(vector), "model": model})
+                if not self.rescore:
+                    pipe.hdel(key, "vector_full")
+            pipe.execute()
+            stats["reembedded"] += len(stale)
+            stale.clear()
+
+        for key in self.redis.scan_iter(match="cache:*", count=1000):
+            stats["scanned"] += 1
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hget(key, "query")
+            pipe.hget(key, "model")
+            # Byte lengths only: the vectors aren't valid UTF-8
+            pipe.hstrlen(key, "vector")
+            pipe.hstrlen(key, "vector_full")
+            query, stored_model, size, full_size = pipe.execute()
+            if not query:
+                self.redis.delete(key)
+                stats["dropped"] += 1
+            elif stored_model != model or size != expected_bytes or full_size != expected_full:
+                stale.append((key, query))
+                if len(stale) >= batch_size:
+                    flush()
+        if stale:
+            flush()
+        print(f"--- CACHE INDEX: reindex {stats} ---")
+        return stats
+
+    def _lookup_exact(self, key: str):
+        started = time.perf_counter()
+        report = self.exact.get(key)
+        self.stats["exact"].record(report is not None, started)
+        return report
+
+    def _lookup_vector(self, vector):
+        started = time.perf_counter()
+        report = self.vectors.search(vector, self.threshold)
+        self.stats["vector"].record(report is not None, started)
+        return report
+
+    def _lookup_redis(self, key: str, vector):
+        started = time.perf_counter()
+        report = self._search(vector)
+        self.stats["redis"].record(report is not None, started)
+        if report is not None:
+            # Promote so the next request for this topic stays in-process
+            self.exact.put(key, report)
+            self.vectors.add(vector, report)
+        return report
+
     def lookup(self, query: str):
         """Find semantically similar query."""
         try:
-            vector = self.embeddings.embed_query(query)
-            # Simple vector search using Redis Stack
-            # Note: For strict correctness we use KNN, but here we do a quick check
-            from redis.commands.search.query import Query
-            
-            q = Query(f"*=>[KNN 1 @vector $vec AS score]").return_fields("report", "score").dialect(2)
-            params = {"vec": np.array(vector, dtype=np.float32).tobytes()}
-            
-            results = self.redis.ft(self.index_name).search(q, query_params=params)
-            
-            if results.docs:
-                doc = results.docs[0]
-                # Redis score is distance (0 is identical, 1 is opposite)
-                # Lower is better. 0.1 means very close.
-                score = float(doc.score)
-                if score < self.threshold:
-                    return doc.report
+            key = normalize_topic(query)
+            report = self._lookup_exact(key)
+            if report is not None:
+                return report
+            vector = self.embeddings.embed(query)
+            report = self._lookup_vector(vector)
+            if report is not None:
+                return report
+            return self._lookup_redis(key, vector)
+        except Exception as e:
+            print(f"Cache lookup failed: {e}")
             return None
+
+    async def alookup(self, query: str):
+        """Async variant of `lookup` that keeps the event loop free."""
+        try:
+            key = normalize_topic(query)
+            report = self._lookup_exact(key)
+            if report is not None:
+                return report
+            vector = await self.embeddings.aembed(query)
+            report = self._lookup_vector(vector)
+            if report is not None:
+                return report
+            return await asyncio.to_thread(self._lookup_redis, key, vector)
         except Exception as e:
             print(f"Cache lookup failed: {e}")
             return None
 
+    async def alookup_many(self, queries: list[str]) -> list:
+        """
+        `alookup` for a list of topics (batch research): the exact tier per topic, one
+        embedding pass for the misses, one matrix product over tier 2, and the Redis KNN
+        queries for what is left run concurrently. Returns a report or None per topic.
+        """
+        reports = [None] * len(queries)
+        try:
+            keys = [normalize_topic(query) for query in queries]
+            started = time.perf_counter()
+            for i, key in enumerate(keys):
+                reports[i] = self.exact.get(key)
+            self.stats["exact"].record_many([report is not None for report in reports], started)
+            todo = [i for i, report in enumerate(reports) if report is None]
+            if not todo:
+                return reports
+
+            vectors = await self.embeddings.aembed_many([queries[i] for i in todo])
+            started = time.perf_counter()
+            found = self.vectors.search_many(vectors, self.threshold)
+            self.stats["vector"].record_many([report is not None for report in found], started)
+            misses = []
+            for i, vector, report in zip(todo, vectors, found):
+                reports[i] = report
+                if report is None:
+                    misses.append((i, vector))
+
+            found = await asyncio.gather(*[
+                asyncio.to_thread(self._lookup_redis, keys[i], vector) for i, vector in misses
+            ], return_exceptions=True)
+            for (i, _), report in zip(misses, found):
+                if isinstance(report, Exception):
+                    print(f"Cache lookup failed: {report}")
+                    continue
+                reports[i] = report
+        except Exception as e:
+            print(f"Cache lookup failed: {e}")
+        return reports
+
+    def _search(self, vector: list[float]):
+        """KNN search for the closest cached query."""
+        # Simple vector search using Redis Stack
+        # Note: For strict correctness we use KNN, but here we do a quick check
+        from redis.commands.search.query import Query
+
+        params = {"vec": self._vector_fields(vector)["vector"]}
+        if self.algorithm == "HNSW":
+            q = Query(f"*=>[KNN {self.candidates} @vector $vec EF_RUNTIME $ef AS score]")
+            params["ef"] = max(self.ef_runtime, self.candidates)
+        else:
+            q = Query(f"*=>[KNN {self.candidates} @vector $vec AS score]")
+        q = q.return_fields("report", "score").dialect(2)
+        if self.rescore:
+            return self._rescored(q.return_field("vector_full", decode_field=False).sort_by("score"), params, vector)
+
+        results = self.redis.ft(self.index_name).search(q, query_params=params)
+
+        if results.docs:
+            doc = results.docs[0]
+            # Redis score is distance (0 is identical, 1 is opposite)
+            # Lower is better. 0.1 means very close.
+            score = float(doc.score)
+            if score < self.threshold:
+                return doc.report
+        return None
+
+    def _rescored(self, q, params: dict, vector: list[float]):
+        """The candidate closest to `vector` by exact cosine on the stored float16 originals."""
+        results = self.raw.ft(self.index_name).search(q, query_params=params)
+        target = VectorTier._unit(vector)
+        best, best_distance = None, None
+        for doc in results.docs:
+            original = getattr(doc, "vector_full", None)
+            if original:
+                distance = 1.0 - float(VectorTier._unit(np.frombuffer(original, dtype=np.float16)) @ target)
+            else:
+                distance = float(doc.score) # entry written before rescoring was enabled
+            if best_distance is None or distance < best_distance:
+                best, best_distance = doc, distance
+        if best is not None and best_distance < self.threshold:
+            return best.report
+        return None
+
     def save(self, query: str, report: str):
         """Save query and report."""
         try:
-            vector = self.embeddings.embed_query(query)
-            key = f"cache:{uuid.uuid4()}"
-            self.redis.hset(key, mapping={
-                "query": query,
-                "report": report,
-                "vector": np.array(vector, dtype=np.float32).tobytes()
-            })
-            # Set TTL 24 hours
-            self.redis.expire(key, 86400) 
+            vector = self.embeddings.embed(query)
+            self._save_local(query, report, vector)
+            self._store(query, report, vector)
         except Exception as e:
             print(f"Cache save failed: {e}")
 
-# Global Instance
-redis_cache = RedisSemanticCache()
+    async def asave(self, query: str, report: str):
+        """Async variant of `save`."""
+        try:
+            vector = await self.embeddings.aembed(query)
+            self._save_local(query, report, vector)
+            await asyncio.to_thread(self._store, query, report, vector)
+        except Exception as e:
+            print(f"Cache save failed: {e}")
+
+    def _save_local(self, query: str, report: str, vector):
+        self.exact.put(normalize_topic(query), report)
+        self.vectors.add(vector, report)
+
+    def _store(self, query: str, report: str, vector: list[float]):
+        if not self._index_ready:
+            self._create_index()
+        key = f"cache:{uuid.uuid4()}"
+        self.redis.hset(key, mapping={
+            "query": query,
+            "report": report,
+            **self._vector_fields(vector),
+            "model": self.embeddings.model
+        })
+        self.redis.expire(key, self.ttl)
+
+    def get_stats(self) -> dict:
+        """Hit rate and average latency per tier."""
+        return {tier: stats.as_dict() for tier, stats in self.stats.items()}
+
+# Global Instance (connects and creates the index on first use or during startup)
+redis_cache = Provider("redis_cache", RedisSemanticCache, warmup=lambda cache: cache.redis.ping())
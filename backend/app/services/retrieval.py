@@ -0,0 +1,224 @@
+from langchain_core.documents import Document
+from app.core.config import settings
+from app.services.vector_db import vector_db, search_params
+from app.services.clients import clients
+from app.services.telemetry import telemetry
+from collections import Counter, defaultdict
+import heapq
+import math
+import re
+import threading
+import time
+
+# Keeps identifiers like "gpt-4o", "llama-3.1" and "rag_v2" as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "what which who how why when about into than then these those their there".split()
+)
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring over the RAG chunks."""
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict) # term -> {chunk_id: term frequency}
+        self.docs = {} # chunk_id -> Document
+        self.doc_terms = {} # chunk_id -> Counter, needed to unindex
+        self.doc_len = {}
+        self.total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id: str, document: Document):
+        terms = Counter(tokenize(document.page_content))
+        with self._lock:
+            if doc_id in self.docs:
+                self._remove(doc_id)
+            self.docs[doc_id] = document
+            self.doc_terms[doc_id] = terms
+            self.doc_len[doc_id] = sum(terms.values())
+            self.total_len += self.doc_len[doc_id]
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = tf
+
+    def add_documents(self, documents: list[Document]):
+        for doc in documents:
+            self.add(doc.metadata["chunk_id"], doc)
+
+    def remove(self, doc_ids: list[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self.docs:
+                    self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id)
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+
+    def search(self, query: str, k: int, sources: list[str] = None) -> list[str]:
+        """Top-k chunk ids by BM25, optionally restricted to the given sources."""
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self.total_len / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    if sources and self.docs[doc_id].metadata.get("source") not in sources:
+                        continue
+                    dl = self.doc_len[doc_id]
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl))
+            return heapq.nlargest(k, scores, key=scores.get)
+
+class HybridRetriever:
+    """
+    Hybrid RAG retrieval over the `research_papers` collection:
+    dense Qdrant search (with a precomputed query vector) + local BM25,
+    fused with reciprocal rank fusion and optionally reranked on CPU.
+
+    The BM25 index is updated in-process by ingestion. Other workers learn about
+    changes through a Redis generation counter and rebuild from a Qdrant scroll.
+    """
+    GENERATION_KEY = "retrieval:generation"
+
+    def __init__(self, vector_db=vector_db):
+        self.vector_db = vector_db
+        self.redis = clients.redis()
+        self.index = BM25Index()
+        self._generation = None
+        self._checked_at = 0.0
+        self._sync_lock = threading.Lock()
+        self._reranker = None
+        self._reranker_loaded = False
+
+    # --- Keeping BM25 in sync with Qdrant ---
+
+    def rebuild(self):
+        """Reload the BM25 index from every chunk stored in Qdrant."""
+        index = BM25Index()
+        offset = None
+        while True:
+            records, offset = self.vector_db.client.scroll(
+                collection_name=self.vector_db.collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for record in records:
+                payload = record.payload or {}
+                index.add(str(record.id), Document(
+                    page_content=payload.get("page_content", ""),
+                    metadata=payload.get("metadata") or {}
+                ))
+            if offset is None:
+                break
+        self.index = index
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < settings.BM25_REFRESH_SECONDS:
+            return
+        with self._sync_lock:
+            self._checked_at = now
+            generation = self.redis.get(self.GENERATION_KEY) or "0"
+            if generation != self._generation:
+                self.rebuild()
+                self._generation = generation
+
+    def mark_changed(self):
+        """Called after this worker changed the collection; tells other workers to rebuild."""
+        generation = str(self.redis.incr(self.GENERATION_KEY))
+        # This worker's index was already updated in place
+        if self._generation is not None:
+            self._generation = generation
+
+    # --- Retrieval ---
+
+    def dense_search(self, vector: list[float], k: int, sources: list[str] = None) -> list[tuple]:
+        from qdrant_client.models import Filter, FieldCondition, MatchAny
+        query_filter = None
+        if sources:
+            query_filter = Filter(must=[FieldCondition(key="metadata.source", match=MatchAny(any=sources))])
+        with telemetry.upstream("qdrant", k=k):
+            points = self.vector_db.client.query_points(
+                collection_name=self.vector_db.collection_name,
+                query=vector,
+                limit=k,
+                query_filter=query_filter,
+                search_params=search_params(),
+                with_payload=True
+            ).points
+        return [(str(p.id), Document(
+            page_content=(p.payload or {}).get("page_content", ""),
+            metadata=(p.payload or {}).get("metadata") or {}
+        )) for p in points]
+
+    def _get_reranker(self):
+        if not self._reranker_loaded:
+            self._reranker_loaded = True
+            if settings.RERANKER_MODEL:
+                try:
+                    from flashrank import Ranker
+                    self._reranker = Ranker(model_name=settings.RERANKER_MODEL)
+                except Exception as e:
+                    print(f"Reranker disabled: {e}")
+        return self._reranker
+
+    def _rerank(self, query: str, candidates: list[tuple]) -> list[tuple]:
+        reranker = self._get_reranker()
+        if not reranker:
+            return candidates
+        from flashrank import RerankRequest
+        by_id = dict(candidates)
+        ranked = reranker.rerank(RerankRequest(
+            query=query,
+            passages=[{"id": doc_id, "text": doc.page_content} for doc_id, doc in candidates]
+        ))
+        return [(r["id"], by_id[r["id"]]) for r in ranked]
+
+    def search(self, query: str, vector: list[float], k: int = settings.RAG_TOP_K,
+               sources: list[str] = None, rerank: bool = True) -> list[Document]:
+        """Fused dense + BM25 results. `vector` is the already-computed embedding of `query`."""
+        self._sync()
+        candidates = settings.RAG_CANDIDATES
+        dense = self.dense_search(vector, candidates, sources)
+        sparse = self.index.search(query, candidates, sources)
+
+        docs = dict(dense)
+        for doc_id in sparse:
+            docs.setdefault(doc_id, self.index.docs.get(doc_id))
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in dense], sparse], k=settings.RAG_RRF_K)
+        results = [(doc_id, docs[doc_id]) for doc_id in fused if docs.get(doc_id) is not None][:candidates]
+
+        if rerank:
+            results = self._rerank(query, results)
+        return [doc for _, doc in results[:k]]
+
+# Global Instance
+hybrid_retriever = HybridRetriever()
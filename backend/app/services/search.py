@@ -0,0 +1,233 @@
+from app.core.config import settings
+from app.services.providers import Provider
+from app.services.clients import clients
+from app.services.limits import upstream_limits
+from app.services.telemetry import telemetry
+from app.services.redis_cache import normalize_topic
+from app.services.retrieval import tokenize
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+
+TRACKING_PARAMS = re.compile(r"^(?:utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|ref|ref_src|igshid)$", re.IGNORECASE)
+
+def canonical_url(url: str) -> str:
+    """
+    The form two URLs for the same page share: scheme-less http/https, lower-case host
+    without "www." or default port, no fragment, trailing slash or tracking parameters,
+    and sorted query parameters.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, "")).lstrip("/")
+
+def snippet_urls(snippets: list[str]) -> set:
+    """Canonical URLs of "Content: ...\\nSource: <url>" snippets already in state."""
+    return {canonical_url(s.rsplit("\nSource: ", 1)[-1]) for s in snippets or [] if "\nSource: " in s}
+
+def dedup_results(results: list[dict], seen: set) -> list[dict]:
+    """Results whose page isn't in `seen` (canonical URLs), first copy wins; `seen` is updated."""
+    kept = []
+    for result in results:
+        url = canonical_url(result.get("url", ""))
+        if url and url not in seen:
+            seen.add(url)
+            kept.append(result)
+    return kept
+
+def _create_tavily():
+    from tavily import AsyncTavilyClient
+    # Keep-alive HTTP/2 session shared by every search
+    return AsyncTavilyClient(api_key=settings.TAVILY_API_KEY, client=clients.http("tavily", "https://api.tavily.com"))
+
+tavily = Provider("tavily", _create_tavily)
+
+class LocalSearchBackend:
+    """
+    Offline stand-in for Tavily with the same `search()` response shape. Pages come
+    from SEARCH_LOCAL_FILE (JSON lines: url, title, content, optional images) ranked by
+    term overlap with the query; without a file, deterministic synthetic pages are returned.
+    """
+    def __init__(self, path: str = settings.SEARCH_LOCAL_FILE):
+        self.pages = []
+        if path:
+            with open(path, encoding="utf-8") as f:
+                self.pages = [json.loads(line) for line in f if line.strip()]
+        self._terms = [set(tokenize(f"{p.get('title', '')} {p.get('content', '')}")) for p in self.pages]
+
+    async def search(self, query: str, max_results: int = 5, include_images: bool = False, **kwargs) -> dict:
+        terms = set(tokenize(query))
+        if self.pages:
+            scored = sorted(((len(terms & page_terms), i) for i, page_terms in enumerate(self._terms)), key=lambda s: -s[0])
+            pages = [self.pages[i] for score, i in scored[:max_results] if score > 0]
+        else:
+            slug = "-".join(sorted(terms))[:60] or "query"
+            pages = [{"url": f"https://search.local/{slug}/{i}", "title": f"{query} ({i})",
+                      "content": f"Offline result {i} for {query}."} for i in range(max_results)]
+        images = [image for page in pages for image in page.get("images", [])] if include_images else []
+        return {
+            "query": query,
+            "results": [{"url": p["url"], "title": p.get("title", ""), "content": p.get("content", ""), "score": 1.0} for p in pages],
+            "images": images,
+        }
+
+class SearchService:
+    """
+    Cached web search for search_web_node and delta_search_node.
+      - keyed by the normalized query plus the search parameters (depth, result count, images)
+      - fresh for SEARCH_CACHE_TTL_SECONDS; for SEARCH_STALE_SECONDS after that the stale
+        results are returned at once and refreshed in the background (stale-while-revalidate),
+        with one refresh per key across workers
+      - concurrent identical searches share one upstream call
+      - bounded in-process LRU in front of Redis, so every worker shares the results
+    Empty result sets are not cached.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.redis = clients.redis() if settings.SEARCH_CACHE_REDIS else None
+        self.fresh_seconds = settings.SEARCH_CACHE_TTL_SECONDS
+        self.stale_seconds = settings.SEARCH_STALE_SECONDS
+        self.max_entries = settings.SEARCH_CACHE_SIZE
+        self._entries = OrderedDict() # key -> (fetched_at, result)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._tasks = set()
+        self.stats = {
+            "requests": 0, "fresh_hits": 0, "stale_hits": 0, "redis_hits": 0, "misses": 0,
+            "inflight_joins": 0, "upstream_calls": 0, "revalidations": 0, "errors": 0,
+        }
+
+    def _backend(self):
+        if self.backend is None:
+            self.backend = LocalSearchBackend() if settings.SEARCH_BACKEND == "local" else tavily
+        return self.backend
+
+    @staticmethod
+    def key(query: str, **params) -> str:
+        raw = json.dumps({"query": normalize_topic(query), "params": params}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    # --- Storage ---
+    # The Redis client is synchronous, so its round trips run in a worker thread
+
+    async def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.redis:
+            raw = await asyncio.to_thread(self.redis.get, f"search:{key}")
+            if raw:
+                self.stats["redis_hits"] += 1
+                payload = json.loads(raw)
+                entry = (payload["fetched_at"], payload["result"])
+                self._put_local(key, entry)
+                return entry
+        return None
+
+    async def _put(self, key: str, result: dict):
+        entry = (time.time(), result)
+        self._put_local(key, entry)
+        if self.redis:
+            payload = json.dumps({"fetched_at": entry[0], "result": result})
+            await asyncio.to_thread(self.redis.set, f"search:{key}", payload, ex=self.fresh_seconds + self.stale_seconds)
+
+    def _put_local(self, key: str, entry: tuple):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- Search ---
+
+    async def _fetch(self, query: str, params: dict) -> dict:
+        backend = self._backend()
+        self.stats["upstream_calls"] += 1
+        async with upstream_limits.slot("search"):
+            with telemetry.upstream("tavily" if settings.SEARCH_BACKEND == "tavily" else "local_search"):
+                return await backend.search(query=query, **params)
+
+    async def _fetch_and_store(self, key: str, query: str, params: dict) -> dict:
+        """One upstream call per key at a time; concurrent callers share the result."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["inflight_joins"] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._fetch(query, params)
+            if result.get("results"):
+                await self._put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            self.stats["errors"] += 1
+            future.set_exception(e)
+            future.exception() # retrieved here, so a future nobody joined doesn't log a warning
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _revalidate(self, key: str, query: str, params: dict):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                # One refresh per key across workers; the others keep serving the stale copy
+                if self.redis and not await asyncio.to_thread(
+                        self.redis.set, f"search:refresh:{key}", "1", ex=settings.SEARCH_REFRESH_LOCK_SECONDS, nx=True):
+                    return
+                self.stats["revalidations"] += 1
+                await self._fetch_and_store(key, query, params)
+            except Exception as e:
+                print(f"Search revalidation failed for '{query}': {e}")
+
+        # Keep a reference so the refresh task isn't garbage collected mid-flight
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def search(self, query: str, **params) -> dict:
+        """Tavily-shaped results for `query`; `params` are passed to the backend (and part of the key)."""
+        self.stats["requests"] += 1
+        if not settings.SEARCH_CACHE_ENABLED:
+            return await self._fetch(query, params)
+        key = self.key(query, **params)
+        entry = await self._get(key)
+        if entry is not None:
+            fetched_at, result = entry
+            age = time.time() - fetched_at
+            if age < self.fresh_seconds:
+                self.stats["fresh_hits"] += 1
+                return result
+            if age < self.fresh_seconds + self.stale_seconds:
+                self.stats["stale_hits"] += 1
+                self._revalidate(key, query, params)
+                return result
+        self.stats["misses"] += 1
+        return await self._fetch_and_store(key, query, params)
+
+    def get_stats(self) -> dict:
+        served = self.stats["fresh_hits"] + self.stats["stale_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(served / self.stats["requests"], 3) if self.stats["requests"] else 0.0,
+        }
+
+# Global Instance
+search_service = Provider("search", SearchService, required=False)
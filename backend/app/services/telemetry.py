@@ -0,0 +1,361 @@
+from app.core.config import settings
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import atexit
+import contextvars
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# Seconds; covers cache hits (ms) through full LLM generations (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labels, key)} {value}" for key, value in self._values.items()]
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, entry in self._values.items():
+                for bound, count in zip(self.buckets, entry):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {entry[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {entry[-1]}")
+        return lines
+
+class Span:
+    """A finished-or-running span as kept by the local exporter."""
+    def __init__(self, name: str, trace_id: str, parent_id, thread_id, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.thread_id = thread_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms = None
+        self.status = "ok"
+        self.otel = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread_id": self.thread_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+_current_span = contextvars.ContextVar("amri_span", default=None)
+
+def _current_thread_id():
+    """thread_id of the graph run we're in (LangGraph keeps the run config in a context var)."""
+    try:
+        from langgraph.config import get_config
+        return get_config().get("configurable", {}).get("thread_id")
+    except Exception:
+        return None
+
+def trace_id_for(thread_id: str) -> str:
+    """Every run of a thread (including HITL resumes and worker runs) lands in one trace."""
+    try:
+        return f"{uuid.UUID(str(thread_id)).int:032x}"
+    except ValueError:
+        return f"{uuid.uuid5(uuid.NAMESPACE_URL, str(thread_id)).int:032x}"
+
+class Telemetry:
+    """
+    Metrics and traces for the research pipeline, with no external collector required:
+      - per-node timings, LLM latency and token counts per call site, upstream latency
+        (Tavily, embeddings, Qdrant) as Prometheus metrics at GET /metrics
+      - cache hit/miss per tier and queue depth, read from the services' own stats at scrape time
+      - spans grouped into one trace per thread_id, kept in memory (GET /traces/{thread_id}),
+        optionally appended to TRACE_FILE, and forwarded to OpenTelemetry when it is installed
+    Metrics are per process, like the other /stats endpoints. TRACE_FILE is written by a
+    background thread in batches, so finishing a span never waits on the disk.
+    """
+    def __init__(self):
+        self.enabled = settings.TELEMETRY_ENABLED
+        self.node_seconds = Histogram("amri_node_duration_seconds", "Wall time per graph node", ("node",))
+        self.llm_seconds = Histogram("amri_llm_request_duration_seconds", "LLM call latency per call site (upstream calls only)", ("call_site",))
+        self.llm_requests = Counter("amri_llm_requests_total", "LLM calls per call site and outcome", ("call_site", "result"))
+        self.llm_tokens = Counter("amri_llm_tokens_total", "LLM tokens per call site", ("call_site", "type"))
+        self.upstream_seconds = Histogram("amri_upstream_request_duration_seconds", "Latency of calls to external services", ("upstream",))
+        self.upstream_errors = Counter("amri_upstream_errors_total", "Failed calls to external services", ("upstream",))
+        self.guardrail_chunks = Counter("amri_guardrail_chunks_total", "Report chunks by guardrail pre-filter outcome", ("outcome",))
+        self.metrics = [self.node_seconds, self.llm_seconds, self.llm_requests, self.llm_tokens,
+                        self.upstream_seconds, self.upstream_errors, self.guardrail_chunks]
+
+        self._traces = OrderedDict() # thread_id -> deque of span dicts
+        self._traces_lock = threading.Lock()
+        self._trace_writer_lock = threading.Lock()
+        self._trace_lines = queue.SimpleQueue() # span records waiting for the TRACE_FILE writer
+        self._trace_writer = None # started with the first span written to TRACE_FILE
+        self._tracer = otel_trace.get_tracer("amri") if otel_trace else None
+
+    # --- Export setup ---
+
+    def configure_otlp(self):
+        """Install an OTLP span exporter if OTEL_EXPORTER_OTLP_ENDPOINT is set (needs opentelemetry-sdk)."""
+        if not settings.OTEL_EXPORTER_OTLP_ENDPOINT or otel_trace is None:
+            return
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("OTLP export disabled: install opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http")
+            return
+        provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)))
+        otel_trace.set_tracer_provider(provider)
+        self._tracer = otel_trace.get_tracer("amri")
+
+    # --- Spans ---
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Times a block as a span. Nested spans become children; top-level spans inside a
+        graph run are parented to the run's thread so each thread_id is one trace.
+        """
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        thread_id = parent.thread_id if parent else _current_thread_id()
+        trace_id = parent.trace_id if parent else (trace_id_for(thread_id) if thread_id else f"{random.getrandbits(128):032x}")
+        span = Span(name, trace_id, parent.span_id if parent else None, thread_id, attributes)
+        token = _current_span.set(span)
+        otel_span = span.otel = self._start_otel(span, parent)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = f"error: {type(e).__name__}"
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_span.reset(token)
+            if otel_span is not None:
+                self._end_otel(otel_span, span)
+            self._export(span)
+
+    def _start_otel(self, span: Span, parent):
+        if self._tracer is None:
+            return None
+        context = None
+        if parent is not None and parent.otel is not None:
+            context = otel_trace.set_span_in_context(parent.otel)
+        elif span.thread_id:
+            # Synthetic remote parent carrying the thread's trace id
+            parent = otel_trace.NonRecordingSpan(otel_trace.SpanContext(
+                trace_id=int(span.trace_id, 16),
+                span_id=int(span.trace_id[:16], 16) or 1,
+                is_remote=True,
+                trace_flags=otel_trace.TraceFlags(otel_trace.TraceFlags.SAMPLED),
+            ))
+            context = otel_trace.set_span_in_context(parent)
+        otel_span = self._tracer.start_span(span.name, context=context)
+        if span.thread_id:
+            otel_span.set_attribute("thread_id", span.thread_id)
+        return otel_span
+
+    @staticmethod
+    def _end_otel(otel_span, span: Span):
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otel_span.set_attribute(key, value)
+        if span.status != "ok":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, span.status))
+        otel_span.end()
+
+    def _export(self, span: Span):
+        record = span.as_dict()
+        if span.thread_id:
+            with self._traces_lock:
+                spans = self._traces.get(span.thread_id)
+                if spans is None:
+                    spans = self._traces[span.thread_id] = deque(maxlen=1000)
+                self._traces.move_to_end(span.thread_id)
+                spans.append(record)
+                while len(self._traces) > settings.TRACE_BUFFER_THREADS:
+                    self._traces.popitem(last=False)
+        if settings.TRACE_FILE:
+            self._start_trace_writer()
+            self._trace_lines.put(record)
+
+    def _start_trace_writer(self):
+        if self._trace_writer is not None and self._trace_writer.is_alive():
+            return
+        with self._trace_writer_lock:
+            if self._trace_writer is None:
+                atexit.register(self.flush_traces)
+            if self._trace_writer is None or not self._trace_writer.is_alive():
+                self._trace_writer = threading.Thread(target=self._write_traces, name="trace-file", daemon=True)
+                self._trace_writer.start()
+
+    def _write_traces(self):
+        """Append queued spans to TRACE_FILE, everything that finished meanwhile in one write. Stops at None."""
+        stopping = False
+        while not stopping:
+            records = [self._trace_lines.get()]
+            while True:
+                try:
+                    records.append(self._trace_lines.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in records
+            lines = [json.dumps(record, default=str) + "\n" for record in records if record is not None]
+            try:
+                with open(settings.TRACE_FILE, "a") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                print(f"Trace export to {settings.TRACE_FILE} failed: {e}")
+
+    def flush_traces(self, timeout: float = 5.0):
+        """Write out the spans still queued for TRACE_FILE (runs at exit)."""
+        writer = self._trace_writer
+        if writer is not None and writer.is_alive():
+            self._trace_lines.put(None)
+            writer.join(timeout)
+
+    def get_trace(self, thread_id: str):
+        """Spans recorded for a thread by this process, in start order (None if unknown)."""
+        with self._traces_lock:
+            spans = self._traces.get(thread_id)
+            spans = list(spans) if spans is not None else None
+        if spans is None:
+            return None
+        spans.sort(key=lambda s: s["start"])
+        return {"thread_id": thread_id, "trace_id": trace_id_for(thread_id), "spans": spans}
+
+    # --- Recording helpers ---
+
+    def record_node(self, node: str, seconds: float):
+        if self.enabled:
+            self.node_seconds.observe(seconds, node=node)
+
+    def record_guardrail(self, clean: int, flagged: int):
+        """Chunks the pre-filter passed locally vs. sent to the LLM judge."""
+        if self.enabled:
+            self.guardrail_chunks.inc(clean, outcome="clean")
+            self.guardrail_chunks.inc(flagged, outcome="flagged")
+
+    def record_llm(self, call_site: str, response=None, seconds: float = None, result: str = "upstream"):
+        """One LLM call: latency (upstream calls), outcome, and token usage when the model reports it."""
+        if not self.enabled:
+            return
+        self.llm_requests.inc(call_site=call_site, result=result)
+        if seconds is not None:
+            self.llm_seconds.observe(seconds, call_site=call_site)
+        usage = getattr(response, "usage_metadata", None) or {}
+        if result == "upstream" and usage:
+            self.llm_tokens.inc(usage.get("input_tokens", 0), call_site=call_site, type="input")
+            self.llm_tokens.inc(usage.get("output_tokens", 0), call_site=call_site, type="output")
+        span = _current_span.get()
+        if span is not None and usage:
+            span.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+
+    @contextmanager
+    def upstream(self, name: str, **attributes):
+        """Span + latency histogram around a call to an external service."""
+        started = time.perf_counter()
+        try:
+            with self.span(f"upstream.{name}", **attributes) as span:
+                yield span
+        except BaseException:
+            if self.enabled:
+                self.upstream_errors.inc(upstream=name)
+            raise
+        finally:
+            if self.enabled:
+                self.upstream_seconds.observe(time.perf_counter() - started, upstream=name)
+
+    # --- Exposition ---
+
+    def render(self, gauges: list = ()) -> str:
+        """
+        Prometheus text format. `gauges` are (name, help, kind, [(labels dict, value)]) tuples
+        collected at scrape time from the services' own counters.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for name, help, kind, samples in gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+# Global Instance
+telemetry = Telemetry()
@@ -1,40 +1,140 @@
-from qdrant_client import QdrantClient
-from langchain_community.vectorstores import Qdrant
-from langchain_ollama import OllamaEmbeddings
 from langchain_core.documents import Document
 from app.core.config import settings
+from app.services.embeddings import embedding_service
+from app.services.providers import Provider
+from app.services.clients import clients
 from typing import Optional
+import hashlib
 import uuid
 
+# Namespace for content-addressed chunk ids (Qdrant ids must be UUIDs or ints)
+CHUNK_NAMESPACE = uuid.UUID("6f1c2a4e-8b7d-4c1e-9a53-2d0f7e6b9c41")
+
+def quantization_config():
+    """Qdrant quantization for VECTOR_QUANTIZATION; the quantized vectors stay in RAM, the originals go to disk."""
+    from qdrant_client import models
+    mode = settings.VECTOR_QUANTIZATION
+    if mode == "int8":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def search_params():
+    """Query-time settings: rescore the quantized candidates on the original vectors."""
+    if settings.VECTOR_QUANTIZATION == "none":
+        return None
+    from qdrant_client import models
+    return models.SearchParams(quantization=models.QuantizationSearchParams(
+        rescore=settings.VECTOR_RESCORE, oversampling=settings.VECTOR_OVERSAMPLING))
+
+def _quantization_mode(config) -> str:
+    if config is None:
+        return "none"
+    return "binary" if getattr(config, "binary", None) else "int8"
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(document_id: str, text: str) -> str:
+    """
+    Deterministic point id for a chunk of a document.
+    Re-ingesting the same text overwrites the same point instead of adding a duplicate.
+    """
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{document_id}:{content_hash(text)}"))
+
 class VectorDBService:
     def __init__(self):
-        self.client = QdrantClient(url=settings.QDRANT_URL)
+        self.client = clients.qdrant()
         self.collection_name = "research_papers"
         self.cache_collection = "semantic_cache"
-        self.embeddings = OllamaEmbeddings(base_url=settings.OLLAMA_BASE_URL, model="qwen3-embedding:8b")
+        self.embeddings = embedding_service.as_langchain()
+        self._vector_store = None
         self._ensure_collections()
 
     def _ensure_collections(self):
-        """Ensure the collections exist."""
+        """Ensure the collections exist, sized for the configured embedding model."""
+        dim = embedding_service.dimension()
         for col in [self.collection_name, self.cache_collection]:
-            if not self.client.collection_exists(col):
-                self.client.create_collection(
-                    collection_name=col,
-                    vectors_config={"size": 1536, "distance": "Cosine"}
-                )
+            if self.client.collection_exists(col):
+                config = self.client.get_collection(col).config
+                size = config.params.vectors.size
+                if size == dim:
+                    self._ensure_quantization(col, config)
+                    continue
+                if col == self.collection_name:
+                    # Documents can't be re-embedded without their files: keep them and say what to do
+                    print(f"WARNING: collection {col} holds {size}-d vectors but {embedding_service.model} makes {dim}-d ones. "
+                          f"Delete it and the ingest:manifest:* keys, then re-upload the PDFs.")
+                    continue
+                # Cached answers are derived data: start the collection over at the new size
+                print(f"--- VECTOR DB: recreating {col} for {dim}-d vectors (was {size}) ---")
+                self.client.delete_collection(col)
+            self.client.create_collection(
+                collection_name=col,
+                vectors_config={"size": dim, "distance": "Cosine", "on_disk": settings.VECTOR_QUANTIZATION != "none"},
+                quantization_config=quantization_config()
+            )
+            if col == self.collection_name:
+                # Keyword index for the per-source RAG filter
+                self.client.create_payload_index(col, field_name="metadata.source", field_schema="keyword")
 
-    def get_vector_store(self):
-        """Returns a LangChain Qdrant vector store object."""
-        return Qdrant(
-            client=self.client,
-            collection_name=self.collection_name,
-            embeddings=self.embeddings,
+    def _ensure_quantization(self, col: str, config):
+        """Switch an existing collection to VECTOR_QUANTIZATION; Qdrant re-quantizes in the background."""
+        mode = settings.VECTOR_QUANTIZATION
+        if _quantization_mode(config.quantization_config) == mode:
+            return
+        from qdrant_client import models
+        print(f"--- VECTOR DB: {col} quantization {_quantization_mode(config.quantization_config)} -> {mode} ---")
+        self.client.update_collection(
+            collection_name=col,
+            vectors_config={"": models.VectorParamsDiff(on_disk=mode != "none")},
+            quantization_config=quantization_config() or models.Disabled.DISABLED
         )
 
+    def get_vector_store(self):
+        """Returns the LangChain Qdrant vector store (built once, on the shared client)."""
+        if self._vector_store is None:
+            from langchain_community.vectorstores import Qdrant
+            self._vector_store = Qdrant(
+                client=self.client,
+                collection_name=self.collection_name,
+                embeddings=self.embeddings,
+            )
+        return self._vector_store
+
     def add_documents(self, documents: list[Document]):
         """Ingest documents into Qdrant."""
         vector_store = self.get_vector_store()
-        vector_store.add_documents(documents)
+        ids = [chunk_id(doc.metadata.get("document_id") or doc.metadata.get("source", ""), doc.page_content) for doc in documents]
+        vector_store.add_documents(documents, ids=ids)
+
+    def upsert_chunks(self, documents: list[Document], vectors: list[list[float]]):
+        """
+        Upsert pre-embedded chunks in one request, in the payload layout the LangChain wrapper reads.
+        Each document must carry its content-addressed `chunk_id` in metadata.
+        """
+        from qdrant_client.models import PointStruct
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[PointStruct(
+                id=doc.metadata["chunk_id"],
+                vector=vector,
+                payload={"page_content": doc.page_content, "metadata": doc.metadata}
+            ) for doc, vector in zip(documents, vectors)],
+            wait=True
+        )
+
+    def delete_chunks(self, ids: list[str]):
+        """Remove chunks by id (stale chunks of a re-ingested document)."""
+        if ids:
+            from qdrant_client.models import PointIdsList
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=ids),
+                wait=True
+            )
 
     def search_cache(self, query: str, threshold: float = 0.9) -> Optional[str]:
         """Check for semantically similar past queries."""
@@ -42,7 +142,8 @@ class VectorDBService:
         results = self.client.search(
             collection_name=self.cache_collection,
             query_vector=vector,
-            limit=1
+            limit=1,
+            search_params=search_params()
         )
         if results and results[0].score >= threshold:
             print(f"--- SEMANTIC CACHE HIT: Score {results[0].score} ---")
@@ -62,5 +163,5 @@ class VectorDBService:
             }]
         )
 
-# Global instance
-vector_db = VectorDBService()
+# Global instance (connects and creates collections on first use or during startup)
+vector_db = Provider("vector_db", VectorDBService)
@@ -0,0 +1,139 @@
+"""
+Research worker: runs queued research jobs (POST /research/jobs) outside the API process,
+so API throughput and research throughput scale independently.
+
+    python -m app.worker                              # WORKER_PROCESSES x WORKER_CONCURRENCY
+    python -m app.worker --processes 4 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from app.core.config import settings
+from app.agent.graph import graph_app, compact_thread
+from app.services.jobs import research_jobs
+from app.services import providers
+from app.services.telemetry import telemetry
+
+
+class ResearchWorker:
+    """One worker process: `concurrency` graph runs in flight on one event loop."""
+    def __init__(self, concurrency: int = settings.WORKER_CONCURRENCY):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        telemetry.configure_otlp()
+        # Don't take jobs until the checkpointer and other required services are up
+        while not (await providers.startup())["ready"]:
+            print(f"--- WORKER {self.worker_id}: waiting for services: {providers.readiness()['services']} ---")
+            await asyncio.sleep(5)
+        await research_jobs.heartbeat(self.worker_id)
+        await self._recover()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        print(f"--- WORKER {self.worker_id}: {self.concurrency} concurrent jobs ---")
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await asyncio.gather(*[self._consume() for _ in range(self.concurrency)])
+        finally:
+            heartbeat.cancel()
+            await research_jobs.stop_worker(self.worker_id)
+
+    async def _heartbeat(self):
+        beats = 0
+        while True:
+            await research_jobs.heartbeat(self.worker_id)
+            beats += 1
+            # A worker that crashes while the others keep running would otherwise hold its jobs until a restart
+            if beats % settings.WORKER_RECOVER_EVERY == 0:
+                await self._recover()
+            await asyncio.sleep(settings.WORKER_HEARTBEAT_SECONDS)
+
+    async def _recover(self):
+        try:
+            requeued = await research_jobs.recover()
+        except Exception as e:
+            print(f"--- WORKER {self.worker_id}: recovery sweep failed: {e} ---")
+            return
+        if requeued:
+            print(f"--- WORKER {self.worker_id}: requeued {requeued} jobs from dead workers ---")
+
+    async def _consume(self):
+        # Finish the current job on shutdown; only stop taking new ones
+        while not self._stopping.is_set():
+            raw = await research_jobs.take(self.worker_id, timeout=1.0)
+            if raw is None:
+                continue
+            await self._execute(json.loads(raw))
+            await research_jobs.ack(self.worker_id, raw)
+
+    async def _execute(self, payload: dict):
+        thread_id = payload["thread_id"]
+        config = {"configurable": {"thread_id": thread_id}}
+        # error=None: a requeued job may carry the error of its previous attempt
+        await research_jobs.update(thread_id, status="running", started_at=time.time(), worker=self.worker_id, error=None)
+        try:
+            snapshot = await graph_app.aget_state(config)
+            paused = "human_review" in (snapshot.next or ())
+            if payload["kind"] == "resume" and paused:
+                await graph_app.aupdate_state(config, {"human_feedback": payload["feedback"]}, as_node="human_review")
+                await graph_app.ainvoke(None, config=config)
+            elif snapshot.values:
+                # Requeued from a worker that died part-way: carry on from its last checkpoint.
+                # Starting over on this thread would append to the search_results reducer twice.
+                if snapshot.next and not paused:
+                    print(f"--- WORKER {self.worker_id}: resuming {thread_id} at {list(snapshot.next)} ---")
+                    await graph_app.ainvoke(None, config=config)
+            else:
+                await graph_app.ainvoke(payload["state"], config=config)
+
+            snapshot = await graph_app.aget_state(config)
+            if snapshot.next and "human_review" in snapshot.next:
+                await research_jobs.update(thread_id, status="paused", next=list(snapshot.next))
+            else:
+                await research_jobs.update(thread_id, status="completed", finished_at=time.time())
+                compact_thread(thread_id)
+        except Exception as e:
+            print(f"Research job {thread_id} failed: {e}")
+            await research_jobs.update(thread_id, status="error", error=str(e), finished_at=time.time())
+
+
+def run_worker(concurrency: int):
+    asyncio.run(ResearchWorker(concurrency).run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY, help="Jobs in flight per process")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.concurrency)
+        return
+
+    # Each process has its own event loop, clients and per-upstream limits
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=run_worker, args=(args.concurrency,)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Batch research: one POST /research/batch against the same topics sent as individual
+POST /research calls (at the same concurrency, the way a script would submit them).
+
+Topic lists are built the way analysts' lists look: --unique distinct topics, each
+repeated as --paraphrases rewordings (case, word order, filler words, punctuation), with
+--cached of the distinct topics already in the semantic cache, shuffled. Embeddings are
+bag-of-words, so rewordings land within CACHE_DISTANCE_THRESHOLD of each other as they
+would with a real model. Each mode gets its own topics so neither warms the other's caches.
+
+Reports wall time, time to the first streamed result, and the upstream calls each mode made
+(LLM, web search, embedding batches). Needs no external services:
+    python -m benchmarks.bench_batch --unique 50 --paraphrases 3 --cached 0.2 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+# Coalescing needs Redis pub/sub, which the in-memory stand-in doesn't provide
+os.environ.setdefault("COALESCE_ENABLED", "false")
+
+import httpx
+import numpy as np
+
+from benchmarks.stubs import FakeEmbeddings, Latency, install_backends, install_stubs
+
+SUBJECTS = ("transformer inference", "vector databases", "retrieval augmented generation", "speculative decoding",
+            "mixture of experts", "quantized training", "diffusion models", "graph neural networks",
+            "federated learning", "reinforcement learning from feedback", "sparse attention", "model distillation")
+ASPECTS = ("energy cost", "latency", "memory footprint", "accuracy", "scaling laws", "hardware support",
+           "benchmark results", "failure modes", "open source tooling", "production adoption")
+SETTINGS = ("edge devices", "data centers", "healthcare", "finance", "mobile apps", "robotics", "education", "search engines")
+TEMPLATES = ("{a} of {s} in {c}", "How does {s} affect {a} in {c}?", "{s}: {a} ({c})", "what is the {a} of {s} for {c}",
+             "{c} {s} {a}")
+STOPWORDS = {"of", "in", "how", "does", "affect", "what", "is", "the", "for", "a", "an", "to", "on"}
+
+
+class TopicEmbeddings(FakeEmbeddings):
+    """Bag of content words: rewordings of the same topic get (nearly) the same vector."""
+    def _vector(self, text: str) -> list[float]:
+        words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+        v = np.zeros(self.dim)
+        for word in words or [text]:
+            v += np.asarray(super()._vector(word))
+        return (v / (np.linalg.norm(v) or 1.0)).astype(np.float32).tolist()
+
+
+def topic_list(rng: random.Random, distinct: list, paraphrases: int) -> list[str]:
+    """Rewordings of each distinct (subject, aspect, setting), shuffled."""
+    topics = []
+    for s, a, c in distinct:
+        for template in rng.sample(TEMPLATES, paraphrases):
+            topic = template.format(s=s, a=a, c=c)
+            topics.append(topic.capitalize() if rng.random() < 0.5 else topic)
+    rng.shuffle(topics)
+    return topics
+
+
+def counters(stubs) -> dict:
+    from app.services.embeddings import embedding_service
+    from app.services.search import search_service
+    return {
+        "llm_calls": stubs.llm.calls,
+        "search_calls": search_service.stats["upstream_calls"],
+        "embedding_calls": embedding_service.stats["upstream_calls"],
+    }
+
+
+async def individual(client, topics: list[str], concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    start, first = time.perf_counter(), []
+
+    async def one(topic):
+        async with slots:
+            r = await client.post("/research", json={"topic": topic})
+            first.append(time.perf_counter() - start)
+            return r.json()["status"]
+
+    statuses = await asyncio.gather(*[one(t) for t in topics])
+    return {"wall_s": time.perf_counter() - start, "first_result_s": min(first), "completed": statuses.count("completed")}
+
+
+async def batch(client, topics: list[str], concurrency: int) -> dict:
+    # httpx's ASGI transport buffers whole responses, so read the NDJSON from the endpoint's
+    # body iterator to see when each line is produced
+    from app.main import batch_research
+    from app.models import BatchResearchRequest
+
+    start, first, lines = time.perf_counter(), None, []
+    response = await batch_research(BatchResearchRequest(topics=topics, concurrency=concurrency))
+    async for chunk in response.body_iterator:
+        lines.append(json.loads(chunk))
+        if first is None and lines[-1]["event"] == "result":
+            first = time.perf_counter() - start
+    results = [line for line in lines if line["event"] == "result"]
+    assert len(results) == len(topics) and sorted(line["index"] for line in results) == list(range(len(topics)))
+    return {
+        "wall_s": time.perf_counter() - start,
+        "first_result_s": first,
+        "completed": sum(line["status"] == "completed" for line in results),
+        "plan": {k: v for k, v in lines[0].items() if k != "event"},
+    }
+
+
+async def run(args) -> dict:
+    install_backends()
+    from langgraph.checkpoint.memory import MemorySaver
+    import app.main
+    from app.agent.graph import memory
+    from app.services.embeddings import embedding_service
+    from app.services.redis_cache import normalize_topic
+
+    memory.override(MemorySaver())
+    stubs = install_stubs(llm_latency=args.llm_latency, search_latency=args.search_latency,
+                          embed_latency=args.embed_latency, seed=args.seed)
+    embedding_service.embeddings = TopicEmbeddings(Latency.parse(args.embed_latency, seed=args.seed))
+
+    rng = random.Random(args.seed)
+    combos = rng.sample([(s, a, c) for s in SUBJECTS for a in ASPECTS for c in SETTINGS], 2 * args.unique)
+    results = {}
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/research", json={"topic": "warm-up run"})
+        for n, (name, mode) in enumerate((("individual", individual), ("batch", batch))):
+            distinct = combos[n * args.unique:(n + 1) * args.unique]
+            topics = topic_list(rng, distinct, args.paraphrases)
+            # The stub cache matches exact topics only; store every rewording like a semantic hit would
+            for s, a, c in distinct[:int(len(distinct) * args.cached)]:
+                for template in TEMPLATES:
+                    stubs.cache.reports[normalize_topic(template.format(s=s, a=a, c=c))] = f"Cached report on {s}"
+            before = counters(stubs)
+            row = await mode(client, topics, args.concurrency)
+            after = counters(stubs)
+            results[name] = {
+                "topics": len(topics),
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()},
+                **{k: after[k] - before[k] for k in after},
+            }
+    return {
+        "config": {"unique": args.unique, "paraphrases": args.paraphrases, "cached": args.cached,
+                   "concurrency": args.concurrency, "llm_latency": args.llm_latency,
+                   "search_latency": args.search_latency, "embed_latency": args.embed_latency, "seed": args.seed},
+        "modes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--unique", type=int, default=50, help="Distinct topics per list")
+    parser.add_argument("--paraphrases", type=int, default=3, help=f"Rewordings of each (at most {len(TEMPLATES)})")
+    parser.add_argument("--cached", type=float, default=0.2, help="Share of distinct topics already in the cache")
+    parser.add_argument("--concurrency", type=int, default=8, help="Runs in flight (BATCH_CONCURRENCY / client side)")
+    parser.add_argument("--llm-latency", default="0.2")
+    parser.add_argument("--search-latency", default="0.1")
+    parser.add_argument("--embed-latency", default="0.02")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'mode':<12}{'topics':>7}{'wall_s':>9}{'first_s':>9}{'done':>6}{'llm':>6}{'search':>8}{'embed':>7}")
+    for name, row in result["modes"].items():
+        print(f"{name:<12}{row['topics']:>7}{row['wall_s']:>9}{row['first_result_s']:>9}{row['completed']:>6}"
+              f"{row['llm_calls']:>6}{row['search_calls']:>8}{row['embedding_calls']:>7}")
+    print(f"batch plan: {result['modes']['batch']['plan']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Semantic cache lookup latency in Redis: FLAT versus HNSW vector index as the cache grows.
+
+Loads random unit vectors into hashes under a bench prefix, indexes them with both a FLAT
+and an HNSW index (the same schema RedisSemanticCache creates), and at each cache size runs
+the cache's KNN 1 query for vectors near stored entries. Reports p50/p95 lookup latency per
+index and HNSW recall@1 against FLAT's exact answer.
+
+Needs Redis Stack (RediSearch); everything it writes is under `bench-cache:` and is
+deleted at the end (--keep to leave it). Memory is about sizes[-1] * dim * 4 bytes per
+index plus the HNSW graph, so 1M entries at 384 dimensions needs a few GB:
+    python -m benchmarks.bench_cache_index --redis-url redis://localhost:6379/0 --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+import numpy as np
+
+PREFIX = "bench-cache:"
+
+
+def index_names(algorithms) -> dict:
+    return {algorithm: f"bench-cache-{algorithm.lower()}" for algorithm in algorithms}
+
+
+def create_indexes(redis, args):
+    from redis.commands.search.field import VectorField
+    from app.services.redis_cache import _index_definition
+    IndexDefinition, IndexType = _index_definition()
+
+    for algorithm, name in index_names(args.algorithms).items():
+        attributes = {"TYPE": "FLOAT32", "DIM": args.dim, "DISTANCE_METRIC": "COSINE"}
+        if algorithm == "HNSW":
+            attributes.update(M=args.m, EF_CONSTRUCTION=args.ef_construction, EF_RUNTIME=args.ef_runtime)
+        redis.ft(name).create_index(
+            (VectorField("vector", algorithm, attributes),),
+            definition=IndexDefinition(prefix=[PREFIX], index_type=IndexType.HASH),
+        )
+
+
+def load(redis, rng, start: int, stop: int, dim: int, keep: int, batch: int = 1000) -> np.ndarray:
+    """Store entries [start, stop) and return `keep` of their vectors to build near-duplicate queries from."""
+    vectors = rng.standard_normal((stop - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for offset in range(0, len(vectors), batch):
+        pipe = redis.pipeline(transaction=False)
+        for i, vector in enumerate(vectors[offset:offset + batch], start=start + offset):
+            pipe.hset(f"{PREFIX}{i}", mapping={"vector": vector.tobytes()})
+        pipe.execute()
+    return vectors[rng.choice(len(vectors), min(keep, len(vectors)), replace=False)]
+
+
+def wait_indexed(redis, names, timeout: float = 3600):
+    deadline = time.time() + timeout
+    for name in names:
+        while time.time() < deadline:
+            info = redis.ft(name).info()
+            if str(info.get("indexing", 0)) in ("0", "0.0") and float(info.get("percent_indexed", 1)) >= 1:
+                break
+            time.sleep(0.5)
+
+
+def lookup(redis, name: str, algorithm: str, vector: np.ndarray, ef_runtime: int):
+    """The same KNN 1 query RedisSemanticCache._search sends."""
+    from redis.commands.search.query import Query
+    params = {"vec": vector.tobytes()}
+    if algorithm == "HNSW":
+        q = Query("*=>[KNN 1 @vector $vec EF_RUNTIME $ef AS score]")
+        params["ef"] = ef_runtime
+    else:
+        q = Query("*=>[KNN 1 @vector $vec AS score]")
+    start = time.perf_counter()
+    result = redis.ft(name).search(q.return_fields("score").dialect(2), query_params=params)
+    return time.perf_counter() - start, result.docs[0].id if result.docs else None
+
+
+def measure(redis, args, stored: list, rng) -> dict:
+    names = index_names(args.algorithms)
+    vectors = np.concatenate(stored)
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = vectors[picks] + args.noise * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    row, answers = {}, {}
+    for algorithm, name in names.items():
+        for query in queries[:10]: # warm-up
+            lookup(redis, name, algorithm, query, args.ef_runtime)
+        samples, answers[algorithm] = [], []
+        for query in queries:
+            seconds, doc_id = lookup(redis, name, algorithm, query, args.ef_runtime)
+            samples.append(seconds)
+            answers[algorithm].append(doc_id)
+        q = statistics.quantiles(samples, n=100, method="inclusive")
+        row[algorithm] = {"p50_ms": round(q[49] * 1000, 3), "p95_ms": round(q[94] * 1000, 3)}
+    if "FLAT" in answers and "HNSW" in answers:
+        row["HNSW"]["recall_at_1"] = round(
+            sum(a == b for a, b in zip(answers["FLAT"], answers["HNSW"])) / args.queries, 4)
+    return row
+
+
+def cleanup(redis, args):
+    for name in index_names(args.algorithms).values():
+        try:
+            redis.ft(name).dropindex(delete_documents=False)
+        except Exception:
+            pass
+    keys = []
+    for key in redis.scan_iter(match=f"{PREFIX}*", count=10000):
+        keys.append(key)
+        if len(keys) >= 10000:
+            redis.delete(*keys)
+            keys = []
+    if keys:
+        redis.delete(*keys)
+
+
+def run(args) -> dict:
+    from redis import Redis
+
+    redis = Redis.from_url(args.redis_url, decode_responses=True)
+    rng = np.random.default_rng(args.seed)
+    cleanup(redis, args)
+    create_indexes(redis, args)
+
+    rows, stored, loaded = [], [], 0
+    try:
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            stored.append(load(redis, rng, loaded, size, args.dim, keep=args.queries))
+            wait_indexed(redis, index_names(args.algorithms).values())
+            build_s = time.perf_counter() - start
+            loaded = size
+            rows.append({"entries": size, "load_and_index_s": round(build_s, 1), **measure(redis, args, stored, rng)})
+            print(f"--- {size} entries: {rows[-1]} ---")
+    finally:
+        if not args.keep:
+            cleanup(redis, args)
+    return {
+        "config": {"dim": args.dim, "m": args.m, "ef_construction": args.ef_construction,
+                   "ef_runtime": args.ef_runtime, "queries": args.queries, "noise": args.noise},
+        "sizes": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--algorithms", nargs="+", choices=["FLAT", "HNSW"], default=["FLAT", "HNSW"])
+    parser.add_argument("--dim", type=int, default=384, help="Vector size (the cache uses the embedding model's)")
+    parser.add_argument("--m", type=int, default=16, help="CACHE_HNSW_M")
+    parser.add_argument("--ef-construction", type=int, default=200, help="CACHE_HNSW_EF_CONSTRUCTION")
+    parser.add_argument("--ef-runtime", type=int, default=64, help="CACHE_HNSW_EF_RUNTIME")
+    parser.add_argument("--queries", type=int, default=200, help="Lookups per index and size")
+    parser.add_argument("--noise", type=float, default=0.05, help="Perturbation of the stored vector each query starts from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Leave the bench keys and indexes in Redis")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'entries':>10}{'flat_p50':>10}{'flat_p95':>10}{'hnsw_p50':>10}{'hnsw_p95':>10}{'recall@1':>10}")
+    for row in result["sizes"]:
+        flat, hnsw = row.get("FLAT", {}), row.get("HNSW", {})
+        print(f"{row['entries']:>10}{flat.get('p50_ms', '-'):>10}{flat.get('p95_ms', '-'):>10}"
+              f"{hnsw.get('p50_ms', '-'):>10}{hnsw.get('p95_ms', '-'):>10}{hnsw.get('recall_at_1', '-'):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Checkpoint storage per research thread: what the Redis checkpointer stores before and
+after bounded storage (app/agent/checkpoints.py).
+
+Runs research threads through graph_app with stub LLM/search (search pages of --page-words
+words, so the state is as large as a real run's) on an in-memory saver, then serializes
+every checkpoint and pending write exactly as the Redis saver would store them (RedisJSON
+documents, base64 write blobs) and reports bytes per thread for:
+  baseline    plain AsyncRedisSaver, every superstep checkpoint kept
+  compressed  CompactRedisSaver, every checkpoint kept (e.g. a paused HITL thread)
+  compacted   CompactRedisSaver after compaction: the latest checkpoint only
+Also checks that compressed documents and writes read back to the same state.
+Needs no external services:
+    python -m benchmarks.bench_checkpoints --threads 10 --page-words 600 --revise
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+import orjson
+
+from benchmarks.stubs import CRITIQUE_REVISE, install_backends, install_stubs
+
+VOCABULARY = (
+    "model training data latency throughput memory cache index query vector search result report "
+    "benchmark cost accuracy recall precision token context window inference batch server cluster "
+    "study paper method approach evaluation dataset baseline improvement percent million billion "
+    "the a of to in and for with on by from that this which these is are was were has have can may"
+).split()
+
+
+class PageSearch:
+    """Search stand-in whose pages are `words` words drawn from a fixed vocabulary, so they compress like prose."""
+    def __init__(self, words: int, seed: int):
+        self.words = words
+        self.rng = random.Random(seed)
+
+    async def search(self, query: str, max_results: int = 3, **kwargs):
+        def page() -> str:
+            words = [self.rng.choice(VOCABULARY) for _ in range(self.words)]
+            words += [str(self.rng.randint(1, 9999)) for _ in range(self.words // 20)]
+            self.rng.shuffle(words)
+            return " ".join(words)
+        slug = uuid.uuid4().hex[:8]
+        return {
+            "results": [{"content": page(), "url": f"https://example.com/{slug}/{i}"} for i in range(max_results)],
+            "images": [],
+        }
+
+
+def stored_bytes(saver, tuples) -> tuple[int, int]:
+    """Bytes of the checkpoint documents and write documents the Redis saver would store."""
+    documents = writes = 0
+    for t in tuples:
+        document = {"checkpoint": saver._dump_checkpoint(t.checkpoint), "metadata": saver._dump_metadata(t.metadata)}
+        documents += len(orjson.dumps(document))
+        for task_id, channel, value in t.pending_writes or []:
+            type_, blob = saver.serde.dumps_typed(value)
+            writes += len(orjson.dumps({"task_id": task_id, "channel": channel, "type": type_, "blob": saver._encode_blob(blob)}))
+    return documents, writes
+
+
+def round_trips(saver, plain, tuples) -> bool:
+    """Compressed channel values and writes read back to what the plain saver reads back."""
+    for t in tuples:
+        values = saver._recursive_deserialize(saver._dump_checkpoint(t.checkpoint)["channel_values"])
+        expected = plain._recursive_deserialize(plain._dump_checkpoint(t.checkpoint)["channel_values"])
+        if values != expected:
+            return False
+        for _, _, value in t.pending_writes or []:
+            if saver.serde.loads_typed(saver.serde.dumps_typed(value)) != value:
+                return False
+    return True
+
+
+async def run(args) -> dict:
+    install_backends()
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.checkpoint.redis import AsyncRedisSaver
+    from app.agent.checkpoints import CompactRedisSaver
+    from app.agent.graph import memory, graph_app
+    from app.services.clients import clients
+    from app.services.search import SearchService, search_service
+
+    saver = MemorySaver()
+    memory.override(saver)
+    stubs = install_stubs(llm_latency=0, search_latency=0, embed_latency=0, vector_latency=0, seed=args.seed)
+    stubs.llm.report_sections = args.sections
+    stubs.llm.section_words = args.section_words
+    if args.revise:
+        stubs.llm.critique_reply = CRITIQUE_REVISE
+    search_service.override(SearchService(backend=PageSearch(args.page_words, args.seed)))
+
+    redis = clients.async_redis(decode_responses=False) # never connected: only the serialization is used
+    plain = AsyncRedisSaver(redis_client=redis)
+    compact = CompactRedisSaver(redis_client=redis, compress_min_bytes=args.min_bytes)
+
+    rows = {"baseline": [], "compressed": [], "compacted": []}
+    counts, dump_seconds, ok = [], {"baseline": 0.0, "compressed": 0.0}, True
+    for _ in range(args.threads):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        await graph_app.ainvoke({"topic": f"bench topic {uuid.uuid4()}", "enable_hitl": False}, config=config)
+        tuples = [t async for t in saver.alist(config)] # newest first
+        counts.append(len(tuples))
+
+        start = time.perf_counter()
+        rows["baseline"].append(sum(stored_bytes(plain, tuples)))
+        dump_seconds["baseline"] += time.perf_counter() - start
+        start = time.perf_counter()
+        rows["compressed"].append(sum(stored_bytes(compact, tuples)))
+        dump_seconds["compressed"] += time.perf_counter() - start
+        rows["compacted"].append(sum(stored_bytes(compact, tuples[:1])))
+        ok = ok and round_trips(compact, plain, tuples)
+
+    baseline = statistics.mean(rows["baseline"])
+    return {
+        "threads": args.threads,
+        "checkpoints_per_thread": statistics.mean(counts),
+        "round_trip_ok": ok,
+        "bytes_per_thread": {name: round(statistics.mean(sizes)) for name, sizes in rows.items()},
+        "reduction": {name: round(baseline / statistics.mean(sizes), 1) for name, sizes in rows.items()},
+        "serialize_ms_per_thread": {name: round(s / args.threads * 1000, 2) for name, s in dump_seconds.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--page-words", type=int, default=600, help="Words per search result page")
+    parser.add_argument("--sections", type=int, default=6, help="'##' sections in the written report")
+    parser.add_argument("--section-words", type=int, default=200)
+    parser.add_argument("--revise", action="store_true", help="Critique asks for one revision (delta search + rewrite)")
+    parser.add_argument("--min-bytes", type=int, default=2048, help="CHECKPOINT_COMPRESS_MIN_BYTES")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"threads={result['threads']} checkpoints/thread={result['checkpoints_per_thread']:.1f} "
+          f"round trip ok={result['round_trip_ok']}")
+    print(f"{'storage':<12}{'bytes/thread':>14}{'reduction':>11}")
+    for name, size in result["bytes_per_thread"].items():
+        print(f"{name:<12}{size:>14}{result['reduction'][name]:>10}x")
+    print(f"serialize ms/thread: {result['serialize_ms_per_thread']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Connection reuse benchmark: the cost of building a client (and opening a connection)
+per call versus reusing the shared pools from app/services/clients.py.
+
+Needs no external services:
+  - http:   a local keep-alive HTTP server with a small fixed service time stands in for
+            Ollama/Tavily; compares a new httpx.AsyncClient per request with the shared
+            registry client, at several concurrency levels
+  - qdrant: building the LangChain Qdrant wrapper (and a client) per call versus the
+            cached one, on an in-memory Qdrant
+
+    python -m benchmarks.bench_clients --requests 400 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+import httpx
+
+from app.services.clients import ClientRegistry
+
+BODY = json.dumps({"embedding": [0.1] * 768}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, like Ollama
+    disable_nagle_algorithm = True
+    service_time = 0.002
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.service_time)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    request_queue_size = 256 # per-call clients open a burst of connections
+
+
+def start_server() -> tuple[ThreadingHTTPServer, str]:
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    q = statistics.quantiles(ordered, n=100) if len(ordered) > 1 else ordered * 99
+    return {
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+    }
+
+
+async def run_http(base_url: str, mode: str, total: int, concurrency: int) -> dict:
+    registry = ClientRegistry()
+    shared = registry.http("bench", base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "per_call":
+                async with httpx.AsyncClient(base_url=base_url) as client:
+                    r = await client.post("/api/embed", json={"input": "x"})
+            else:
+                r = await shared.post("/api/embed", json={"input": "x"})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    wall = time.perf_counter() - start
+    stats = registry.get_stats()["http"].get("bench", {}).get("async", {})
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        **percentiles(latencies),
+        "throughput_rps": round(total / wall, 1),
+        "connections_opened": stats.get("connections") if mode == "shared" else total,
+    }
+
+
+def run_qdrant(calls: int) -> dict:
+    from qdrant_client import QdrantClient
+    from langchain_community.vectorstores import Qdrant
+    warnings.filterwarnings("ignore") # LangChain deprecation notices, once per construction
+
+    class Embeddings:
+        def embed_query(self, text):
+            return [0.0] * 8
+
+    client = QdrantClient(location=":memory:")
+    cached = Qdrant(client=client, collection_name="bench", embeddings=Embeddings())
+    results = {}
+    for mode in ("per_call", "cached"):
+        samples = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            if mode == "per_call":
+                # What get_vector_store() used to do, plus the client VectorDBService built per use
+                Qdrant(client=QdrantClient(location=":memory:"), collection_name="bench", embeddings=Embeddings())
+            else:
+                _ = cached
+            samples.append(time.perf_counter() - start)
+        results[mode] = {"mean_us": round(statistics.mean(samples) * 1e6, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--service-ms", type=float, default=2.0, help="Simulated upstream service time")
+    parser.add_argument("--qdrant-calls", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    Handler.service_time = args.service_ms / 1000
+    server, base_url = start_server()
+    try:
+        http = [
+            asyncio.run(run_http(base_url, mode, args.requests, c))
+            for c in args.concurrency
+            for mode in ("per_call", "shared")
+        ]
+    finally:
+        server.shutdown()
+    result = {"http": http, "qdrant_vector_store": run_qdrant(args.qdrant_calls)}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'mode':<10}{'conc':>6}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'rps':>10}{'conns':>8}")
+    for row in http:
+        print(f"{row['mode']:<10}{row['concurrency']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['throughput_rps']:>10}{row['connections_opened']:>8}")
+    q = result["qdrant_vector_store"]
+    print(f"Qdrant vector store: per call {q['per_call']['mean_us']}us, cached {q['cached']['mean_us']}us")
+
+
+if __name__ == "__main__":
+    main()
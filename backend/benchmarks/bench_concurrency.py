@@ -0,0 +1,108 @@
+"""
+Load benchmark: concurrent /research requests served by a single worker.
+
+Runs the real FastAPI app and LangGraph pipeline in-process with stubbed LLM,
+search, embedding, cache and vector DB backends, and compares:
+  - blocking: upstream calls block the event loop (the old sync `invoke` path)
+  - async:    upstream calls are awaited (`ainvoke` + async clients)
+
+Services are built lazily and every one the requests touch is stubbed, so no external
+services are needed:
+    python -m benchmarks.bench_concurrency --concurrency 1 4 16 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+# Topics are unique, so coalescing has nothing to share; off so it doesn't need Redis
+os.environ.setdefault("COALESCE_ENABLED", "false")
+
+import httpx
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.stubs import install_stubs
+
+
+async def run_level(app, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one():
+            start = time.perf_counter()
+            r = await client.post("/research", json={"topic": f"bench topic {uuid.uuid4()}"})
+            assert r.json()["status"] == "completed", r.text
+            return time.perf_counter() - start
+
+        async def probe_health():
+            # Scheduled while the research jobs are in flight; timed from when it
+            # should have fired, so a blocked event loop shows up as latency
+            fire_at = time.perf_counter() + 0.05
+            await asyncio.sleep(0.05)
+            await client.get("/health")
+            return time.perf_counter() - fire_at
+
+        start = time.perf_counter()
+        health, *latencies = await asyncio.gather(probe_health(), *[one() for _ in range(concurrency)])
+        wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(concurrency / wall, 3),
+        "mean_latency_s": round(sum(latencies) / len(latencies), 3),
+        "health_latency_s": round(health, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    import app.main as api
+    from app.agent.graph import create_graph, memory
+
+    # In-memory checkpoints keep the measurement about the request path, not Redis
+    # (the provider too: compaction after each run uses it, and is a no-op for MemorySaver)
+    saver = MemorySaver()
+    memory.override(saver)
+
+    results = []
+    for mode in ["blocking", "async"]:
+        install_stubs(
+            llm_latency=args.llm_latency,
+            search_latency=args.search_latency,
+            embed_latency=args.embed_latency,
+            blocking=(mode == "blocking"),
+        )
+        # Compiled after the stubs are in: LangGraph reads the nodes' globals when compiling,
+        # which would otherwise build the real semantic cache through its provider
+        api.graph_app = create_graph(checkpointer=saver)
+        single = asyncio.run(run_level(api.app, 1))["mean_latency_s"]
+        for level in args.concurrency:
+            row = {"mode": mode, **asyncio.run(run_level(api.app, level))}
+            # Requests the worker completes per single-request latency, i.e. how many
+            # research jobs it effectively serves at once
+            row["requests_per_worker"] = round(row["throughput_rps"] * single, 2)
+            results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<10}{'conc':>6}{'wall_s':>10}{'req/s':>10}{'mean_s':>10}{'per_worker':>12}{'health_s':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['concurrency']:>6}{r['wall_s']:>10}{r['throughput_rps']:>10}"
+              f"{r['mean_latency_s']:>10}{r['requests_per_worker']:>12}{r['health_latency_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-node timing breakdown of one research run with stubbed backends.
+
+Compares `serial_s` (sum of node wall times, what a strictly sequential
+search -> vision -> rag chain would take) with `critical_path_s` (actual wall time
+with search/vision running alongside RAG). With --images N the vision node
+time stays near one LLM call because images are described concurrently.
+
+Redis and Qdrant are in-memory stand-ins, so no external services are needed:
+    python -m benchmarks.bench_graph_timing --images 2 --vector-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from benchmarks.stubs import install_backends, install_stubs
+
+
+async def run_once(graph_app) -> list[dict]:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    result = await graph_app.ainvoke({"topic": f"bench topic {uuid.uuid4()}", "enable_hitl": False}, config=config)
+    return result.get("node_timings", [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--vector-latency", type=float, default=0.3)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Before importing the app: services take their clients from the registry when built
+    install_backends()
+    from app.agent.graph import create_graph
+    from app.agent.timing import timing_breakdown
+
+    install_stubs(
+        llm_latency=args.llm_latency,
+        search_latency=args.search_latency,
+        embed_latency=args.embed_latency,
+        vector_latency=args.vector_latency,
+        n_images=args.images,
+    )
+    breakdown = timing_breakdown(asyncio.run(run_once(create_graph(checkpointer=MemorySaver()))))
+
+    if args.json:
+        print(json.dumps(breakdown, indent=2))
+        return
+
+    for node, seconds in breakdown["nodes"].items():
+        print(f"{node:<16}{seconds:>8.3f}s")
+    print(f"{'serial':<16}{breakdown['serial_s']:>8.3f}s")
+    print(f"{'critical path':<16}{breakdown['critical_path_s']:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
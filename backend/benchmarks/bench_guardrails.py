@@ -0,0 +1,118 @@
+"""
+Guardrail throughput: the LLM judge on every whole report ("llm" mode) versus local
+pre-filters with the judge only on flagged chunks ("tiered" mode, agent/prefilter.py).
+
+Runs guardrail_node over synthetic multi-section reports, a share of which carry PII or
+harmful phrasing in one section. The stub judge costs a fixed latency plus a per-prompt-
+token cost, so judging a chunk is cheaper than judging the report. Reports per second,
+judge calls and judge prompt tokens per mode, plus the pre-filter's own cost per report:
+    python -m benchmarks.bench_guardrails --reports 200 --concurrency 16 --flagged-share 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from benchmarks.stubs import install_backends, install_stubs, synthetic_report
+
+PROBLEMS = [
+    "For follow-up, contact the lead author at jane.roe@example.org or (555) 201-7788.",
+    "The leaked records include SSN 219-09-9999 and card 4111 1111 1111 1111.",
+    "Studies show the method is scientifically proven and 100% guaranteed to work.",
+]
+
+
+def make_reports(n: int, sections: int, section_words: int, flagged_share: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(n):
+        # Unique per report, so neither mode is helped by the LLM response cache
+        report = synthetic_report(f"Report {uuid.uuid4()}", sections, section_words)
+        if rng.random() < flagged_share:
+            target = f"## Section {rng.randint(1, sections)}\n\n"
+            report = report.replace(target, target + rng.choice(PROBLEMS) + " ", 1)
+        reports.append(report)
+    return reports
+
+
+async def run_mode(safety, llm, reports: list[str], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    calls, input_tokens = llm.calls, llm.input_tokens
+    unsafe = 0
+
+    async def one(report: str):
+        nonlocal unsafe
+        async with semaphore:
+            result = await safety.guardrail_node({"final_report": report})
+            unsafe += result["guardrail_verdict"] != "SAFE"
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(r) for r in reports])
+    wall = time.perf_counter() - start
+    return {
+        "reports_per_s": round(len(reports) / wall, 1),
+        "wall_s": round(wall, 3),
+        "judge_calls": llm.calls - calls,
+        "judge_input_tokens": llm.input_tokens - input_tokens,
+        "unsafe": unsafe,
+    }
+
+
+async def run(args) -> dict:
+    install_backends()
+    from app.agent import safety
+    from app.agent.prefilter import prefilter
+    from app.core.config import settings
+
+    stubs = install_stubs(llm_latency=args.llm_latency, search_latency=0, embed_latency=0, vector_latency=0)
+    stubs.llm.input_token_latency = args.input_token_ms / 1000
+    reports = make_reports(args.reports, args.sections, args.section_words, args.flagged_share, args.seed)
+
+    start = time.perf_counter()
+    flagged = sum(any(c.flagged for c in prefilter.scan(r)) for r in reports)
+    prefilter_us = (time.perf_counter() - start) / len(reports) * 1e6
+
+    results = {"prefilter": {"us_per_report": round(prefilter_us, 1), "reports_flagged": flagged}}
+    for mode in ("llm", "tiered"):
+        settings.GUARDRAIL_MODE = mode
+        # Fresh reports per mode: the response cache would otherwise answer the second run
+        batch = make_reports(args.reports, args.sections, args.section_words, args.flagged_share, args.seed)
+        results[mode] = await run_mode(safety, stubs.llm, batch, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--section-words", type=int, default=200)
+    parser.add_argument("--flagged-share", type=float, default=0.1, help="Share of reports with a problem planted")
+    parser.add_argument("--llm-latency", default="0.3", help="Judge call latency (seconds or distribution)")
+    parser.add_argument("--input-token-ms", type=float, default=0.2, help="Judge cost per prompt token")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    p = result["prefilter"]
+    print(f"pre-filter: {p['us_per_report']}us/report, {p['reports_flagged']}/{args.reports} reports flagged")
+    print(f"{'mode':<8}{'reports/s':>11}{'wall_s':>9}{'judge_calls':>13}{'judge_tokens':>14}{'unsafe':>8}")
+    for mode in ("llm", "tiered"):
+        r = result[mode]
+        print(f"{mode:<8}{r['reports_per_s']:>11}{r['wall_s']:>9}{r['judge_calls']:>13}"
+              f"{r['judge_input_tokens']:>14}{r['unsafe']:>8}")
+
+
+if __name__ == "__main__":
+    main()
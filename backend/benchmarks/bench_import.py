@@ -0,0 +1,97 @@
+"""
+Import-time benchmark for the API: how long `import app.main` takes and whether it
+touches the network. Services are created lazily (app/services/providers.py), so the
+import should open no connections and succeed with Redis/Qdrant/Ollama down.
+
+Each run is a fresh interpreter. Dependencies point at an unroutable address so any
+connection attempt during import shows up (and would fail) instead of silently succeeding:
+    python -m benchmarks.bench_import --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, socket, time
+attempts = []
+_connect = socket.socket.connect
+def connect(self, address):
+    attempts.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = connect
+
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_s": elapsed, "connections": attempts}))
+"""
+
+
+def run_once(env: dict, importtime: bool) -> dict:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD]
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(f"import app.main failed:\n{out.stderr[-2000:]}")
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    if importtime:
+        result["modules"] = top_modules(out.stderr)
+    return result
+
+
+def top_modules(stderr: str, n: int = 10) -> list[dict]:
+    """Modules ranked by cumulative import time (includes their own imports)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if cumulative.isdigit():
+            rows.append({"module": name, "cumulative_ms": round(int(cumulative) / 1000, 1)})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "bench"),
+        "TAVILY_API_KEY": os.environ.get("TAVILY_API_KEY", "bench"),
+        # TEST-NET-1: never routable, so nothing here can answer
+        "REDIS_URL": "redis://192.0.2.1:6379/0",
+        "QDRANT_URL": "http://192.0.2.1:6333",
+        "OLLAMA_BASE_URL": "http://192.0.2.1:11434",
+    }
+    runs = [run_once(env, importtime=False) for _ in range(args.runs)]
+    profile = run_once(env, importtime=True)
+    times = sorted(r["import_s"] for r in runs)
+    result = {
+        "runs": args.runs,
+        "import_s_median": round(statistics.median(times), 3),
+        "import_s_min": round(times[0], 3),
+        "import_s_max": round(times[-1], 3),
+        "connections_during_import": profile["connections"],
+        "slowest_imports": profile["modules"],
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"import app.main over {args.runs} runs: median {result['import_s_median']}s "
+          f"(min {result['import_s_min']}s, max {result['import_s_max']}s)")
+    print(f"connections attempted during import: {len(result['connections_during_import'])}")
+    print(f"{'module':<45}{'cumulative_ms':>15}")
+    for row in result["slowest_imports"]:
+        print(f"{row['module']:<45}{row['cumulative_ms']:>15}")
+
+
+if __name__ == "__main__":
+    main()
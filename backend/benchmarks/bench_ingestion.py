@@ -0,0 +1,121 @@
+"""
+PDF ingestion benchmark: pages/sec and peak RSS for a synthetic PDF.
+
+Each mode runs in its own subprocess so peak RSS is measured independently:
+  - legacy:    PyPDFLoader.load_and_split() + one vector_db.add_documents call
+  - streaming: the IngestionPipeline behind /upload (lazy pages, batched workers)
+
+The modules both modes load are imported before the baseline, so rss_growth_mb is what
+the ingestion itself held. Neither mode frees its chunks: legacy keeps the split list, and
+the pipeline adds every chunk to the in-process BM25 index (services/retrieval.py), which
+dominates its peak. Streaming bounds the in-flight parse/embed working set, not the total.
+
+Embeddings and Qdrant upserts are stubbed with fixed latencies, and Redis and Qdrant are
+in-memory stand-ins, so no external services are needed:
+    python -m benchmarks.bench_ingestion --pages 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_mode(mode: str, pdf: str, embed_latency: float, per_text: float, upsert_latency: float) -> dict:
+    from benchmarks.stubs import FakeEmbeddings, Latency, install_backends
+    # Before the services are built: vector_db takes the fake Qdrant client from the registry
+    install_backends(upsert_latency=upsert_latency)
+    from app.services.embeddings import embedding_service
+    from app.services.vector_db import vector_db
+
+    embedding_service.embeddings = FakeEmbeddings(Latency(embed_latency), per_text=per_text)
+    # Both modes load these; importing them first keeps ~35 MB of modules out of the growth
+    import pypdf
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from app.models import IngestionJob
+    from app.services.ingestion import ingestion_pipeline
+
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        documents = PyPDFLoader(pdf).load_and_split()
+        vector_db.add_documents(documents)
+        pages = len({d.metadata.get("page") for d in documents})
+        chunks = len(documents)
+    else:
+        # Unique document name so a manifest from an earlier run doesn't skip the work
+        job = IngestionJob(job_id="bench", filename=f"synthetic-{uuid.uuid4()}.pdf")
+        job = asyncio.run(ingestion_pipeline.run(job, pdf))
+        assert job.status == "completed", job.error
+        pages, chunks = job.pages, job.chunks
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "pages": pages,
+        "chunks": chunks,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": round(peak_rss_mb() - baseline_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per embedding call")
+    parser.add_argument("--per-text-latency", type=float, default=0.004, help="Extra embedding seconds per chunk")
+    parser.add_argument("--upsert-latency", type=float, default=0.05, help="Seconds per Qdrant upsert")
+    parser.add_argument("--mode", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: run one mode and report
+        print(json.dumps(run_mode(args.mode, args.pdf, args.embed_latency, args.per_text_latency, args.upsert_latency)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "synthetic.pdf")
+        write_synthetic_pdf(pdf, args.pages)
+        results = []
+        for mode in ["legacy", "streaming"]:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ingestion", "--mode", mode, "--pdf", pdf,
+                 "--embed-latency", str(args.embed_latency),
+                 "--per-text-latency", str(args.per_text_latency), "--upsert-latency", str(args.upsert_latency)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<11}{'pages':>7}{'chunks':>8}{'elapsed_s':>11}{'pages/s':>10}{'peak_rss_mb':>13}{'rss_growth_mb':>15}")
+    for r in results:
+        print(f"{r['mode']:<11}{r['pages']:>7}{r['chunks']:>8}{r['elapsed_s']:>11}{r['pages_per_sec']:>10}"
+              f"{r['peak_rss_mb']:>13}{r['rss_growth_mb']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Compact vector storage: memory per million vectors and recall for each VECTOR_QUANTIZATION
+mode, with and without rescoring on the original vectors.
+
+The quantizers are reproduced in NumPy and searched exhaustively, so the recall numbers
+isolate the quantization error from any index (HNSW) approximation:
+  float32  what Qdrant and the Redis cache store today
+  int8     Qdrant scalar quantization (one range for the collection, 0.99 quantile)
+           and the Redis cache's per-vector int8 codes (redis_cache.quantize_int8)
+  binary   Qdrant binary quantization (one sign bit per dimension)
+Rescoring fetches VECTOR_OVERSAMPLING x k candidates on the quantized vectors and re-ranks
+them on the originals, as Qdrant's `rescore` and the cache's float16 copy do.
+
+Vectors are synthetic: clustered, with a shared offset and uneven per-dimension spread
+like real embedding models, and queries are perturbed members of the same clusters.
+Needs no external services:
+    python -m benchmarks.bench_quantization --vectors 50000 --dim 1024 --oversampling 2
+"""
+import argparse
+import json
+import math
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+import numpy as np
+
+from app.services.redis_cache import quantize_int8
+
+MB = 1024 * 1024
+
+
+def unit(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def corpus(rng, n: int, dim: int, clusters: int, queries: int):
+    centers = rng.standard_normal((clusters, dim))
+    spread = rng.uniform(0.3, 1.7, dim) # uneven per-dimension variance
+    offset = 0.3 * rng.standard_normal(dim) # embeddings share a common direction
+    def sample(count):
+        members = centers[rng.integers(0, clusters, count)] + 0.8 * rng.standard_normal((count, dim))
+        return unit((members * spread + offset).astype(np.float32))
+    return sample(n), sample(queries)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def scalar_int8(vectors: np.ndarray, queries: np.ndarray):
+    """Qdrant-style: one affine range for the whole collection, clipped at the 0.99 quantile."""
+    lo, hi = np.quantile(vectors, [0.005, 0.995])
+    step = (hi - lo) / 255
+    codes = np.clip(np.round((vectors - lo) / step), 0, 255).astype(np.uint8)
+    return (codes.astype(np.float32) * step + lo) @ queries.T
+
+
+def per_vector_int8(vectors: np.ndarray, queries: np.ndarray):
+    """The Redis cache's format: each vector scaled to the full int8 range on its own."""
+    codes = np.stack([quantize_int8(v) for v in vectors]).astype(np.float32)
+    return unit(codes) @ queries.T
+
+
+def binary(vectors: np.ndarray, queries: np.ndarray):
+    """One bit per dimension; the dot product of +-1 vectors ranks like Hamming distance."""
+    return np.where(vectors > 0, 1.0, -1.0).astype(np.float32) @ np.where(queries > 0, 1.0, -1.0).astype(np.float32).T
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def evaluate(vectors, queries, approx_scores, k: int, oversampling: float) -> dict:
+    exact = queries @ vectors.T
+    truth = top_k(exact, k)
+    scores = approx_scores.T
+    plain = top_k(scores, k)
+    candidates = top_k(scores, max(k, math.ceil(k * oversampling)))
+    # Rescore: exact similarity on the originals, over the quantized candidates only
+    rescored = np.take_along_axis(candidates, np.argsort(-np.take_along_axis(exact, candidates, axis=1), axis=1), axis=1)[:, :k]
+    return {
+        f"recall@{k}": round(recall(plain, truth), 4),
+        f"recall@{k}_rescored": round(recall(rescored, truth), 4),
+        "recall@1": round(float(np.mean(plain[:, 0] == truth[:, 0])), 4),
+        "recall@1_rescored": round(float(np.mean(rescored[:, 0] == truth[:, 0])), 4),
+    }
+
+
+def memory(dim: int) -> dict:
+    """Vector bytes per million entries (index graph and payload excluded)."""
+    float32, int8, bits = dim * 4, dim, math.ceil(dim / 8)
+    return {
+        # Qdrant: quantized vectors in RAM (always_ram), originals on disk for rescoring
+        "qdrant": {
+            "float32": {"ram_mb": float32 * 1e6 / MB, "disk_mb": 0},
+            "int8": {"ram_mb": int8 * 1e6 / MB, "disk_mb": float32 * 1e6 / MB},
+            "binary": {"ram_mb": bits * 1e6 / MB, "disk_mb": float32 * 1e6 / MB},
+        },
+        # Redis: the vector lives in the hash and again in the index; the float16 copy is for rescoring
+        "redis_cache": {
+            "float32": {"ram_mb": 2 * float32 * 1e6 / MB},
+            "int8": {"ram_mb": 2 * int8 * 1e6 / MB},
+            "int8_rescore": {"ram_mb": (2 * int8 + 2 * dim) * 1e6 / MB},
+        },
+    }
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    vectors, queries = corpus(rng, args.vectors, args.dim, args.clusters, args.queries)
+    modes = {
+        "float32": lambda: vectors @ queries.T,
+        "int8_qdrant": lambda: scalar_int8(vectors, queries),
+        "int8_redis": lambda: per_vector_int8(vectors, queries),
+        "binary": lambda: binary(vectors, queries),
+    }
+    return {
+        "config": {"vectors": args.vectors, "dim": args.dim, "queries": args.queries, "k": args.k,
+                   "oversampling": args.oversampling, "clusters": args.clusters, "seed": args.seed},
+        "recall": {name: evaluate(vectors, queries, scores(), args.k, args.oversampling) for name, scores in modes.items()},
+        "memory_per_million": {
+            store: {mode: {key: round(value) for key, value in sizes.items()} for mode, sizes in by_mode.items()}
+            for store, by_mode in memory(args.dim).items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10, help="RAG_CANDIDATES-style result count")
+    parser.add_argument("--oversampling", type=float, default=2.0, help="VECTOR_OVERSAMPLING")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    k = args.k
+    print(f"{args.vectors} vectors, {args.dim}-d, oversampling {args.oversampling}")
+    print(f"{'mode':<13}{f'recall@{k}':>11}{'rescored':>10}{'recall@1':>10}{'rescored':>10}")
+    for name, r in result["recall"].items():
+        print(f"{name:<13}{r[f'recall@{k}']:>11}{r[f'recall@{k}_rescored']:>10}{r['recall@1']:>10}{r['recall@1_rescored']:>10}")
+    print("memory per million vectors (MB):")
+    for store, by_mode in result["memory_per_million"].items():
+        print(f"  {store}: " + ", ".join(f"{mode} {sizes}" for mode, sizes in by_mode.items()))
+
+
+if __name__ == "__main__":
+    main()
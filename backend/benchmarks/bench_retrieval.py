@@ -0,0 +1,184 @@
+"""
+Offline RAG retrieval benchmark: recall@k and per-query latency for
+dense-only, BM25-only, hybrid (RRF) and hybrid + rerank.
+
+The corpus is synthetic and fully labelled: every query targets one chunk.
+  - keyword queries:    a few of the chunk's terms plus its identifier (e.g. "sku-48213")
+  - paraphrase queries: synonyms of the chunk's terms, no identifier
+The dense stub embeds concepts (a term and its synonym map to the same vector) but,
+like most embedding models, carries little signal for rare identifiers, so each
+retriever has a query type it is weak on.
+
+Qdrant runs in memory; importing the app still connects to Redis and Qdrant, so start them first:
+    docker compose up -d redis qdrant
+    python -m benchmarks.bench_retrieval --chunks 2000 --queries 200
+    python -m benchmarks.bench_retrieval --reranker ms-marco-MiniLM-L-12-v2   # needs flashrank
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+import types
+
+import numpy as np
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+DIM = 256
+
+
+class Corpus:
+    def __init__(self, n_chunks: int, n_concepts: int, terms_per_chunk: int, seed: int):
+        self.rng = random.Random(seed)
+        vectors = np.random.default_rng(seed).standard_normal((n_concepts, DIM)).astype(np.float32)
+        self.concept_vectors = vectors
+        self.n_concepts = n_concepts
+        self.chunks = []
+        for i in range(n_chunks):
+            # Zipf-like concept frequencies, so some terms are common and some rare
+            concepts = {min(int(self.rng.paretovariate(1.0)) - 1, n_concepts - 1) if self.rng.random() < 0.5
+                        else self.rng.randrange(n_concepts) for _ in range(terms_per_chunk)}
+            self.chunks.append({
+                "id": f"sku-{10000 + i}",
+                "concepts": sorted(concepts),
+                "source": f"paper-{i % 10}.pdf",
+            })
+
+    @staticmethod
+    def term(concept: int) -> str:
+        return f"term{concept}"
+
+    @staticmethod
+    def synonym(concept: int) -> str:
+        return f"alias{concept}"
+
+    def text(self, chunk: dict) -> str:
+        return " ".join([self.term(c) for c in chunk["concepts"]] + [chunk["id"]])
+
+    def embed(self, text: str, noise: float = 0.35) -> list[float]:
+        """Concept-level embedding: synonyms collapse together, identifiers are dropped."""
+        vector = np.zeros(DIM, dtype=np.float32)
+        for token in text.split():
+            if token.startswith("term"):
+                vector += self.concept_vectors[int(token[4:])]
+            elif token.startswith("alias"):
+                vector += self.concept_vectors[int(token[5:])]
+        vector /= np.linalg.norm(vector) or 1.0
+        vector += np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(DIM).astype(np.float32) * noise / np.sqrt(DIM)
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def queries(self, n: int) -> list[dict]:
+        queries = []
+        for i in range(n):
+            chunk = self.rng.choice(self.chunks)
+            if i % 2 == 0:
+                concepts = self.rng.sample(chunk["concepts"], min(2, len(chunk["concepts"])))
+                text = " ".join([self.term(c) for c in concepts] + [chunk["id"]])
+                kind = "keyword"
+            else:
+                concepts = self.rng.sample(chunk["concepts"], min(5, len(chunk["concepts"])))
+                text = " ".join(self.synonym(c) for c in concepts)
+                kind = "paraphrase"
+            queries.append({"text": text, "kind": kind, "target": chunk["id"]})
+        return queries
+
+
+def build_retriever(corpus: Corpus):
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import PointStruct
+    from app.services.retrieval import HybridRetriever
+    from app.services.vector_db import chunk_id
+
+    client = QdrantClient(":memory:")
+    client.create_collection("bench", vectors_config={"size": DIM, "distance": "Cosine"})
+    points = []
+    for chunk in corpus.chunks:
+        text = corpus.text(chunk)
+        metadata = {"source": chunk["source"], "sku": chunk["id"], "chunk_id": chunk_id(chunk["source"], text)}
+        points.append(PointStruct(id=metadata["chunk_id"], vector=corpus.embed(text),
+                                  payload={"page_content": text, "metadata": metadata}))
+    for i in range(0, len(points), 256):
+        client.upsert("bench", points=points[i:i + 256])
+
+    retriever = HybridRetriever(vector_db=types.SimpleNamespace(client=client, collection_name="bench"))
+    retriever.rebuild()
+    # The corpus is static: skip the Redis generation check on every query
+    retriever._sync = lambda: None
+    return retriever
+
+
+def evaluate(name: str, run, queries: list[dict], k: int) -> dict:
+    hits = {"keyword": 0, "paraphrase": 0}
+    totals = {"keyword": 0, "paraphrase": 0}
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        docs = run(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+        totals[q["kind"]] += 1
+        if q["target"] in [d.metadata.get("sku") for d in docs[:k]]:
+            hits[q["kind"]] += 1
+    latencies.sort()
+    return {
+        "retriever": name,
+        f"recall@{k}": round(sum(hits.values()) / len(queries), 3),
+        "keyword": round(hits["keyword"] / max(totals["keyword"], 1), 3),
+        "paraphrase": round(hits["paraphrase"] / max(totals["paraphrase"], 1), 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--concepts", type=int, default=3000)
+    parser.add_argument("--terms", type=int, default=30, help="Concepts per chunk")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--reranker", default="", help="flashrank model name for the rerank pass")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    settings.RERANKER_MODEL = args.reranker
+
+    corpus = Corpus(args.chunks, args.concepts, args.terms, args.seed)
+    queries = corpus.queries(args.queries)
+    retriever = build_retriever(corpus)
+    # Query vectors are computed once up front, as rag_node reuses the topic embedding
+    vectors = {q["text"]: corpus.embed(q["text"]) for q in queries}
+
+    def to_docs(ids):
+        return [retriever.index.docs[i] for i in ids]
+
+    runs = {
+        "dense": lambda q: [doc for _, doc in retriever.dense_search(vectors[q["text"]], args.k)],
+        "bm25": lambda q: to_docs(retriever.index.search(q["text"], args.k)),
+        "hybrid": lambda q: retriever.search(q["text"], vectors[q["text"]], k=args.k, rerank=False),
+    }
+    if retriever._get_reranker():
+        runs["hybrid+rerank"] = lambda q: retriever.search(q["text"], vectors[q["text"]], k=args.k, rerank=True)
+
+    results = [evaluate(name, run, queries, args.k) for name, run in runs.items()]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.chunks} chunks, {args.queries} queries (half keyword, half paraphrase), k={args.k}")
+    if "hybrid+rerank" not in runs:
+        print("(rerank skipped: pass --reranker <flashrank model> with flashrank installed)")
+    recall = f"recall@{args.k}"
+    print(f"{'retriever':<15}{recall:>10}{'keyword':>9}{'paraphrase':>12}{'p50_ms':>9}{'p95_ms':>9}")
+    for r in results:
+        print(f"{r['retriever']:<15}{r[recall]:>10}{r['keyword']:>9}{r['paraphrase']:>12}{r['p50_ms']:>9}{r['p95_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Revision pass cost: full rewrite versus section-aware incremental revision
+(app/agent/revision.py), measured on write_node with a stub LLM whose latency is a
+time-to-first-token plus a per-output-token cost.
+
+For each number of sections the critique flags, runs the revision pass both ways on the
+same drafted report and reports output tokens generated and wall time. Section rewrites
+run concurrently, so their wall time is roughly one section's generation, not the sum.
+Needs no external services:
+    python -m benchmarks.bench_revision --sections 8 --section-words 150 --weak 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from benchmarks.stubs import install_backends, install_stubs, synthetic_report
+
+
+async def revision_pass(nodes, llm, sections: int, section_words: int, weak: int) -> dict:
+    topic = f"bench topic {uuid.uuid4()}" # unique, so the LLM response cache never answers
+    state = {
+        "topic": topic,
+        "final_report": synthetic_report(topic, sections, section_words),
+        "critique_comments": "Cover the missing aspects: recent benchmark numbers; cost comparison",
+        # Outline numbers as the critique gives them; 1 is the title/introduction
+        "weak_sections": [str(i + 2) for i in range(weak)],
+        "search_results": [f"Content: Result {i} for {topic}\nSource: https://example.com/{i}" for i in range(5)],
+        "rag_data": [f"Content: Chunk {i}\nSource: stub.pdf" for i in range(3)],
+        "visual_data": [],
+    }
+    before = llm.output_tokens
+    start = time.perf_counter()
+    result = await nodes.write_node(state)
+    return {
+        "seconds": time.perf_counter() - start,
+        "output_tokens": llm.output_tokens - before,
+        "mode": result["context_stats"][0]["mode"],
+    }
+
+
+async def run(args) -> list[dict]:
+    install_backends()
+    from app.agent import nodes
+    from app.core.config import settings
+
+    stubs = install_stubs(llm_latency=args.ttft, search_latency=0, embed_latency=0, vector_latency=0)
+    llm = stubs.llm
+    llm.report_sections = args.sections
+    llm.section_words = args.section_words
+    llm.token_latency = 1 / args.tokens_per_second
+
+    rows = []
+    for weak in args.weak:
+        row = {"weak_sections": weak}
+        for incremental in (False, True):
+            settings.INCREMENTAL_REVISION = incremental
+            runs = [await revision_pass(nodes, llm, args.sections, args.section_words, weak) for _ in range(args.repeat)]
+            row["incremental" if incremental else "full"] = {
+                "mode": runs[-1]["mode"],
+                "output_tokens": runs[-1]["output_tokens"],
+                "wall_ms": round(statistics.median(r["seconds"] for r in runs) * 1000, 1),
+            }
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=8, help="'##' sections in the drafted report")
+    parser.add_argument("--section-words", type=int, default=150)
+    parser.add_argument("--weak", type=int, nargs="+", default=[1, 2, 4], help="Sections the critique flags")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first output token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Output generation rate")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'weak':>5}{'full_tokens':>13}{'full_ms':>10}{'incr_tokens':>13}{'incr_ms':>10}{'incr_mode':>13}")
+    for row in rows:
+        full, incr = row["full"], row["incremental"]
+        print(f"{row['weak_sections']:>5}{full['output_tokens']:>13}{full['wall_ms']:>10}"
+              f"{incr['output_tokens']:>13}{incr['wall_ms']:>10}{incr['mode']:>13}")
+
+
+if __name__ == "__main__":
+    main()
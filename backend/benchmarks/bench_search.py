@@ -0,0 +1,112 @@
+"""
+Search cache benchmark (services/search.py) under repeated, skewed traffic.
+
+Requests arrive as a Poisson stream. Topics are drawn from a Zipf distribution (a few
+popular topics, a long tail), and users phrase them with different case, spacing and
+punctuation. The stub search backend has Tavily-like "advanced" latency. The run is
+compared with the cache disabled. Fresh and stale windows are scaled down to seconds,
+so the run covers fresh hits, stale hits with background refresh, and expiry:
+    python -m benchmarks.bench_search --requests 240 --rate 6 --topics 200 --fresh 5 --stale 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from benchmarks.stubs import FakeTavily, Latency, install_backends
+
+
+def phrasing(topic: str, rng: random.Random) -> str:
+    """The same question as different users type it."""
+    variants = [topic, topic.capitalize(), topic.upper(), f"  {topic}  ", f"{topic}?", topic.replace(" ", "  ")]
+    return rng.choice(variants)
+
+
+def percentile(samples: list[float], q: int) -> float:
+    ordered = sorted(samples)
+    return round(statistics.quantiles(ordered, n=100, method="inclusive")[q - 1] * 1000, 1) if len(ordered) > 1 else 0.0
+
+
+async def run_traffic(service, args, cached: bool) -> dict:
+    from app.core.config import settings
+    settings.SEARCH_CACHE_ENABLED = cached
+    rng = random.Random(args.seed)
+    weights = [1 / (rank ** args.zipf) for rank in range(1, args.topics + 1)]
+    topics = [f"research topic {i} market outlook" for i in range(args.topics)]
+    latencies = []
+
+    async def one(query: str):
+        start = time.perf_counter()
+        await service.search(query, max_results=3, search_depth="advanced", include_images=True)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        query = phrasing(rng.choices(topics, weights)[0], rng)
+        tasks.append(asyncio.create_task(one(query)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+    stats = service.get_stats()
+    return {
+        "requests": args.requests,
+        "upstream_calls": stats["upstream_calls"],
+        "upstream_share": round(stats["upstream_calls"] / args.requests, 3),
+        "fresh_hits": stats["fresh_hits"],
+        "stale_hits": stats["stale_hits"],
+        "inflight_joins": stats["inflight_joins"],
+        "revalidations": stats["revalidations"],
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "wall_s": round(wall, 2),
+    }
+
+
+async def run(args) -> dict:
+    install_backends()
+    from app.core.config import settings
+    from app.services.search import SearchService
+
+    settings.SEARCH_CACHE_TTL_SECONDS = args.fresh
+    settings.SEARCH_STALE_SECONDS = args.stale
+    results = {}
+    for mode, cached in (("no_cache", False), ("cache", True)):
+        backend = FakeTavily(Latency.parse(args.search_latency, seed=args.seed))
+        service = SearchService(backend=backend)
+        # The refresh lock would outlive the scaled-down TTLs
+        settings.SEARCH_REFRESH_LOCK_SECONDS = max(1, int(args.fresh))
+        results[mode] = await run_traffic(service, args, cached)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=240)
+    parser.add_argument("--rate", type=float, default=6.0, help="Requests per second (Poisson arrivals)")
+    parser.add_argument("--topics", type=int, default=200, help="Distinct topics")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew of topics")
+    parser.add_argument("--search-latency", default="lognormal:0.8:0.3", help="Backend latency (advanced depth)")
+    parser.add_argument("--fresh", type=float, default=5.0, help="Seconds results stay fresh (scaled down)")
+    parser.add_argument("--stale", type=float, default=15.0, help="Seconds stale results are served while refreshing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for mode, r in result.items():
+        print(f"{mode:<9} " + "  ".join(f"{k}={v}" for k, v in r.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Offline end-to-end benchmark suite. Drives graph_app and the FastAPI endpoints with
+deterministic stubs: fake LLM and Tavily with seeded latency distributions, fake
+embeddings, and in-memory Redis/Qdrant stand-ins (benchmarks/stubs.py). Nothing else
+needs to be running.
+
+Scenarios:
+  graph              graph_app.ainvoke directly (no HTTP), new topic
+  cold               POST /research, new topic: the full pipeline
+  cache_hit          POST /research, topic answered before: semantic cache hit
+  critique_revision  POST /research with the critic asking for a revision (delta search + rewrite)
+  hitl               POST /research with enable_hitl (runs to the pause), then POST /research/resume/{id}
+  upload             POST /upload of a synthetic PDF, polled via GET /upload/{id} until ingested
+
+Reports p50/p95/p99 latency, throughput and errors per scenario; --json / --output write
+machine-readable results for regression tracking. Latencies are seconds or distributions:
+    python -m benchmarks.bench_suite --requests 40 --concurrency 8 --llm-latency lognormal:0.2:0.4
+    python -m benchmarks.bench_suite --scenarios cold cache_hit --output results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+# Coalescing needs Redis pub/sub, which the in-memory stand-in doesn't provide; topics are unique anyway
+os.environ.setdefault("COALESCE_ENABLED", "false")
+
+import httpx
+
+from benchmarks.stubs import CRITIQUE_ACCEPT, CRITIQUE_REVISE, install_backends, install_stubs
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+SCENARIOS = ["graph", "cold", "cache_hit", "critique_revision", "hitl", "upload"]
+
+
+def summarize(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    q = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class Suite:
+    """Scenario implementations. Each returns {phase: seconds}; "total" is the request latency."""
+    def __init__(self, client: httpx.AsyncClient, graph_app, stubs, pdf_bytes: bytes):
+        self.client = client
+        self.graph_app = graph_app
+        self.stubs = stubs
+        self.pdf_bytes = pdf_bytes
+        self.cached_topics = []
+
+    @staticmethod
+    def topic() -> str:
+        return f"bench topic {uuid.uuid4()}"
+
+    async def _research(self, body: dict, expect_status: str, expect_source: str = None) -> dict:
+        r = await self.client.post("/research", json=body)
+        data = r.json()
+        if data.get("status") != expect_status or (expect_source and data.get("source") != expect_source):
+            raise RuntimeError(f"unexpected response: status={data.get('status')} source={data.get('source')}")
+        return data
+
+    async def graph(self, i: int) -> dict:
+        start = time.perf_counter()
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        result = await self.graph_app.ainvoke({"topic": self.topic(), "enable_hitl": False}, config=config)
+        if not result.get("final_report"):
+            raise RuntimeError("no report")
+        return {"total": time.perf_counter() - start}
+
+    async def cold(self, i: int) -> dict:
+        start = time.perf_counter()
+        await self._research({"topic": self.topic()}, "completed", "live")
+        return {"total": time.perf_counter() - start}
+
+    async def prepare_cache_hit(self, requests: int):
+        # Topics answered before the timed run; lookups then hit the cache
+        self.cached_topics = [self.topic() for _ in range(requests)]
+        for topic in self.cached_topics:
+            await self.stubs.cache.asave(topic, f"# Cached report for {topic}")
+
+    async def cache_hit(self, i: int) -> dict:
+        start = time.perf_counter()
+        await self._research({"topic": self.cached_topics[i]}, "completed", "cache")
+        return {"total": time.perf_counter() - start}
+
+    async def critique_revision(self, i: int) -> dict:
+        start = time.perf_counter()
+        await self._research({"topic": self.topic()}, "completed", "live")
+        return {"total": time.perf_counter() - start}
+
+    async def hitl(self, i: int) -> dict:
+        start = time.perf_counter()
+        data = await self._research({"topic": self.topic(), "enable_hitl": True}, "paused")
+        paused = time.perf_counter()
+        r = await self.client.post(f"/research/resume/{data['thread_id']}", params={"feedback": "Looks good, add a summary table."})
+        if r.json().get("status") != "completed":
+            raise RuntimeError(f"resume failed: {r.text[:200]}")
+        end = time.perf_counter()
+        return {"total": end - start, "pause": paused - start, "resume": end - paused}
+
+    async def upload(self, i: int) -> dict:
+        start = time.perf_counter()
+        # Unique name so the document manifest doesn't skip the work as unchanged
+        files = {"file": (f"bench-{uuid.uuid4()}.pdf", self.pdf_bytes, "application/pdf")}
+        job = (await self.client.post("/upload", files=files)).json()
+        accepted = time.perf_counter()
+        while job["status"] in ("queued", "running"):
+            await asyncio.sleep(0.005)
+            job = (await self.client.get(f"/upload/{job['job_id']}")).json()
+        if job["status"] != "completed":
+            raise RuntimeError(f"ingestion failed: {job.get('error')}")
+        end = time.perf_counter()
+        return {"total": end - start, "accept": accepted - start, "ingest": end - accepted}
+
+
+async def run_scenario(suite: Suite, name: str, requests: int, concurrency: int) -> dict:
+    if name == "cache_hit":
+        await suite.prepare_cache_hit(requests)
+    if name == "critique_revision":
+        suite.stubs.llm.critique_reply = CRITIQUE_REVISE
+    scenario = getattr(suite, name)
+    semaphore = asyncio.Semaphore(concurrency)
+    phases = {}
+    errors = []
+
+    async def one(i: int):
+        async with semaphore:
+            try:
+                for phase, seconds in (await scenario(i)).items():
+                    phases.setdefault(phase, []).append(seconds)
+            except Exception as e:
+                errors.append(str(e)[:200])
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(requests)])
+        wall = time.perf_counter() - start
+    finally:
+        suite.stubs.llm.critique_reply = CRITIQUE_ACCEPT
+
+    completed = len(phases.get("total", []))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "completed": completed,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+        **summarize(phases.get("total", [])),
+        "phases": {phase: summarize(samples) for phase, samples in phases.items() if phase != "total"},
+    }
+
+
+async def run(args) -> dict:
+    install_backends(upsert_latency=args.upsert_latency)
+    # Imported after the in-memory backends are in place: services take their clients when built
+    from langgraph.checkpoint.memory import MemorySaver
+    import app.main
+    from app.agent.graph import memory, graph_app
+
+    memory.override(MemorySaver())
+    stubs = install_stubs(
+        llm_latency=args.llm_latency,
+        search_latency=args.search_latency,
+        embed_latency=args.embed_latency,
+        vector_latency=args.vector_latency,
+        n_images=args.images,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "bench.pdf")
+        write_synthetic_pdf(pdf, args.pdf_pages)
+        with open(pdf, "rb") as f:
+            pdf_bytes = f.read()
+
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        suite = Suite(client, graph_app, stubs, pdf_bytes)
+        # One untimed cold run builds the graph and services so the first scenario isn't penalized
+        await suite.cold(0)
+        results = {}
+        for name in args.scenarios:
+            results[name] = await run_scenario(suite, name, args.requests, args.concurrency)
+
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "llm_latency": stubs.llm.latency.describe(),
+            "search_latency": stubs.tavily.latency.describe(),
+            "embed_latency": stubs.embeddings.latency.describe(),
+            "vector_latency": str(args.vector_latency),
+            "upsert_latency": str(args.upsert_latency),
+            "images": args.images,
+            "pdf_pages": args.pdf_pages,
+        },
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", default="lognormal:0.2:0.4")
+    parser.add_argument("--search-latency", default="lognormal:0.3:0.3")
+    parser.add_argument("--embed-latency", default="normal:0.02:0.005")
+    parser.add_argument("--vector-latency", default="0.02")
+    parser.add_argument("--upsert-latency", default="0.01", help="Seconds per Qdrant upsert batch")
+    parser.add_argument("--images", type=int, default=1, help="Images per search result set (vision calls)")
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    # The nodes log progress with print(); keep stdout clean for --json
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'scenario':<19}{'ok':>5}{'err':>5}{'rps':>9}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}")
+    for name, r in result["scenarios"].items():
+        print(f"{name:<19}{r['completed']:>5}{r['errors']:>5}{r['throughput_rps']:>9}"
+              f"{r.get('p50_ms', '-'):>10}{r.get('p95_ms', '-'):>10}{r.get('p99_ms', '-'):>10}")
+        for phase, p in r["phases"].items():
+            print(f"  {phase:<17}{'':>19}{p['p50_ms']:>10}{p['p95_ms']:>10}{p['p99_ms']:>10}")
+        if r["first_error"]:
+            print(f"  first error: {r['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Vision pipeline benchmark: the previous vision_node (first two URLs sent as-is to the
+model, one call each, nothing remembered) versus services/images.py (concurrent
+download, hash dedup, description cache, downscaling, per-run budget).
+
+A local HTTP server serves synthetic charts. A series of related queries returns
+overlapping image lists: the same charts on several hosts, re-encoded smaller copies
+(near duplicates), an oversized file and a slow URL. The stub vision model charges a
+fixed latency plus a cost per image token, estimated with Gemini's tiling (258 tokens
+per 768px tile), so downscaling shows up in both tokens and time.
+    python -m benchmarks.bench_vision --queries 6 --images-per-query 5 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+# The image server below listens on loopback, which downloads refuse by default
+os.environ.setdefault("VISION_ALLOW_PRIVATE_HOSTS", "true")
+
+from langchain_core.messages import AIMessage
+from PIL import Image
+
+from benchmarks.stubs import FakeImageSource, Latency, install_backends
+
+TILE_TOKENS = 258
+SOURCE = FakeImageSource(Latency(0.0))
+
+
+def image_tokens(width: int, height: int) -> int:
+    return TILE_TOKENS * math.ceil(width / 768) * math.ceil(height / 768)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/<host>/chartN.png: the chart; /<host>/chartN_small.jpg: re-encoded at 80%; /huge.png; /slow.png."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    bodies = {}
+    slow_seconds = 10.0
+
+    def do_GET(self):
+        path = self.path
+        if path.endswith("slow.png"):
+            time.sleep(self.slow_seconds)
+        if path not in self.bodies:
+            if path.endswith("huge.png"):
+                body = os.urandom(8_000_000)
+            else:
+                name = path.rsplit("/", 1)[-1].replace("_small.jpg", ".png")
+                body = SOURCE.image(f"/{name}")
+                if path.endswith("_small.jpg"):
+                    image = Image.open(io.BytesIO(body))
+                    image = image.resize((int(image.width * 0.8), int(image.height * 0.8)))
+                    buffer = io.BytesIO()
+                    image.save(buffer, "JPEG", quality=80)
+                    body = buffer.getvalue()
+            self.bodies[path] = body
+        body = self.bodies[path]
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg" if path.endswith(".jpg") else "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class VisionModel:
+    """Stub vision model: fixed latency plus `token_seconds` per image token; counts calls and tokens."""
+    def __init__(self, latency: float, token_seconds: float):
+        self.latency = latency
+        self.token_seconds = token_seconds
+        self.calls = 0
+        self.image_tokens = 0
+
+    def _size(self, url: str) -> tuple:
+        if url.startswith("data:"):
+            data = base64.b64decode(url.split(",", 1)[1])
+        else:
+            # The provider downloads the URL and sees the original
+            data = Handler.bodies.get("/" + url.split("/", 3)[-1]) or SOURCE.image(url)
+        return Image.open(io.BytesIO(data)).size
+
+    async def ainvoke(self, messages, **kwargs):
+        url = messages[-1].content[1]["image_url"]["url"]
+        tokens = image_tokens(*self._size(url))
+        self.calls += 1
+        self.image_tokens += tokens
+        await asyncio.sleep(self.latency + tokens * self.token_seconds)
+        return AIMessage(content=f"A bar chart ({tokens} image tokens).")
+
+
+def make_queries(base_url: str, n: int, per_query: int, charts: int, seed: int, slow: bool = True) -> list[list[str]]:
+    rng = random.Random(seed)
+    hosts = ["news", "blog", "cdn"]
+    queries = []
+    for _ in range(n):
+        urls = []
+        for _ in range(per_query):
+            chart = rng.randrange(charts)
+            variant = "_small.jpg" if rng.random() < 0.25 else ".png"
+            urls.append(f"{base_url}/{rng.choice(hosts)}/chart{chart}{variant}")
+        # Every query also turns up one oversized file and one that never finishes in time
+        urls.insert(rng.randrange(len(urls)), f"{base_url}/misc/huge.png")
+        if slow:
+            urls.insert(rng.randrange(len(urls)), f"{base_url}/misc/slow.png")
+        queries.append(urls)
+    return queries
+
+
+async def previous_node(vision_llm, urls: list[str]) -> list[str]:
+    """What vision_node did before: the first two URLs, one model call each, no memory."""
+    async def describe(url):
+        from langchain_core.messages import HumanMessage
+        try:
+            message = HumanMessage(content=[{"type": "text", "text": "Describe"}, {"type": "image_url", "image_url": {"url": url}}])
+            return (await vision_llm.ainvoke([message])).content
+        except Exception:
+            return None
+    return [d for d in await asyncio.gather(*[describe(u) for u in urls[:2]]) if d]
+
+
+async def run(args, base_url: str) -> dict:
+    install_backends()
+    from app.agent import vision
+    from app.services.images import ImageService, image_service
+    from app.services.llm_cache import llm_response_cache
+
+    queries = make_queries(base_url, args.queries, args.images_per_query, args.charts, args.seed, not args.no_slow)
+    results = {}
+    for mode in ("previous", "pipeline"):
+        model = VisionModel(args.llm_latency, args.token_ms / 1000)
+        image_service.override(ImageService())
+        vision.vision_llm = llm_response_cache.wrap(model, "vision")
+        covered, start = 0, time.perf_counter()
+        for urls in queries:
+            if mode == "previous":
+                # The provider would fetch the slow/huge URLs too; skip them so the baseline isn't penalized
+                descriptions = await previous_node(vision.vision_llm, [u for u in urls if "/misc/" not in u])
+            else:
+                descriptions = (await vision.vision_node({"images": urls}))["visual_data"]
+            covered += len(descriptions)
+        wall = time.perf_counter() - start
+        stats = image_service.get_stats()
+        results[mode] = {
+            "wall_s": round(wall, 2),
+            "model_calls": model.calls,
+            "image_tokens": model.image_tokens,
+            "images_covered": covered,
+            "downloads": stats["downloads"] if mode == "pipeline" else None,
+            "download_failures": stats["download_failures"] + stats["rejected"] if mode == "pipeline" else None,
+            "duplicates": stats["duplicates"] if mode == "pipeline" else None,
+            "cache_hits": stats["cache_hits"] + stats["near_hits"] if mode == "pipeline" else None,
+            "bytes_in": stats["bytes_in"] if mode == "pipeline" else None,
+            "bytes_out": stats["bytes_out"] if mode == "pipeline" else None,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=6, help="Related queries (vision_node runs)")
+    parser.add_argument("--images-per-query", type=int, default=5)
+    parser.add_argument("--charts", type=int, default=6, help="Distinct charts behind all the URLs")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-ms", type=float, default=0.2, help="Model cost per image token")
+    parser.add_argument("--no-slow", action="store_true", help="Leave out the URL that times out")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        result = asyncio.run(run(args, f"http://127.0.0.1:{server.server_address[1]}"))
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for mode, r in result.items():
+        print(f"{mode:<9} " + "  ".join(f"{k}={v}" for k, v in r.items() if v is not None))
+
+
+if __name__ == "__main__":
+    main()
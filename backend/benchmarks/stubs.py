@@ -0,0 +1,495 @@
+"""
+Stubbed backends for offline benchmarks.
+Each stub simulates upstream latency. With `blocking=True` the async methods sleep
+synchronously, which reproduces a sync client called from inside the event loop.
+
+`install_backends()` swaps Redis and Qdrant for in-memory stand-ins and must run before
+the app's services are imported; `install_stubs()` swaps the LLM, search, embedding,
+semantic cache and retrieval clients and can run after.
+"""
+import asyncio
+import fnmatch
+import hashlib
+import io
+import random
+import threading
+import time
+import numpy as np
+from types import SimpleNamespace
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class Latency:
+    """
+    Simulated upstream latency: a fixed delay or a seeded random distribution, so runs
+    with the same seed sleep the same sequence of delays.
+      fixed      `seconds`
+      uniform    `seconds` +/- `spread`
+      normal     mean `seconds`, standard deviation `spread` (clipped at 0)
+      lognormal  median `seconds`, shape `spread` (long right tail, like LLM calls)
+    """
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, seconds: float, blocking: bool = False, dist: str = "fixed", spread: float = 0.0, seed: int = 0):
+        if dist not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {dist}")
+        self.seconds = seconds
+        self.blocking = blocking
+        self.dist = dist
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, blocking: bool = False, seed: int = 0) -> "Latency":
+        """'0.2' (fixed), 'uniform:0.2:0.05', 'normal:0.2:0.05' or 'lognormal:0.2:0.5'."""
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls(float(spec), blocking, seed=seed)
+        parts = str(spec).split(":")
+        if len(parts) == 1:
+            return cls(float(parts[0]), blocking, seed=seed)
+        return cls(float(parts[1]), blocking, dist=parts[0], spread=float(parts[2]) if len(parts) > 2 else 0.0, seed=seed)
+
+    def sample(self) -> float:
+        if self.dist == "fixed":
+            return self.seconds
+        with self._lock:
+            if self.dist == "uniform":
+                value = self._rng.uniform(self.seconds - self.spread, self.seconds + self.spread)
+            elif self.dist == "normal":
+                value = self._rng.gauss(self.seconds, self.spread)
+            else:
+                value = self.seconds * self._rng.lognormvariate(0.0, self.spread)
+        return max(0.0, value)
+
+    def sleep(self, extra: float = 0.0):
+        time.sleep(self.sample() + extra)
+
+    async def wait(self, extra: float = 0.0):
+        seconds = self.sample() + extra
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    def describe(self) -> str:
+        return f"{self.seconds}" if self.dist == "fixed" else f"{self.dist}:{self.seconds}:{self.spread}"
+
+
+CRITIQUE_RATIONALE = (
+    "The report addresses the topic directly, cites its sources, and the structure follows "
+    "the question. Coverage of background, current state and open problems is adequate for "
+    "a research summary, and the figures quoted are consistent with the cited material."
+)
+CRITIQUE_ACCEPT = f"VERDICT: ACCEPT\n{CRITIQUE_RATIONALE}"
+CRITIQUE_REVISE = (
+    "VERDICT: REVISE\nMISSING:\n- recent benchmark numbers\n- cost comparison\nSECTIONS:\n- 2\nEND\n"
+    f"{CRITIQUE_RATIONALE}"
+)
+FILLER = "The cited sources report consistent figures for this part of the topic and note open questions."
+
+
+def synthetic_report(topic: str, sections: int, section_words: int) -> str:
+    """A Markdown report with a title, an introduction and `sections` "##" sections of about `section_words` words."""
+    filler = FILLER.split(" ")
+    def body(words: int) -> str:
+        return " ".join(filler[i % len(filler)] for i in range(words))
+    parts = [f"# {topic}\n\n{body(section_words // 2)}\n"]
+    parts += [f"## Section {i + 1}\n\n{body(section_words)}\n" for i in range(sections)]
+    return "\n".join(parts)
+
+
+class FakeLLM:
+    """
+    Chat model stand-in with canned replies per call site.
+    Set `critique_reply` to CRITIQUE_REVISE to drive the revision loop.
+    `astream` spends `first_token_share` of the sampled latency before the first chunk
+    and spreads the rest over the remaining words, so stopping a stream early saves time.
+    With `report_sections` the writer returns a multi-section report (and section
+    revisions one section); `token_latency` / `input_token_latency` add seconds per output /
+    prompt token to every call; `calls`, `input_tokens` and `output_tokens` count the traffic.
+    """
+    def __init__(self, latency: Latency, critique_reply: str = CRITIQUE_ACCEPT, first_token_share: float = 0.25,
+                 report_sections: int = 0, section_words: int = 200, token_latency: float = 0.0,
+                 input_token_latency: float = 0.0):
+        self.latency = latency
+        self.critique_reply = critique_reply
+        self.first_token_share = first_token_share
+        self.report_sections = report_sections
+        self.section_words = section_words
+        self.token_latency = token_latency
+        self.input_token_latency = input_token_latency
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _reply(self, messages) -> str:
+        prompt = str(messages[-1].content)
+        if "critical editor" in prompt:
+            return self.critique_reply
+        if "Safety & Compliance" in prompt:
+            return "SAFE"
+        if not self.report_sections:
+            return "# Report\n\nStub report body."
+        if "revising one section" in prompt:
+            heading = prompt.split("--- SECTION TO REVISE ---", 1)[1].strip().splitlines()[0]
+            return synthetic_report("", 1, self.section_words).split("\n\n", 2)[-1].replace("## Section 1", heading)
+        return synthetic_report("Report", self.report_sections, self.section_words)
+
+    @staticmethod
+    def _tokens(text: str) -> int:
+        return len(text) // 4 # rough chars / 4, like telemetry's estimates
+
+    def _message(self, messages) -> AIMessage:
+        content = self._reply(messages)
+        input_tokens = sum(self._tokens(str(m.content)) for m in messages)
+        output_tokens = self._tokens(content)
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+    def _token_seconds(self, message: AIMessage) -> float:
+        usage = message.usage_metadata
+        return self.token_latency * usage["output_tokens"] + self.input_token_latency * usage["input_tokens"]
+
+    async def ainvoke(self, messages, **kwargs):
+        message = self._message(messages)
+        await self.latency.wait(self._token_seconds(message))
+        return message
+
+    def invoke(self, messages, **kwargs):
+        message = self._message(messages)
+        self.latency.sleep(self._token_seconds(message))
+        return message
+
+    async def astream(self, messages, **kwargs):
+        total = self.latency.sample()
+        words = self._reply(messages).split(" ")
+        per_word = total * (1 - self.first_token_share) / max(len(words) - 1, 1)
+        for i, word in enumerate(words):
+            await Latency(total * self.first_token_share if i == 0 else per_word, self.latency.blocking).wait()
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
+
+
+class FakeTavily:
+    def __init__(self, latency: Latency, n_images: int = 0):
+        self.latency = latency
+        self.n_images = n_images
+
+    async def search(self, query: str, max_results: int = 3, **kwargs):
+        await self.latency.wait()
+        # Pages are per query, so URL dedup only merges what a real engine would also repeat
+        slug = hashlib.sha256(query.encode()).hexdigest()[:8]
+        return {
+            "results": [
+                {"content": f"Result {i} for {query}", "url": f"https://example.com/{slug}/{i}"}
+                for i in range(max_results)
+            ],
+            "images": [f"https://example.com/chart{i}.png" for i in range(self.n_images)],
+        }
+
+
+class FakeImageSource:
+    """
+    Stands in for image downloads: synthetic bar-chart PNGs, deterministic per file name
+    (".../chart3.png" is the same chart on any host), after a simulated download latency.
+    """
+    def __init__(self, latency: Latency, size: tuple = (1600, 1000)):
+        self.latency = latency
+        self.size = size
+        self._images = {}
+        self.downloads = 0
+
+    def image(self, url: str) -> bytes:
+        name = url.rstrip("/").rsplit("/", 1)[-1]
+        if name not in self._images:
+            from PIL import Image, ImageDraw
+            rng = random.Random(name)
+            image = Image.new("RGB", self.size, "white")
+            draw = ImageDraw.Draw(image)
+            width, height = self.size
+            bars = rng.randint(4, 9)
+            for i in range(bars):
+                top = int(height * rng.uniform(0.1, 0.8))
+                left = int(width * (i + 0.15) / bars)
+                draw.rectangle([left, top, left + int(width * 0.6 / bars), height - 40], fill=(40 + 20 * i, 90, 200 - 15 * i))
+            draw.line([(30, height - 40), (width - 30, height - 40)], fill="black", width=4)
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG")
+            self._images[name] = buffer.getvalue()
+        return self._images[name]
+
+    async def download(self, url: str):
+        await self.latency.wait()
+        self.downloads += 1
+        return self.image(url), "image/png"
+
+
+class FakeEmbeddings:
+    """Deterministic hash-seeded unit vectors. Batch calls also pay `per_text` seconds per text."""
+    def __init__(self, latency: Latency, dim: int = 1536, per_text: float = 0.0):
+        self.latency = latency
+        self.dim = dim
+        self.per_text = per_text
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+        v = np.random.default_rng(seed).standard_normal(self.dim)
+        return (v / np.linalg.norm(v)).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        self.latency.sleep(self.per_text)
+        return self._vector(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.latency.sleep(self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        await self.latency.wait(self.per_text)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await self.latency.wait(self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+
+class FakeRetriever:
+    def __init__(self, latency):
+        self.latency = Latency.parse(latency)
+
+    def search(self, query: str, vector, k: int = 3, sources=None, rerank: bool = True):
+        # Runs in a worker thread, so a real sleep is accurate here
+        self.latency.sleep()
+        return [Document(page_content=f"Chunk {i}", metadata={"source": "stub.pdf"}) for i in range(k)]
+
+
+class FakeQdrantClient:
+    """
+    In-memory QdrantClient whose upserts only sleep, like a round trip to a remote server.
+    Subclasses the real client lazily so LangChain's isinstance checks still pass.
+    """
+    def __new__(cls, upsert_latency=0.05):
+        from qdrant_client import QdrantClient
+        upsert_latency = Latency.parse(upsert_latency)
+
+        class _Client(QdrantClient):
+            def upsert(self, collection_name, points, **kwargs):
+                upsert_latency.sleep()
+                self.upserted += len(points) if hasattr(points, "__len__") else 0
+
+        client = _Client(":memory:")
+        client.upserted = 0
+        return client
+
+
+class FakeSemanticCache:
+    """
+    Exact-match report cache keyed by normalized topic (bounded, in memory).
+    Embeds through the shared service like the real cache, so the topic vector is memoized for RAG.
+    """
+    def __init__(self, embeddings, max_entries: int = 10000):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.reports = {}
+
+    async def alookup(self, query: str):
+        from app.services.redis_cache import normalize_topic
+        await self.embeddings.aembed(query)
+        return self.reports.get(normalize_topic(query))
+
+    async def alookup_many(self, queries: list[str]) -> list:
+        from app.services.redis_cache import normalize_topic
+        await self.embeddings.aembed_many(queries)
+        return [self.reports.get(normalize_topic(query)) for query in queries]
+
+    async def asave(self, query: str, report: str):
+        from app.services.redis_cache import normalize_topic
+        await self.embeddings.aembed(query)
+        if len(self.reports) < self.max_entries:
+            self.reports[normalize_topic(query)] = report
+
+
+class InMemoryRedis:
+    """
+    Thread-safe, dict-backed stand-in for the sync Redis commands the research and
+    upload paths use (strings, counters, hashes, TTLs). Not a full Redis: no pub/sub,
+    lists or search, so request coalescing and the job queue are not covered.
+    """
+    def __init__(self, decode_responses: bool = True):
+        self.decode_responses = decode_responses
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _encode(self, value):
+        if self.decode_responses:
+            return value.decode() if isinstance(value, bytes) else str(value)
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires < time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._live(key) else None
+
+    def mget(self, keys):
+        return [self.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(key):
+                return None
+            self._data[key] = self._encode(value)
+            self._expires.pop(key, None)
+            if ex:
+                self._expires[key] = time.time() + ex
+            return True
+
+    def incr(self, key, amount: int = 1):
+        with self._lock:
+            value = int(self.get(key) or 0) + amount
+            self._data[key] = self._encode(value)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._live(k))
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._live(key):
+                return False
+            self._expires[key] = time.time() + seconds
+            return True
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            if not self._live(key):
+                self._data[key] = {}
+            entry = self._data[key]
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            for f, v in items.items():
+                entry[self._encode(f)] = self._encode(v)
+            return len(items)
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(key, {}).get(self._encode(field)) if self._live(key) else None
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._data[key]) if self._live(key) else {}
+
+    def scan_iter(self, match: str = "*"):
+        with self._lock:
+            keys = [k for k in list(self._data) if self._live(k) and fnmatch.fnmatch(k, match)]
+        yield from keys
+
+    def pipeline(self, transaction: bool = True):
+        return _InMemoryPipeline(self)
+
+
+class _InMemoryPipeline:
+    """Queues commands and runs them on `execute()`, like a Redis pipeline."""
+    def __init__(self, redis: InMemoryRedis):
+        self.redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._calls = []
+
+
+def install_backends(upsert_latency=0.0):
+    """
+    Point the shared client registry at in-memory Redis and Qdrant stand-ins.
+    Services take their clients from the registry when they are built, so call this
+    before importing app.main (or anything that builds services at import).
+    """
+    from app.services.clients import clients
+
+    stores = {True: InMemoryRedis(decode_responses=True), False: InMemoryRedis(decode_responses=False)}
+    qdrant = FakeQdrantClient(upsert_latency)
+    # Instance attributes shadow the registry's methods
+    clients.redis = lambda decode_responses=True: stores[decode_responses]
+    clients.qdrant = lambda: qdrant
+    return SimpleNamespace(redis=stores[True], qdrant=qdrant)
+
+
+def install_stubs(llm_latency=0.2, search_latency=0.1, embed_latency=0.02, vector_latency=0.01,
+                  blocking=False, n_images=0, seed: int = 0, image_latency=0.02):
+    """
+    Swap the live LLM, search, embedding, cache and vector DB clients for stubs.
+    Latencies are seconds or `Latency.parse` specs such as "lognormal:0.2:0.5".
+    Returns the stubs so scenarios can adjust them (e.g. `stubs.llm.critique_reply`).
+    """
+    from app.agent import graph, nodes, safety, vision
+    from app.services import batch
+    from app.services.embeddings import embedding_service
+    from app.services.llm_cache import llm_response_cache
+    from app.services.images import ImageService, image_service
+    from app.services.search import SearchService, search_service
+
+    # Stub the Ollama client underneath the shared service so memo/batching stay in play
+    embedding_service.embeddings = FakeEmbeddings(Latency.parse(embed_latency, blocking, seed))
+    llm = FakeLLM(Latency.parse(llm_latency, blocking, seed + 1))
+    cache = FakeSemanticCache(embedding_service)
+    tavily = FakeTavily(Latency.parse(search_latency, blocking, seed + 2), n_images)
+
+    nodes.llm = safety.llm = vision.llm = llm
+    nodes.write_llm = llm_response_cache.wrap(llm, "write")
+    nodes.revise_llm = llm_response_cache.wrap(llm, "revise")
+    vision.vision_llm = llm_response_cache.wrap(llm, "vision")
+    nodes.critique_llm = llm_response_cache.wrap(llm, "critique")
+    safety.guardrail_llm = llm_response_cache.wrap(llm, "guardrails")
+    search = SearchService(backend=tavily)
+    if search.redis is not None:
+        # Shared result tier in memory too, also when install_backends() wasn't called
+        search.redis = InMemoryRedis(decode_responses=True)
+    search_service.override(search)
+    nodes.hybrid_retriever = FakeRetriever(Latency.parse(vector_latency, seed=seed + 3))
+    nodes.redis_cache = graph.redis_cache = batch.redis_cache = cache
+    images = FakeImageSource(Latency.parse(image_latency, blocking, seed + 4))
+    vision_images = ImageService()
+    if vision_images.redis is not None:
+        # Description cache tier in memory too, also when install_backends() wasn't called
+        vision_images.redis = InMemoryRedis(decode_responses=True)
+    vision_images._download = images.download
+    image_service.override(vision_images)
+    return SimpleNamespace(llm=llm, cache=cache, tavily=tavily, embeddings=embedding_service.embeddings, images=images)
@@ -0,0 +1,44 @@
+"""Minimal PDF writer for benchmarks: N text pages, no third-party dependencies."""
+import random
+
+WORDS = (
+    "model training inference latency throughput vector embedding retrieval agent graph "
+    "transformer attention dataset benchmark quantization cache index search report "
+    "research evaluation accuracy precision recall pipeline token context memory"
+).split()
+
+
+def page_lines(page: int, lines: int) -> list[str]:
+    rng = random.Random(page)
+    return [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines)]
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a `pages`-page PDF with Helvetica text that pypdf can extract."""
+    n_objects = 3 + 2 * pages
+    offsets = {}
+    with open(path, "wb") as f:
+        def obj(num: int, body: bytes):
+            offsets[num] = f.tell()
+            f.write(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        for i in range(pages):
+            text = " ".join(f"({line}) Tj T*" for line in page_lines(i, lines_per_page))
+            stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text} ET".encode()
+            obj(4 + 2 * i, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode())
+            obj(5 + 2 * i, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+        xref = f.tell()
+        f.write(f"xref\n0 {n_objects + 1}\n0000000000 65535 f \n".encode())
+        for num in range(1, n_objects + 1):
+            f.write(f"{offsets[num]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {n_objects + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
@@ -25,5 +25,15 @@ export const uploadPdf = async (file: File) => {
             'Content-Type': 'multipart/form-data',
         },
     });
-    return response.data;
+
+    // Ingestion runs in the background; poll the job until it finishes
+    let job = response.data;
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = (await api.get(`/upload/${job.job_id}`)).data;
+    }
+    if (job.status !== 'completed') {
+        throw new Error(job.error || 'Ingestion failed');
+    }
+    return job;
 };